@@ -63,3 +63,15 @@ class BaseAgent(ABC):
         """Cleanup environment after execution (optional)."""
         pass
 
+    def prefetch_environment(self, task: Dict[str, Any]) -> None:
+        """Start preparing the environment of the next task in the background (optional).
+
+        Args:
+            task: Task dictionary of the next task
+        """
+        pass
+
+    def cancel_prefetch(self) -> None:
+        """Discard an environment prepared by prefetch_environment (optional)."""
+        pass
+
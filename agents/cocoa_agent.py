@@ -46,3 +46,11 @@ class CocoaAgent(BaseAgent):
         """Cleanup Docker sandbox."""
         self.executor.cleanup_environment()
 
+    def prefetch_environment(self, task: Dict[str, Any]) -> None:
+        """Build and start the next task's Docker sandbox in the background."""
+        self.executor.prefetch_environment(task)
+
+    def cancel_prefetch(self) -> None:
+        """Remove a prefetched Docker sandbox."""
+        self.executor.cancel_prefetch()
+
@@ -13,7 +13,7 @@ from .base import BaseAgent
 
 # Import decrypt utilities for encrypted test files
 try:
-    from decrypt_utils import decrypt_file_to_memory, read_canary
+    from decrypt import decrypt_file_to_memory, read_canary
     DECRYPT_AVAILABLE = True
 except ImportError:
     DECRYPT_AVAILABLE = False
@@ -472,7 +472,7 @@ class OpenAIDeepResearchAgent(BaseAgent):
             
             if use_encrypted:
                 if not DECRYPT_AVAILABLE:
-                    raise ImportError("decrypt_utils not available but use_encrypted=True")
+                    raise ImportError("decrypt module not available but use_encrypted=True")
                 
                 task_dir = Path(task.get("task_dir"))
                 canary = read_canary(task_dir)
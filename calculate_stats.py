@@ -1,62 +1,151 @@
 import argparse
 import json
+import shutil
 from pathlib import Path
+from typing import Any, Dict, List
+
+
+def load_result(json_file: Path) -> Dict[str, Any] | None:
+    """Load a task result JSON, or None if it is missing or unreadable."""
+    try:
+        with open(json_file, 'r') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _result_rank(data: Dict[str, Any], json_file: Path) -> tuple:
+    """Ordering key used to pick one result when a task appears in several output dirs."""
+    return (data.get("status") != "error", "eval" in data, json_file.stat().st_mtime)
+
+
+def collect_results(output_dirs: List[str]) -> Dict[str, tuple[Path, Dict[str, Any] | None]]:
+    """Collect one result per task across one or more output directories.
+
+    When the same task has results in several directories (e.g. a shard that was
+    re-run), a non-error result with an eval wins, then the most recent file.
+
+    Returns:
+        Mapping of task name to (json file, parsed result or None if unreadable)
+    """
+    results: Dict[str, tuple[Path, Dict[str, Any] | None]] = {}
+    for output_dir in output_dirs:
+        for json_file in sorted(Path(output_dir).glob("*.json")):
+            data = load_result(json_file)
+            current = results.get(json_file.stem)
+            if current is None or current[1] is None:
+                results[json_file.stem] = (json_file, data)
+            elif data is not None and _result_rank(data, json_file) > _result_rank(current[1], current[0]):
+                results[json_file.stem] = (json_file, data)
+    return results
+
+
+def compute_statistics(output_dirs: List[str]) -> Dict[str, Any]:
+    """Count passed, failed and errored tasks over the results in the given directories."""
+    stats = {
+        "total": 0,
+        "passed": 0,
+        "failed": 0,
+        "errors": 0,
+        "passed_list": [],
+        "error_list": [],
+        "unreadable_list": [],
+    }
+    for task_name, (json_file, data) in sorted(collect_results(output_dirs).items()):
+        if data is None:
+            stats["unreadable_list"].append(str(json_file))
+            continue
+        stats["total"] += 1
+        if data.get("status") == "error":
+            stats["errors"] += 1
+            stats["error_list"].append(task_name)
+        elif data.get("eval", {}).get("passed", False) is True:
+            stats["passed"] += 1
+            stats["passed_list"].append(task_name)
+        else:
+            stats["failed"] += 1
+    stats["success_rate"] = (stats["passed"] / stats["total"] * 100) if stats["total"] > 0 else 0.0
+    return stats
+
+
+def format_statistics(stats: Dict[str, Any]) -> str:
+    """Render statistics in the statistics.txt format."""
+    content = (
+        f"Total Tasks: {stats['total']}\n"
+        f"Passed: {stats['passed']}\n"
+        f"Failed: {stats['failed']}\n"
+        f"Errors: {stats['errors']}\n"
+        f"Success Rate: {stats['success_rate']:.2f}%\n"
+    )
+
+    if stats["passed_list"]:
+        content += "\nPassed Tasks:\n"
+        for task_name in stats["passed_list"]:
+            content += f"  - {task_name}\n"
+
+    if stats["error_list"]:
+        content += "\nError Tasks:\n"
+        for task_name in stats["error_list"]:
+            content += f"  - {task_name}\n"
+
+    return content
+
+
+def merge_results(output_dirs: List[str], merged_dir: str) -> None:
+    """Copy the selected result of every task into merged_dir and write its statistics.txt."""
+    merged_path = Path(merged_dir)
+    merged_path.mkdir(parents=True, exist_ok=True)
+    for task_name, (json_file, data) in collect_results(output_dirs).items():
+        if data is not None and json_file.parent.resolve() != merged_path.resolve():
+            shutil.copy2(json_file, merged_path / json_file.name)
+    stats = compute_statistics([merged_dir])
+    with open(merged_path / "statistics.txt", 'w') as f:
+        f.write(format_statistics(stats))
+    print(f"Merged {stats['total']} results into {merged_path}")
+
 
 def main():
     parser = argparse.ArgumentParser(description="Calculate success rate statistics from output JSON files")
-    parser.add_argument("output_dir", type=str, help="Directory containing the output JSON files")
+    parser.add_argument("output_dirs", type=str, nargs="+",
+                        help="Directories containing the output JSON files (e.g. one per shard)")
+    parser.add_argument("--merge-into", type=str,
+                        help="Copy the combined results into this directory and write its statistics.txt")
     args = parser.parse_args()
 
-    output_path = Path(args.output_dir)
-    if not output_path.exists() or not output_path.is_dir():
-        print(f"Error: Directory not found: {args.output_dir}")
-        return
-
-    total_tasks = 0
-    passed_tasks = 0
-    failed_tasks = 0
-    error_tasks = 0
-    passed_list = []
-    error_list = []
-
-    print(f"Scanning directory: {output_path}")
-
-    for json_file in output_path.glob("*.json"):
-        try:
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-                total_tasks += 1
-                if data.get("status") == "error":
-                    error_tasks += 1
-                    error_list.append(json_file.stem)
-                elif data.get("eval", {}).get("passed", False) is True:
-                    passed_tasks += 1
-                    passed_list.append(json_file.stem)
-                else:
-                    failed_tasks += 1
-        except Exception as e:
-            print(f"Error reading {json_file}: {e}")
-
-    success_rate = (passed_tasks / total_tasks * 100) if total_tasks > 0 else 0.0
+    for output_dir in args.output_dirs:
+        output_path = Path(output_dir)
+        if not output_path.exists() or not output_path.is_dir():
+            print(f"Error: Directory not found: {output_dir}")
+            return
+
+    print(f"Scanning directories: {', '.join(args.output_dirs)}")
+
+    if args.merge_into:
+        merge_results(args.output_dirs, args.merge_into)
+
+    stats = compute_statistics(args.output_dirs)
+    for json_file in stats["unreadable_list"]:
+        print(f"Error reading {json_file}")
 
     print("-" * 30)
-    print(f"Total Tasks: {total_tasks}")
-    print(f"Passed:      {passed_tasks}")
-    print(f"Failed:      {failed_tasks}")
-    print(f"Errors:      {error_tasks}")
+    print(f"Total Tasks: {stats['total']}")
+    print(f"Passed:      {stats['passed']}")
+    print(f"Failed:      {stats['failed']}")
+    print(f"Errors:      {stats['errors']}")
     print("-" * 30)
-    print(f"Success Rate: {success_rate:.2f}%")
+    print(f"Success Rate: {stats['success_rate']:.2f}%")
     print("-" * 30)
-    
-    if passed_list:
+
+    if stats["passed_list"]:
         print("\nPassed Tasks:")
-        for task_name in sorted(passed_list):
+        for task_name in stats["passed_list"]:
             print(f"  - {task_name}")
         print("-" * 30)
 
-    if error_list:
+    if stats["error_list"]:
         print("\nError Tasks:")
-        for task_name in sorted(error_list):
+        for task_name in stats["error_list"]:
             print(f"  - {task_name}")
         print("-" * 30)
 
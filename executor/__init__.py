@@ -2,6 +2,7 @@
 Executor module for task execution with controllers and sandbox agents.
 """
 
+import copy
 import importlib.util
 import sys
 from pathlib import Path
@@ -13,6 +14,9 @@ from .sandbox import (
     BrowserSandboxClient,
     UnifiedSandboxClient,
 )
+from .checkpoint import TaskCheckpoint
+from .tools import BROWSER_ACTIONS, MUTATING_BROWSER_ACTIONS
+from .screenshots import ScreenshotDeduplicator, UNCHANGED_SCREEN_NOTE
 from .utils import colorize, extract_config_info, measure_execution_time
 
 # Import decrypt utilities for encrypted test files
@@ -24,6 +28,12 @@ except ImportError:
 
 logger = get_logger("executor")
 
+RESUME_NOTE = (
+    "\n\n[Note: execution was interrupted and has been resumed from a checkpoint. "
+    "The sandbox environment was restarted, so files, browser pages and shell/code sessions "
+    "created in earlier iterations may no longer exist. Re-check the environment before relying on them.]"
+)
+
 __all__ = [
     "TaskExecutor",
     "OpenAILLM",
@@ -50,18 +60,20 @@ def is_browser_action(action: Dict[str, Any]) -> bool:
     """
     if not isinstance(action, dict):
         return False
+    return action.get("action_type", "") in BROWSER_ACTIONS
+
+def is_mutating_browser_action(action: Dict[str, Any]) -> bool:
+    """Check if an action can change what the browser shows (and so warrants a screenshot).
     
-    action_type = action.get("action_type", "")
-    browser_action_types = [
-        "browser_click", "browser_type", "browser_press", "browser_key_down", "browser_key_up", "browser_hotkey",
-        "browser_scroll", "browser_move_to", "browser_move_rel", "browser_drag_to", "browser_drag_rel",
-        "browser_wait",
-        "dom_get_text", "dom_get_html", "dom_query_selector",
-        "dom_extract_links", "dom_mark_elements", "dom_click", "dom_hover", "dom_type", "dom_press", "dom_scroll",
-        "browser_navigate",
-        "browser_screenshot", "browser_get_viewport_info",
-    ]
-    return action_type in browser_action_types
+    Args:
+        action: Action dictionary
+        
+    Returns:
+        True for browser actions that are neither read-only nor screenshots themselves
+    """
+    if not isinstance(action, dict):
+        return False
+    return action.get("action_type", "") in MUTATING_BROWSER_ACTIONS
 
 def normalize_action(action: Dict[str, Any]) -> Dict[str, Any]:
     """Normalize action format by flattening parameters if present.
@@ -102,6 +114,11 @@ class TaskExecutor:
             controller: Controller instance (LLM or Human). If None, creates controller from config.
         """
         self.config = config
+        # Per-iteration checkpoints are written under checkpoint_dir (disabled when unset)
+        self.checkpoint_dir = config.get("checkpoint_dir")
+        self.resume_from_checkpoint = config.get("resume_from_checkpoint", False)
+        # Omits screenshots that look the same as the last one sent (opt-in)
+        self.screenshot_dedup = ScreenshotDeduplicator(config.get("screenshot_dedup"))
         
         logger.info(f"Config: {config}")
 
@@ -160,9 +177,27 @@ class TaskExecutor:
 
     def cleanup_environment(self) -> None:
         """Clean up the sandbox environment after execution."""
+        if hasattr(self.sandbox_client, "flush_har"):
+            # Keep the recording even if tearing down the browser session fails
+            try:
+                self.sandbox_client.flush_har()
+            except Exception as e:
+                logger.error(f"Failed to write HAR archive: {e}")
         self.sandbox_client.cleanup_docker_environment()
         self.controller.clear_history()
 
+    def prefetch_environment(self, task: dict) -> None:
+        """Start preparing the sandbox of the task that will run next, in the background.
+
+        Args:
+            task: Task object of the next task
+        """
+        self.sandbox_client.prefetch_environment(task)
+
+    def cancel_prefetch(self) -> None:
+        """Tear down a prefetched sandbox that will not be used."""
+        self.sandbox_client.cancel_prefetch()
+
     @measure_execution_time
     def run_task(self, task: dict) -> dict:
         """Run inference on the given task with agent loop.
@@ -212,6 +247,7 @@ class TaskExecutor:
         last_feedback_with_image = None
         images_from_last_iteration = []  # Store images from the previous iteration only
         task_result = None  # Store task result if provided in task_complete
+        self.screenshot_dedup.reset()
         
         # Initialize visualization data structure
         visualization_data = {
@@ -219,10 +255,36 @@ class TaskExecutor:
             "iterations": []
         }
 
+        start_iteration = 1
+        checkpoint = None
+        if self.checkpoint_dir:
+            checkpoint = TaskCheckpoint(self.checkpoint_dir, task.get("task_name", "task"))
+            records = checkpoint.load() if self.resume_from_checkpoint else []
+            if records:
+                last_feedback = self._restore_from_checkpoint(checkpoint, records, visualization_data)
+                final_iteration = records[-1]["iteration"]
+                images_from_last_iteration = [
+                    image for image in (checkpoint.load_image(pointer) for pointer in records[-1].get("images", [])) if image
+                ]
+                logger.info(f"Resumed task from checkpoint after iteration {final_iteration} ({checkpoint.path})")
+                if last_feedback.get("done"):
+                    # The task had already finished before the interruption; skip the loop entirely
+                    task_result = last_feedback.get("task_result")
+                    start_iteration = max_iterations + 1
+                else:
+                    prompt = self.controller.build_prompt(
+                        feedback=last_feedback.get("message", "Continue with the task.") + RESUME_NOTE
+                    )
+                    start_iteration = final_iteration + 1
+            else:
+                checkpoint.reset()
+
         # Agent loop
-        for iteration in range(1, max_iterations + 1):
+        for iteration in range(start_iteration, max_iterations + 1):
             final_iteration = iteration
             logger.info(f"Iteration {iteration}/{max_iterations}")
+            messages_start = len(self.controller.get_history())
+            history_start = len(self.sandbox_client.get_history())
 
             # Get controller response (already parsed into action dict)
             # Only include images from the previous iteration (i-1), not all historical images
@@ -252,6 +314,8 @@ class TaskExecutor:
                 prompt = self.controller.build_prompt(
                     feedback=feedback.get("message", "Continue with the task.")
                 )
+                self._write_checkpoint(checkpoint, iteration, think_content, None, feedback,
+                                       images_from_last_iteration, messages_start, history_start)
                 continue
 
             # Normalize action format
@@ -266,6 +330,9 @@ class TaskExecutor:
                 browser_screenshots = [] # Collect only browser screenshots
                 image_read_contents = [] # Collect only image_read contents
                 iteration_actions = []  # Store actions for visualization
+                # Only the last browser screenshot reaches the model, so a single capture is
+                # deferred until after the batch if the screen changed since the last one
+                last_mutating_action_data = None
                 
                 for single_action in action["actions"]:
                     # Normalize action format
@@ -274,21 +341,11 @@ class TaskExecutor:
                     record_tool_feedback(single_action, single_feedback) # TODO: optimize OpenAI Tool Calling format to avoid extra messages in the conversation history
                     feedbacks.append(single_feedback.get("message", ""))
                     
-                    # For browser actions, take a screenshot after execution (unless it's already a screenshot action)
-                    screenshot_base64 = None
-                    if is_browser_action(single_action) and single_action.get("action_type") != "browser_screenshot":
-                        if hasattr(self.sandbox_client, 'take_screenshot'):
-                            try:
-                                screenshot_base64, _ = self.sandbox_client.take_screenshot()
-                                if screenshot_base64:
-                                    browser_screenshots.append(screenshot_base64)
-                            except Exception as e:
-                                logger.warning(f"Failed to take screenshot after browser action: {e}")
-                    
                     # Check if this action was a screenshot or image_read and has image_base64
                     if single_action.get("action_type") == "browser_screenshot" and "image_base64" in single_feedback:
                         image_base64 = single_feedback["image_base64"]
                         browser_screenshots.append(image_base64)
+                        last_mutating_action_data = None
                     
                     if single_action.get("action_type") == "image_read" and "image_base64" in single_feedback:
                         image_base64 = single_feedback["image_base64"]
@@ -299,14 +356,26 @@ class TaskExecutor:
                     action_data = {
                         "action": single_action,
                         "observation": single_feedback.get("message", ""),
-                        "screenshot": screenshot_base64 if screenshot_base64 else (single_feedback.get("image_base64") if single_action.get("action_type") in ["browser_screenshot", "image_read"] else None)
+                        "screenshot": single_feedback.get("image_base64") if single_action.get("action_type") in ["browser_screenshot", "image_read"] else None
                     }
                     iteration_actions.append(action_data)
+                    if is_mutating_browser_action(single_action):
+                        last_mutating_action_data = action_data
                     
                     if single_feedback.get("done"):
                         done = True
                         break
                 
+                # Only the automatic post-action screenshot may be deduplicated; one the
+                # model asked for with browser_screenshot is always sent
+                auto_screenshot = None
+                if last_mutating_action_data is not None:
+                    screenshot_base64 = self._capture_screenshot()
+                    if screenshot_base64:
+                        browser_screenshots.append(screenshot_base64)
+                        last_mutating_action_data["screenshot"] = screenshot_base64
+                        auto_screenshot = screenshot_base64
+                
                 # Combine all feedbacks
                 combined_feedback = {
                     "done": done,
@@ -317,9 +386,12 @@ class TaskExecutor:
                 # 1. Take ONLY the last browser screenshot if available
                 # 2. Add ALL image_read contents
                 images_from_last_iteration = []
+                screenshot_for_prompt = auto_screenshot
                 
                 if browser_screenshots:
                     images_from_last_iteration.append(browser_screenshots[-1])
+                    if auto_screenshot is None:
+                        self.screenshot_dedup.remember(browser_screenshots[-1])
                 
                 # Append all manually read images
                 images_from_last_iteration.extend(image_read_contents)
@@ -341,22 +413,22 @@ class TaskExecutor:
                 feedback = self.sandbox_client.get_feedback(action)
                 record_tool_feedback(action, feedback)
                 
-                # For browser actions, take a screenshot after execution (unless it's already a screenshot action)
+                # Take a screenshot after browser actions that can change the screen
                 screenshot_base64 = None
-                if is_browser_action(action) and action.get("action_type") != "browser_screenshot":
-                    if hasattr(self.sandbox_client, 'take_screenshot'):
-                        try:
-                            screenshot_base64, _ = self.sandbox_client.take_screenshot()
-                        except Exception as e:
-                            logger.warning(f"Failed to take screenshot after browser action: {e}")
+                if is_mutating_browser_action(action):
+                    screenshot_base64 = self._capture_screenshot()
                 
                 # Store images from this iteration for next iteration
                 images_from_last_iteration = []  # Reset for current iteration
+                screenshot_for_prompt = None
                 if action.get("action_type") in ["browser_screenshot", "image_read"] and "image_base64" in feedback:
                     image_base64 = feedback["image_base64"]
                     images_from_last_iteration = [image_base64]  # Store single image for next iteration
+                    if action.get("action_type") == "browser_screenshot":
+                        self.screenshot_dedup.remember(image_base64)
                 elif screenshot_base64:
                     images_from_last_iteration = [screenshot_base64]
+                    screenshot_for_prompt = screenshot_base64
                 
                 # Store iteration data for visualization
                 visualization_data["iterations"].append({
@@ -369,9 +441,21 @@ class TaskExecutor:
                     }]
                 })
 
+            # Replace an automatic screenshot that shows the same screen as the last one sent with a short note
+            if screenshot_for_prompt and not self.screenshot_dedup.should_send(screenshot_for_prompt):
+                images_from_last_iteration.remove(screenshot_for_prompt)
+                feedback = {**feedback, "message": f"{feedback.get('message', '')}\n{UNCHANGED_SCREEN_NOTE}"}
+                feedback.pop("image_base64", None)
+                if images_from_last_iteration:
+                    feedback["image_base64"] = images_from_last_iteration[-1]
+
             # Store the full feedback (including image_base64) for next iteration
             last_feedback_with_image = feedback
 
+            self._write_checkpoint(checkpoint, iteration, think_content,
+                                   visualization_data["iterations"][-1]["actions"], feedback,
+                                   images_from_last_iteration, messages_start, history_start)
+
             # Check if task is complete
             if feedback.get("done"):
                 logger.info(f"Task completed at iteration {iteration}")
@@ -392,6 +476,19 @@ class TaskExecutor:
             "execution_trace": self.sandbox_client.get_history(),
             "visualization_data": visualization_data,  # Add visualization data
         }
+        # Tests reach the container through sandbox.docker_port, which may differ from the
+        # configured port when the environment was prefetched on a spare port
+        result_dict["sandbox"] = {**result_dict.get("sandbox", {}), "docker_port": self.sandbox_client.port}
+        if self.sandbox_client.readiness is not None:
+            result_dict["sandbox_readiness"] = self.sandbox_client.readiness
+        if hasattr(self.sandbox_client, "get_resource_blocking_stats"):
+            blocking_stats = self.sandbox_client.get_resource_blocking_stats()
+            if blocking_stats is not None:
+                result_dict["resource_blocking_stats"] = blocking_stats
+        if hasattr(self.sandbox_client, "get_har_stats"):
+            har_stats = self.sandbox_client.get_har_stats()
+            if har_stats is not None:
+                result_dict["har_stats"] = har_stats
         
         # Add task_result if it was provided in task_complete
         if task_result:
@@ -400,9 +497,104 @@ class TaskExecutor:
         # Add API cost statistics if controller supports it
         if hasattr(self.controller, "get_cost_stats"):
             result_dict["api_cost_stats"] = self.controller.get_cost_stats()
+
+        if self.screenshot_dedup.enabled:
+            result_dict["screenshots_omitted"] = self.screenshot_dedup.skipped
         
         return result_dict
 
+    def _capture_screenshot(self) -> str | None:
+        """Take a browser screenshot after an action, returning None if unsupported or failed."""
+        if not hasattr(self.sandbox_client, 'take_screenshot'):
+            return None
+        try:
+            screenshot_base64, _ = self.sandbox_client.take_screenshot()
+            return screenshot_base64 or None
+        except Exception as e:
+            logger.warning(f"Failed to take screenshot after browser action: {e}")
+            return None
+
+    def _write_checkpoint(
+        self,
+        checkpoint: TaskCheckpoint | None,
+        iteration: int,
+        think_content: str | None,
+        actions: list | None,
+        feedback: dict,
+        images: list,
+        messages_start: int,
+        history_start: int,
+    ) -> None:
+        """Append the state produced by one iteration to the task checkpoint.
+
+        Only what is new in this iteration is written: the controller messages and
+        sandbox history entries added since the iteration started, plus the
+        observations. Images are stored as files and referenced by path.
+        """
+        if checkpoint is None:
+            return
+        try:
+            saved_images: Dict[str, str | None] = {}
+
+            def image_pointer(image_base64: str | None) -> str | None:
+                if not image_base64:
+                    return None
+                if image_base64 not in saved_images:
+                    saved_images[image_base64] = checkpoint.save_image(image_base64, f"iter{iteration}")
+                return saved_images[image_base64]
+
+            messages = copy.deepcopy(self.controller.get_history()[messages_start:])
+            if hasattr(self.controller, "_remove_images_from_message"):
+                messages = [self.controller._remove_images_from_message(message) for message in messages]
+
+            record = {
+                "iteration": iteration,
+                "think": think_content,
+                "actions": None if actions is None else [
+                    {**action_data, "screenshot": image_pointer(action_data.get("screenshot"))}
+                    for action_data in actions
+                ],
+                "feedback": {key: feedback[key] for key in ("done", "message", "task_result") if key in feedback},
+                "images": [image_pointer(image) for image in images if image],
+                "messages": messages,
+                "execution_history": checkpoint.externalize_images(
+                    self.sandbox_client.get_history()[history_start:], f"iter{iteration}"
+                ),
+            }
+            checkpoint.append(record)
+        except Exception as e:
+            logger.warning(f"Failed to write checkpoint for iteration {iteration}: {e}")
+
+    def _restore_from_checkpoint(
+        self,
+        checkpoint: TaskCheckpoint,
+        records: list,
+        visualization_data: dict,
+    ) -> dict:
+        """Rebuild controller history, sandbox history and visualization data from checkpoint records.
+
+        Returns:
+            The feedback dictionary of the last recorded iteration
+        """
+        messages = []
+        history = []
+        for record in records:
+            messages.extend(record.get("messages", []))
+            history.extend(checkpoint.internalize_images(record.get("execution_history", [])))
+            if record.get("actions") is not None:
+                visualization_data["iterations"].append({
+                    "iteration": record["iteration"],
+                    "think": record.get("think"),
+                    "actions": [
+                        {**action_data, "screenshot": checkpoint.load_image(action_data.get("screenshot"))}
+                        for action_data in record["actions"]
+                    ],
+                })
+        self.controller.restore_history(messages)
+        if hasattr(self.sandbox_client, "restore_history"):
+            self.sandbox_client.restore_history(history)
+        return records[-1].get("feedback", {})
+
     @measure_execution_time
     def run_eval(self, task: dict, result: dict) -> dict:
         """Load and run test function from task's test.py or test.py.enc.
@@ -0,0 +1,166 @@
+"""
+Persistent Playwright connection to the sandbox browser.
+
+Connecting over CDP costs a browser info request, a Playwright driver start and
+a CDP handshake. BrowserSession does this once per sandbox and keeps the
+connection open for the whole task, reconnecting when the browser went away
+(e.g. after a restart).
+
+All sessions run their coroutines on one long-lived event loop in a background
+thread, so no loop is created per call and Playwright objects outlive a call.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger("browser_session")
+
+# Errors after which the connection is dropped and the operation retried once
+_DISCONNECT_MARKERS = (
+    "Target page, context or browser has been closed",
+    "Browser has been closed",
+    "Connection closed",
+    "Browser closed",
+)
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_browser_loop() -> asyncio.AbstractEventLoop:
+    """Return the browser event loop, starting its background thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="browser-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def run_coroutine(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the browser loop and wait for its result.
+
+    Args:
+        coro: Coroutine to run
+        timeout: Seconds to wait; on timeout the coroutine is cancelled
+
+    Returns:
+        Result of the coroutine
+    """
+    loop = get_browser_loop()
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+
+
+def _is_disconnect(error: Exception) -> bool:
+    """Return True if the error means the CDP connection or page is gone."""
+    message = str(error)
+    return type(error).__name__ == "TargetClosedError" or any(marker in message for marker in _DISCONNECT_MARKERS)
+
+
+class BrowserSession:
+    """Keeps the Playwright instance, CDP connection and active page open across operations."""
+
+    def __init__(self, cdp_url_provider: Callable[[], str], operation_timeout: float = 60, page_hooks: Optional[List[Any]] = None):
+        """Initialize the session (connects lazily on first use).
+
+        Args:
+            cdp_url_provider: Returns the browser's current CDP URL (queried on every (re)connect)
+            operation_timeout: Maximum seconds a single operation may take
+            page_hooks: Objects with async attach(page)/detach() applied to the active page
+                (e.g. ResourceBlocker, HarRecorder)
+        """
+        self._cdp_url_provider = cdp_url_provider
+        self.operation_timeout = operation_timeout
+        self.page_hooks: List[Any] = list(page_hooks or [])
+        self._playwright = None
+        self._browser = None
+
+    async def _connect(self) -> None:
+        """Start Playwright (once) and connect to the browser over CDP."""
+        from playwright.async_api import async_playwright
+
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        # The provider makes a blocking HTTP call; keep it off the shared loop
+        cdp_url = await asyncio.get_running_loop().run_in_executor(None, self._cdp_url_provider)
+        self._browser = await self._playwright.chromium.connect_over_cdp(cdp_url)
+        logger.debug(f"Connected to browser over CDP at {cdp_url}")
+
+    async def _disconnect(self) -> None:
+        """Drop the CDP connection (does not shut down the remote browser)."""
+        browser, self._browser = self._browser, None
+        for hook in self.page_hooks:
+            await hook.detach()
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+    async def get_page(self):
+        """Return the active page, connecting or reconnecting first if needed."""
+        if self._browser is None or not self._browser.is_connected():
+            await self._disconnect()
+            await self._connect()
+        context = self._browser.contexts[0] if self._browser.contexts else await self._browser.new_context()
+        page = context.pages[0] if context.pages else await context.new_page()
+        for hook in self.page_hooks:
+            await hook.attach(page)
+        return page
+
+    async def _run_with_page(self, func: Callable[[Any], Awaitable[Any]], wait_timeout: int) -> Any:
+        """Run func on the active page, reconnecting and retrying once if the browser went away."""
+        for attempt in range(2):
+            try:
+                page = await self.get_page()
+                # Use shorter timeout for DOM operations on already-loaded pages
+                if wait_timeout > 0:
+                    try:
+                        await page.wait_for_load_state("domcontentloaded", timeout=wait_timeout)
+                    except Exception:
+                        # If page is already loaded or timeout, continue anyway
+                        pass
+                return await func(page)
+            except Exception as e:
+                if attempt == 0 and _is_disconnect(e):
+                    logger.info(f"Browser connection lost ({e}), reconnecting")
+                    await self._disconnect()
+                    continue
+                raise
+
+    def with_page(self, func: Callable[[Any], Awaitable[Any]], wait_timeout: int = 5000, timeout: Optional[float] = None) -> Any:
+        """Run an async function on the active page.
+
+        Args:
+            func: Async function that takes a page and returns a result
+            wait_timeout: Timeout in ms for waiting for page load (use 0 to skip wait)
+            timeout: Seconds the operation may take (default: operation_timeout)
+
+        Returns:
+            Result of func
+        """
+        return run_coroutine(self._run_with_page(func, wait_timeout), timeout=timeout or self.operation_timeout)
+
+    def close(self) -> None:
+        """Close the CDP connection and stop Playwright."""
+        async def shutdown():
+            await self._disconnect()
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+        try:
+            run_coroutine(shutdown(), timeout=self.operation_timeout)
+        except Exception as e:
+            logger.debug(f"Error while closing browser session: {e}")
@@ -0,0 +1,138 @@
+"""
+Per-iteration checkpointing of task execution state.
+
+Each task gets an append-only JSONL file with one record per agent iteration
+(think content, actions, observations, new controller messages and new sandbox
+history entries). Images are written next to it as separate files and referenced
+by relative path, so the JSONL stays small and each append is cheap.
+"""
+
+import base64
+import copy
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .logger import get_logger
+
+logger = get_logger("checkpoint")
+
+
+def _image_extension(data: bytes) -> str:
+    """Guess a file extension from image magic bytes."""
+    if data.startswith(b"\x89PNG"):
+        return ".png"
+    if data.startswith(b"\xff\xd8"):
+        return ".jpg"
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return ".webp"
+    return ".bin"
+
+
+class TaskCheckpoint:
+    """Append-only checkpoint for a single task run."""
+
+    def __init__(self, checkpoint_dir: str | os.PathLike, task_name: str):
+        """Initialize the checkpoint.
+
+        Args:
+            checkpoint_dir: Directory holding checkpoints of all tasks
+            task_name: Name of the task (used for file names)
+        """
+        self.root = Path(checkpoint_dir)
+        self.path = self.root / f"{task_name}.jsonl"
+        self.image_dir = self.root / task_name
+        self._image_count = 0
+
+    def exists(self) -> bool:
+        """Return True if a checkpoint file with content exists."""
+        return self.path.exists() and self.path.stat().st_size > 0
+
+    def reset(self) -> None:
+        """Remove any previous checkpoint so a fresh run starts clean."""
+        self.discard()
+        self._image_count = 0
+
+    def discard(self) -> None:
+        """Delete the checkpoint file and its images."""
+        if self.path.exists():
+            self.path.unlink()
+        if self.image_dir.exists():
+            shutil.rmtree(self.image_dir, ignore_errors=True)
+
+    def save_image(self, image_base64: str | None, label: str) -> str | None:
+        """Write a base64 image to disk and return its path relative to the checkpoint dir."""
+        if not image_base64:
+            return None
+        data = base64.b64decode(image_base64)
+        self.image_dir.mkdir(parents=True, exist_ok=True)
+        self._image_count += 1
+        file_name = f"{label}_{self._image_count}{_image_extension(data)}"
+        (self.image_dir / file_name).write_bytes(data)
+        return f"{self.image_dir.name}/{file_name}"
+
+    def load_image(self, pointer: str | None) -> str | None:
+        """Read an image written by save_image back as base64, or None if missing."""
+        if not pointer:
+            return None
+        image_path = self.root / pointer
+        if not image_path.exists():
+            logger.warning(f"Checkpoint image {image_path} is missing")
+            return None
+        return base64.b64encode(image_path.read_bytes()).decode("utf-8")
+
+    def externalize_images(self, entries: List[Dict[str, Any]], label: str) -> List[Dict[str, Any]]:
+        """Copy sandbox history entries, replacing feedback image_base64 with an image_path pointer."""
+        result = []
+        for entry in entries:
+            entry = copy.copy(entry)
+            feedback = entry.get("feedback")
+            if isinstance(feedback, dict) and feedback.get("image_base64"):
+                feedback = dict(feedback)
+                feedback["image_path"] = self.save_image(feedback.pop("image_base64"), label)
+                entry["feedback"] = feedback
+            result.append(entry)
+        return result
+
+    def internalize_images(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Inverse of externalize_images: load image_path pointers back into image_base64."""
+        for entry in entries:
+            feedback = entry.get("feedback")
+            if isinstance(feedback, dict) and "image_path" in feedback:
+                image_base64 = self.load_image(feedback.pop("image_path"))
+                if image_base64:
+                    feedback["image_base64"] = image_base64
+        return entries
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Append one iteration record and flush it to disk."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Load all complete iteration records.
+
+        A trailing line that was cut short by a crash is ignored.
+        """
+        if not self.exists():
+            return []
+        records = []
+        with open(self.path, "r") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring incomplete checkpoint record at {self.path}:{line_number}")
+                    break
+        # Continue numbering images after the ones already on disk
+        if self.image_dir.exists():
+            self._image_count = len(list(self.image_dir.iterdir()))
+        return records
@@ -0,0 +1,417 @@
+"""
+Condenses page HTML to markdown for dom_get_html observations.
+
+Raw page HTML spends most of an observation's budget on scripts, styles, SVG
+paths and class attributes. The condenser makes one pass over the HTML with
+the stdlib HTMLParser and keeps what the agent acts on:
+
+- headings, paragraphs and line breaks as markdown blocks
+- lists (nested) and tables as markdown lists and pipe tables
+- links as [text](href), resolved against the page URL
+- form controls and buttons as bracketed descriptions with id/name, so they
+  can still be targeted with selectors
+- preformatted text as fenced blocks
+
+Scripts, styles, SVG, templates and hidden elements (hidden, aria-hidden,
+display:none, type=hidden) are dropped, whitespace is collapsed and
+repeated lines (e.g. desktop and mobile copies of a menu) are shown once.
+Block elements inside links, buttons and table cells are joined with spaces
+so a product card wrapped in a link stays one line.
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+# Subtrees that never carry readable content
+SKIPPED_TAGS = frozenset({"script", "style", "noscript", "template", "svg", "math", "canvas", "iframe", "object"})
+
+VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+})
+
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "body", "dd", "details", "dialog", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "header", "hgroup", "html", "legend", "li", "main",
+    "nav", "ol", "p", "section", "summary", "ul", "tr", "caption",
+})
+
+HEADING_LEVELS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+
+# Attributes shown on form controls, in this order
+CONTROL_ATTRIBUTES = ("type", "name", "placeholder", "value", "aria-label", "title")
+
+MAX_ATTRIBUTE_LENGTH = 80
+
+_WHITESPACE = re.compile(r"\s+")
+_HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+
+
+def _collapse(text: str) -> str:
+    """Collapse runs of whitespace to single spaces."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _is_hidden(tag: str, attrs: Dict[str, str]) -> bool:
+    """Return True if the element is not rendered."""
+    if "hidden" in attrs or attrs.get("aria-hidden") == "true":
+        return True
+    if tag == "input" and attrs.get("type", "").lower() == "hidden":
+        return True
+    return bool(_HIDDEN_STYLE.search(attrs.get("style", "")))
+
+
+def _describe_control(kind: str, attrs: Dict[str, str], text: str = "") -> str:
+    """Format a form control as [kind#id attr="..." ...: text]."""
+    label = kind + (f"#{attrs['id']}" if attrs.get("id") else "")
+    parts = [label]
+    for name in CONTROL_ATTRIBUTES:
+        value = _collapse(attrs.get(name, ""))
+        if value and not (kind == "button" and name == "type"):
+            parts.append(f'{name}="{value[:MAX_ATTRIBUTE_LENGTH]}"')
+    for flag in ("checked", "disabled", "selected"):
+        if flag in attrs:
+            parts.append(flag)
+    return f"[{' '.join(parts)}{': ' + text if text else ''}]"
+
+
+class _Wrapper:
+    """An open link, button or select whose text is collected before it is written."""
+
+    def __init__(self, tag: str, attrs: Dict[str, str]):
+        self.tag = tag
+        self.attrs = attrs
+        self.parts: List[str] = []
+        self.options: List[Tuple[str, bool]] = []
+
+
+class HtmlCondenser(HTMLParser):
+    """Streaming HTML-to-markdown converter (feed() chunks, then close() and read result())."""
+
+    def __init__(self, base_url: Optional[str] = None):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.title = ""
+        # (kind, line); consecutive list, table and pre lines are not separated by blank lines
+        self._lines: List[Tuple[str, str]] = []
+        self._inline: List[str] = []
+        self._prefix = ""
+        self._heading = 0
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        self._in_title = False
+        self._lists: List[List[Any]] = []
+        self._tables: List[Dict[str, Any]] = []
+        self._wrappers: List[_Wrapper] = []
+        self._pre: Optional[List[str]] = None
+        self._textarea: Optional[_Wrapper] = None
+
+    # Output helpers
+
+    def _sink(self) -> List[str]:
+        """Return the buffer text currently goes to."""
+        if self._wrappers:
+            return self._wrappers[-1].parts
+        if self._tables and self._tables[-1]["cell"] is not None:
+            return self._tables[-1]["cell"]
+        return self._inline
+
+    def _write(self, text: str) -> None:
+        self._sink().append(text)
+
+    def _inline_only(self) -> bool:
+        """Return True where block boundaries are joined with spaces instead of new lines."""
+        return bool(self._wrappers) or bool(self._tables and self._tables[-1]["cell"] is not None)
+
+    def _emit(self, line: str, kind: str = "block") -> None:
+        """Append an output line, skipping an exact repeat of the previous line."""
+        if kind != "pre" and self._lines and self._lines[-1] == (kind, line):
+            return
+        self._lines.append((kind, line))
+
+    def _break(self) -> None:
+        """End the current block."""
+        if self._inline_only():
+            self._write(" ")
+            return
+        text = _collapse("".join(self._inline))
+        self._inline = []
+        if not text:
+            return
+        if self._heading:
+            text = "#" * self._heading + " " + text
+        self._emit(self._prefix + text, "list" if self._prefix else "block")
+        # Further blocks of the same list item are indented under its marker
+        self._prefix = " " * len(self._prefix)
+
+    # Parser callbacks
+
+    def handle_starttag(self, tag: str, attr_list: List[Tuple[str, Optional[str]]]) -> None:
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        attrs = {name: value or "" for name, value in attr_list}
+        if tag == "title" and not self.title:
+            self._in_title = True
+            return
+        if tag in SKIPPED_TAGS or _is_hidden(tag, attrs):
+            if tag not in VOID_TAGS:
+                self._skip_tag, self._skip_depth = tag, 1
+            return
+        if self._pre is not None:
+            return
+
+        if tag in HEADING_LEVELS:
+            self._break()
+            if not self._inline_only():
+                self._heading = HEADING_LEVELS[tag]
+        elif tag in ("ul", "ol"):
+            self._break()
+            self._lists.append([tag, 0])
+        elif tag == "li":
+            self._break()
+            if not self._inline_only():
+                depth = max(len(self._lists) - 1, 0)
+                marker = "-"
+                if self._lists and self._lists[-1][0] == "ol":
+                    self._lists[-1][1] += 1
+                    marker = f"{self._lists[-1][1]}."
+                self._prefix = "  " * depth + marker + " "
+        elif tag == "table":
+            # A link, button or select left open before a table ends there; otherwise
+            # the cells would be written into it (and before the text preceding it)
+            while self._wrappers:
+                self._close_wrapper(self._wrappers[-1].tag)
+            self._break()
+            self._tables.append({"rows": [], "row": None, "cell": None, "header": False})
+        elif tag == "tr" and self._tables:
+            self._end_row()
+            self._tables[-1]["row"] = []
+        elif tag in ("td", "th") and self._tables:
+            table = self._tables[-1]
+            self._end_cell()
+            if table["row"] is None:
+                table["row"] = []
+            if tag == "th" and not table["rows"]:
+                table["header"] = True
+            table["cell"] = []
+        elif tag == "pre":
+            self._break()
+            if not self._inline_only():
+                self._pre = []
+        elif tag == "a":
+            if self._wrappers and self._wrappers[-1].tag == "a":
+                self._close_wrapper("a")
+            self._wrappers.append(_Wrapper(tag, attrs))
+        elif tag in ("button", "select"):
+            self._wrappers.append(_Wrapper(tag, attrs))
+        elif tag == "option" and self._wrappers and self._wrappers[-1].tag == "select":
+            # </option> is optional
+            self._end_option()
+            self._wrappers[-1].options.append(("", "selected" in attrs))
+        elif tag == "textarea":
+            self._textarea = _Wrapper(tag, attrs)
+        elif tag == "input":
+            if attrs.get("type", "").lower() in ("submit", "button", "reset") and attrs.get("value"):
+                self._write(" " + _describe_control("button", {"id": attrs.get("id", "")}, _collapse(attrs["value"])) + " ")
+            else:
+                self._write(" " + _describe_control("input", attrs) + " ")
+        elif tag == "img":
+            alt = _collapse(attrs.get("alt", ""))
+            if alt:
+                self._write(f" {alt} " if self._wrappers else f" ![{alt}] ")
+        elif tag == "br":
+            self._break()
+        elif tag == "hr":
+            self._break()
+            if not self._inline_only():
+                self._emit("---")
+        elif tag in BLOCK_TAGS:
+            self._break()
+
+    def handle_startendtag(self, tag: str, attr_list: List[Tuple[str, Optional[str]]]) -> None:
+        self.handle_starttag(tag, attr_list)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skip_tag = None
+            return
+        if tag == "title":
+            self._in_title = False
+            return
+        if self._pre is not None:
+            if tag == "pre":
+                self._end_pre()
+            return
+
+        if tag in HEADING_LEVELS:
+            self._break()
+            self._heading = 0
+        elif tag in ("ul", "ol"):
+            self._break()
+            if self._lists:
+                self._lists.pop()
+            self._prefix = ""
+        elif tag == "li":
+            self._break()
+            self._prefix = ""
+        elif tag in ("td", "th"):
+            self._end_cell()
+        elif tag == "tr":
+            self._end_row()
+        elif tag == "table" and self._tables:
+            self._end_table()
+        elif tag in ("a", "button", "select"):
+            self._close_wrapper(tag)
+        elif tag == "option" and self._wrappers and self._wrappers[-1].tag == "select":
+            self._end_option()
+        elif tag == "textarea" and self._textarea is not None:
+            wrapper, self._textarea = self._textarea, None
+            attrs = dict(wrapper.attrs)
+            text = _collapse("".join(wrapper.parts))
+            if text:
+                attrs["value"] = text
+            self._write(" " + _describe_control("textarea", attrs) + " ")
+        elif tag in BLOCK_TAGS:
+            self._break()
+
+    def handle_data(self, data: str) -> None:
+        if self._skip_tag is not None:
+            return
+        if self._in_title:
+            self.title += data
+        elif self._pre is not None:
+            self._pre.append(data)
+        elif self._textarea is not None:
+            self._textarea.parts.append(data)
+        else:
+            self._write(data)
+
+    # Structures
+
+    def _end_option(self) -> None:
+        select = self._wrappers[-1]
+        if select.options:
+            text, selected = select.options[-1]
+            select.options[-1] = (text or _collapse("".join(select.parts)), selected)
+        select.parts = []
+
+    def _close_wrapper(self, tag: str) -> None:
+        """Write an open link, button or select (and anything opened inside it)."""
+        if not any(wrapper.tag == tag for wrapper in self._wrappers):
+            return
+        while self._wrappers:
+            wrapper = self._wrappers.pop()
+            text = _collapse("".join(wrapper.parts))
+            if wrapper.tag == "a":
+                href = wrapper.attrs.get("href", "").strip()
+                if href and not href.startswith(("javascript:", "#")) and text:
+                    if self.base_url:
+                        href = urljoin(self.base_url, href)
+                    text = f"[{text}]({href})"
+            elif wrapper.tag == "button":
+                text = _describe_control("button", wrapper.attrs, text)
+            elif wrapper.tag == "select":
+                if wrapper.parts and wrapper.options:
+                    self._wrappers.append(wrapper)
+                    self._end_option()
+                    self._wrappers.pop()
+                options = " | ".join(option + ("*" if selected else "") for option, selected in wrapper.options if option)
+                text = _describe_control("select", wrapper.attrs, options)
+            if text:
+                self._write(f" {text} ")
+            if wrapper.tag == tag:
+                return
+
+    def _end_pre(self) -> None:
+        text, self._pre = "".join(self._pre).strip("\n"), None
+        if text.strip():
+            for line in ["```", *text.splitlines(), "```"]:
+                self._emit(line.rstrip(), "pre")
+
+    def _end_cell(self) -> None:
+        table = self._tables[-1] if self._tables else None
+        if table is None or table["cell"] is None:
+            return
+        # Links, buttons or selects left open in the cell are written into it
+        while self._wrappers:
+            self._close_wrapper(self._wrappers[-1].tag)
+        cell, table["cell"] = table["cell"], None
+        if table["row"] is None:
+            table["row"] = []
+        table["row"].append(_collapse("".join(cell)).replace("|", "\\|"))
+
+    def _end_row(self) -> None:
+        table = self._tables[-1] if self._tables else None
+        if table is None:
+            return
+        self._end_cell()
+        row, table["row"] = table["row"], None
+        if row and any(row):
+            table["rows"].append(row)
+
+    def _end_table(self) -> None:
+        self._end_row()
+        table = self._tables.pop()
+        rows = table["rows"]
+        if not rows:
+            return
+        width = max(len(row) for row in rows)
+        if self._inline_only():
+            # Nested table: its cells become text of the enclosing cell
+            self._write(" " + " ; ".join(" ".join(cell for cell in row if cell) for row in rows) + " ")
+            return
+        if width == 1 or len(rows) == 1 and not table["header"]:
+            # Layout table: one line per cell
+            for row in rows:
+                for cell in row:
+                    if cell:
+                        self._emit(cell)
+            return
+        for index, row in enumerate(rows):
+            cells = row + [""] * (width - len(row))
+            self._emit("| " + " | ".join(cells) + " |", "table")
+            if index == 0:
+                self._emit("|" + " --- |" * width, "table")
+
+    def result(self) -> str:
+        """Return the markdown of everything fed so far (call close() first)."""
+        while self._wrappers:
+            self._close_wrapper(self._wrappers[-1].tag)
+        while self._tables:
+            self._end_table()
+        if self._pre is not None:
+            self._end_pre()
+        self._break()
+        title = _collapse(self.title)
+        lines = [f"Title: {title}"] if title else []
+        previous_kind = "title"
+        for kind, line in self._lines:
+            if lines and (kind == "block" or kind != previous_kind):
+                lines.append("")
+            lines.append(line)
+            previous_kind = kind
+        return "\n".join(lines)
+
+
+def condense_html(html: str, base_url: Optional[str] = None) -> str:
+    """Condense page HTML to markdown.
+
+    Args:
+        html: Page HTML
+        base_url: URL of the page; relative link targets are resolved against it
+
+    Returns:
+        Markdown text of the page's content, links and form controls
+    """
+    condenser = HtmlCondenser(base_url=base_url)
+    condenser.feed(html)
+    condenser.close()
+    return condenser.result()
@@ -14,6 +14,7 @@ from typing import Any, Dict, List
 from openai import OpenAI
 from .utils import get_logger, colorize
 from .tools import get_browser_tools, get_unified_tools, map_tool_call_to_action
+from .images import image_settings, prepare_image
 
 # Try to import Gemini libraries
 try:
@@ -125,11 +126,12 @@ Task:
 #### DOM Actions (Selector-based, no vision required)
 
 **Observation Actions:**
-- `dom_get_text()`: Get page text (innerText of body, truncated if long)
-- `dom_get_html()`: Get page HTML (truncated if long)
+- `dom_get_text(offset?, length?, page?)`: Get page text (innerText of body). Long text comes in windows of `length` characters (default 8000); read on with the `offset` (or `page`) named at the end of a truncated result
+- `dom_get_html(offset?, length?, page?, format?)`: Get the page condensed to markdown (headings, text, lists, tables, links, form controls with id/name), in windows like `dom_get_text` (default length 12000). Pass `format="html"` for the raw HTML
 - `dom_query_selector(selector, limit?)`: List elements with detailed attributes (tag, id, class, name, type, href, aria-label, role, text). Use to identify precise selectors before clicking.
 - `dom_extract_links(filter_pattern?, limit?)`: Extract links (text + href) optionally filtered by substring
-- `dom_mark_elements(max_elements?)`: **[REQUIRED FIRST STEP]** Mark all interactive elements with unique BIDs and return structured list. Use this FIRST to get a comprehensive view of clickable/interactive elements with their attributes. Then use the BIDs with interaction actions below.
+- `dom_mark_elements(max_elements?, incremental?)`: **[REQUIRED FIRST STEP]** Mark all interactive elements with unique BIDs and return structured list. Use this FIRST to get a comprehensive view of clickable/interactive elements with their attributes. Then use the BIDs with interaction actions below. With `incremental=true`, BIDs stay stable and later calls on the same page return only added, changed and removed elements; if the list looks stale, call it again without `incremental` for a full rescan.
+- `dom_snapshot(max_tokens?)`: Compact accessibility-tree outline of the whole page (roles, names, values, states) with BIDs on interactive nodes. Use it to understand page structure cheaply; its BIDs replace those from `dom_mark_elements`.
 
 **DOM Interaction Actions (Use BIDs from dom_mark_elements):**
 - `dom_click(bid, button?, click_count?, timeout_ms?)`: Click an element by its BID (obtained from dom_mark_elements)
@@ -137,6 +139,7 @@ Task:
 - `dom_type(bid, text, clear_first?, timeout_ms?)`: Type text into an element by its BID
 - `dom_press(key, bid?, timeout_ms?)`: Press a key on an element by its BID (or on the page if bid not provided)
 - `dom_scroll(bid?, direction?, amount?, timeout_ms?)`: Scroll an element by its BID (or scroll the page if bid not provided). Returns scroll position info including whether at top/bottom/left/right.
+- `dom_batch(steps, stop_on_error?)`: Run several of the actions above in one call, e.g. `steps=[{{"action": "dom_type", "bid": "bid3", "text": "Alice"}}, {{"action": "dom_type", "bid": "bid4", "text": "Smith"}}, {{"action": "dom_click", "bid": "bid7"}}]`. Stops at the first failed step by default. Use it to fill forms in one iteration.
 
 **Note**: Always use `dom_mark_elements` first to get BIDs, then use DOM interaction actions. These are more reliable than on-screen actions and don't require visual verification.
 
@@ -175,7 +178,7 @@ Task:
   - **Then use**: `dom_click(bid)`, `dom_type(bid, text)`, `dom_hover(bid)`, `dom_press(bid, key)`, `dom_scroll(bid, direction)` with the BIDs from `dom_mark_elements`
   - DOM operations are more reliable, faster, and don't require visual verification
   - **CRITICAL: BIDs are DYNAMIC and TEMPORARY**
-    - BIDs are reassigned every time you run `dom_mark_elements()`
+    - BIDs are reassigned every time you run `dom_mark_elements()` (except with `incremental=true`, where unchanged elements keep their BIDs)
     - **NEVER reuse old BIDs** from previous `dom_mark_elements()` calls
     - If a click fails with "No element found with BID", the BID is stale - you MUST run `dom_mark_elements()` again to get fresh BIDs
     - After any page change (navigation, modal open/close, element state change), run `dom_mark_elements()` again
@@ -427,11 +430,12 @@ Task:
 #### DOM Actions (Selector-based, no vision required)
 
 **Observation Actions:**
-- `dom_get_text()`: Get page text (innerText of body, truncated if long)
-- `dom_get_html()`: Get page HTML (truncated if long)
+- `dom_get_text(offset?, length?, page?)`: Get page text (innerText of body). Long text comes in windows of `length` characters (default 8000); read on with the `offset` (or `page`) named at the end of a truncated result
+- `dom_get_html(offset?, length?, page?, format?)`: Get the page condensed to markdown (headings, text, lists, tables, links, form controls with id/name), in windows like `dom_get_text` (default length 12000). Pass `format="html"` for the raw HTML
 - `dom_query_selector(selector, limit?)`: List elements with detailed attributes (tag, id, class, name, type, href, aria-label, role, text). Use to identify precise selectors before clicking.
 - `dom_extract_links(filter_pattern?, limit?)`: Extract links (text + href) optionally filtered by substring
-- `dom_mark_elements(max_elements?)`: **[REQUIRED FIRST STEP]** Mark all interactive elements with unique BIDs and return structured list. Use this FIRST to get a comprehensive view of clickable/interactive elements with their attributes. Then use the BIDs with interaction actions below.
+- `dom_mark_elements(max_elements?, incremental?)`: **[REQUIRED FIRST STEP]** Mark all interactive elements with unique BIDs and return structured list. Use this FIRST to get a comprehensive view of clickable/interactive elements with their attributes. Then use the BIDs with interaction actions below. With `incremental=true`, BIDs stay stable and later calls on the same page return only added, changed and removed elements; if the list looks stale, call it again without `incremental` for a full rescan.
+- `dom_snapshot(max_tokens?)`: Compact accessibility-tree outline of the whole page (roles, names, values, states) with BIDs on interactive nodes. Use it to understand page structure cheaply; its BIDs replace those from `dom_mark_elements`.
 
 **DOM Interaction Actions (Use BIDs from dom_mark_elements):**
 - `dom_click(bid, button?, click_count?, timeout_ms?)`: Click an element by its BID (obtained from dom_mark_elements)
@@ -439,6 +443,7 @@ Task:
 - `dom_type(bid, text, clear_first?, timeout_ms?)`: Type text into an element by its BID
 - `dom_press(key, bid?, timeout_ms?)`: Press a key on an element by its BID (or on the page if bid not provided)
 - `dom_scroll(bid?, direction?, amount?, timeout_ms?)`: Scroll an element by its BID (or scroll the page if bid not provided). Returns scroll position info including whether at top/bottom/left/right.
+- `dom_batch(steps, stop_on_error?)`: Run several of the actions above in one call, e.g. `steps=[{{"action": "dom_type", "bid": "bid3", "text": "Alice"}}, {{"action": "dom_type", "bid": "bid4", "text": "Smith"}}, {{"action": "dom_click", "bid": "bid7"}}]`. Stops at the first failed step by default. Use it to fill forms in one iteration.
 
 **Note**: Always use `dom_mark_elements` first to get BIDs, then use DOM interaction actions. These are more reliable than on-screen actions and don't require visual verification.
 
@@ -477,7 +482,7 @@ Task:
   - **Then use**: `dom_click(bid)`, `dom_type(bid, text)`, `dom_hover(bid)`, `dom_press(bid, key)`, `dom_scroll(bid, direction)` with the BIDs from `dom_mark_elements`
   - DOM operations are more reliable, faster, and don't require visual verification
   - **CRITICAL: BIDs are DYNAMIC and TEMPORARY**
-    - BIDs are reassigned every time you run `dom_mark_elements()`
+    - BIDs are reassigned every time you run `dom_mark_elements()` (except with `incremental=true`, where unchanged elements keep their BIDs)
     - **NEVER reuse old BIDs** from previous `dom_mark_elements()` calls
     - If a click fails with "No element found with BID", the BID is stale - you MUST run `dom_mark_elements()` again to get fresh BIDs
     - After any page change (navigation, modal open/close, element state change), run `dom_mark_elements()` again
@@ -752,6 +757,10 @@ class Controller:
         """Optional hook for controllers that maintain conversation history with tool outputs."""
         return
 
+    def restore_history(self, messages: List[Dict[str, Any]]) -> None:
+        """Optional hook to restore conversation history, e.g. when resuming from a checkpoint."""
+        return
+
 
 # OpenAI API Pricing (per 1M tokens)
 OPENAI_PRICING = {
@@ -909,6 +918,9 @@ def calculate_cost(usage, model_name: str) -> float:
 
 class BaseLLM(Controller):
     """Base class for LLM controllers with common functionality."""
+
+    # Key into PROVIDER_IMAGE_SETTINGS (images.py) for this provider's image limits
+    IMAGE_PROVIDER = "openai"
     
     def __init__(self, llm_config: Dict[str, Any] | None = None, client_type: str = "shell", **kwargs):
         """Initialize base LLM controller.
@@ -937,6 +949,8 @@ class BaseLLM(Controller):
         self.client_type = client_type
         self.use_tools = client_type in ["browser", "file", "code", "jupyter", "shell", "unified"]
         self.max_parse_retries = max(1, int(llm_config.get("max_parse_retries", 2)))
+        # Downscaling/re-encoding applied to images before they are attached to a message
+        self.image_settings = image_settings(self.IMAGE_PROVIDER, llm_config.get("image"))
         
         # Load appropriate tools based on client type
         if self.use_tools:
@@ -985,7 +999,7 @@ class BaseLLM(Controller):
                 message_content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/png;base64,{img_base64}"
+                        "url": self._image_url(img_base64)
                     }
                 })
             logger.debug(f"Adding {len(images_base64)} image(s) to message")
@@ -994,6 +1008,15 @@ class BaseLLM(Controller):
             # Regular text message
             return prompt
     
+    def _encode_image(self, img_base64: str) -> tuple[str, str]:
+        """Apply the provider's image settings, returning (base64 data, media type)."""
+        return prepare_image(img_base64, self.image_settings)
+
+    def _image_url(self, img_base64: str) -> str:
+        """Return a data URL for an image after applying the provider's image settings."""
+        data, media_type = self._encode_image(img_base64)
+        return f"data:{media_type};base64,{data}"
+
     def _handle_api_response(self, response: Any, attempt: int, max_attempts: int) -> Dict[str, Any]:
         """Handle API response and parse into action format.
         
@@ -1200,6 +1223,11 @@ class BaseLLM(Controller):
         self.messages = []
         # Note: Cost tracking is NOT reset on clear_history to maintain cumulative cost
     
+    def restore_history(self, messages: List[Dict[str, Any]]) -> None:
+        """Replace the message history with previously recorded messages."""
+        logger.debug(f"Restoring message history ({len(messages)} messages)")
+        self.messages = list(messages)
+    
     def get_cost_stats(self) -> Dict[str, Any]:
         """Get API cost and usage statistics.
         
@@ -1315,6 +1343,8 @@ class BaseLLM(Controller):
 class OpenAILLM(BaseLLM):
     """Language model client using OpenAI API."""
 
+    IMAGE_PROVIDER = "openai"
+
     def __init__(self, llm_config: Dict[str, Any] | None = None, client_type: str = "shell", **kwargs):
         # Initialize base class first
         super().__init__(llm_config, client_type, **kwargs)
@@ -1384,7 +1414,7 @@ class OpenAILLM(BaseLLM):
                 message_content.append({
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/png;base64,{img_base64}"
+                        "url": self._image_url(img_base64)
                     }
                 })
             logger.debug(f"Adding {len(images_base64)} image(s) to message (total size: {sum(len(img) for img in images_base64)} chars)")
@@ -1651,6 +1681,8 @@ class OpenAILLM(BaseLLM):
 class QwenLLM(OpenAILLM):
     """Language model client for Qwen models (compatible with OpenAI API but with special handling)."""
 
+    IMAGE_PROVIDER = "qwen"
+
     def __init__(self, llm_config: Dict[str, Any] | None = None, client_type: str = "shell", **kwargs):
         super().__init__(llm_config, client_type, **kwargs)
         self.is_qwen_vl_model = "qwen3-vl" in self.model.lower() or "qwen3_vl" in self.model.lower()
@@ -1673,7 +1705,7 @@ class QwenLLM(OpenAILLM):
                     message_content.append({
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/png;base64,{img_base64}"
+                            "url": self._image_url(img_base64)
                         }
                     })
                 message_content.append({
@@ -1691,7 +1723,7 @@ class QwenLLM(OpenAILLM):
                     message_content.append({
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/png;base64,{img_base64}"
+                            "url": self._image_url(img_base64)
                         }
                     })
             
@@ -1934,6 +1966,8 @@ class QwenLLM(OpenAILLM):
 class ClaudeLLM(BaseLLM):
     """Language model client using Anthropic Claude API."""
 
+    IMAGE_PROVIDER = "claude"
+
     def __init__(self, llm_config: Dict[str, Any] | None = None, client_type: str = "shell", **kwargs):
         if not ANTHROPIC_AVAILABLE:
             raise ImportError("Anthropic libraries not available. Install with: pip install anthropic")
@@ -1999,12 +2033,13 @@ class ClaudeLLM(BaseLLM):
             # Add images first (or text first? Claude documentation says text/image order doesn't matter much but usually alternating)
             # The user example has image first then text.
             for img_base64 in images_base64:
+                data, media_type = self._encode_image(img_base64)
                 message_content.append({
                     "type": "image",
                     "source": {
                         "type": "base64",
-                        "media_type": "image/png", # Assuming PNG for now
-                        "data": img_base64,
+                        "media_type": media_type,
+                        "data": data,
                     }
                 })
             
@@ -2201,6 +2236,8 @@ class ClaudeLLM(BaseLLM):
 class GeminiLLM(BaseLLM):
     """Language model client using Google Gemini API."""
 
+    IMAGE_PROVIDER = "gemini"
+
     def __init__(self, llm_config: Dict[str, Any] | None = None, client_type: str = "shell", **kwargs):
         if not GEMINI_AVAILABLE:
             raise ImportError("Google Gemini libraries not available. Install with: pip install google-genai")
@@ -0,0 +1,285 @@
+"""
+JavaScript injected into sandbox pages by the DOM tools.
+
+Scripts are plain module constants so they can be evaluated by the sandbox
+clients and by the benchmarks in benchmarks/ alike.
+"""
+
+# Marks interactive elements with data-cocoa-bid and describes them.
+#
+# Called as page.evaluate(MARK_ELEMENTS_JS, {"maxElements": int, "incremental": bool}).
+# The document is walked once: elements matching the interactive selectors are
+# collected first (as before), other div/span/i/svg elements only when they look
+# clickable. The computed style of an element is read at most once, and the walk
+# stops as soon as enough interactive elements were found.
+#
+# Returns {elements: [{bid, description}]} for a full listing,
+# {unchanged: true, total} when nothing mutated since the last incremental call, or
+# {diff: true, total, added, changed, removed} for later incremental calls.
+# Incremental mode rescans after DOM mutations and after input, hover, focus,
+# resize and CSS transition/animation events; other CSS-only changes (e.g. a
+# stylesheet swap) go unnoticed until a non-incremental call.
+MARK_ELEMENTS_JS = """
+(args) => {
+    const maxElements = args.maxElements;
+    const incremental = args.incremental;
+    let state = window.__cocoaBidState || null;
+
+    if (incremental && state && !state.dirty && state.maxElements === maxElements) {
+        // Nothing mutated since the last call (with the same element cap)
+        return {unchanged: true, total: Object.keys(state.descriptions).length};
+    }
+
+    if (!incremental || !state) {
+        // Clear previous marks (and the observer of an earlier incremental call)
+        if (state) state.observer.disconnect();
+        window.__cocoaBidState = state = null;
+        document.querySelectorAll('[data-cocoa-bid]').forEach(el => {
+            el.removeAttribute('data-cocoa-bid');
+        });
+    }
+
+    // Interactive element selectors
+    const interactiveSelector = [
+        'a[href]',
+        'button',
+        'input',
+        'textarea',
+        'select',
+        '[role="button"]',
+        '[role="link"]',
+        '[role="tab"]',
+        '[role="menuitem"]',
+        '[role="dialog"]',
+        '[role="checkbox"]',
+        '[role="radio"]',
+        '[role="switch"]',
+        '[onclick]',
+        '[contenteditable="true"]',
+        '[class*="close"]',
+        '[class*="dismiss"]',
+        '[class*="cancel"]',
+        '[aria-label*="close" i]',
+        '[aria-label*="dismiss" i]',
+        '[aria-label*="cancel" i]',
+        '[title*="close" i]',
+        '[title*="dismiss" i]',
+        'svg[onclick]',
+        '[data-dismiss]',
+        '[data-close]'
+    ].join(',');
+
+    // Elements that are only marked when they look clickable
+    const containerTags = new Set(['div', 'span', 'i', 'svg']);
+    const interactiveRoles = new Set(['button', 'link', 'tab', 'menuitem', 'checkbox', 'radio', 'switch']);
+    const closeIndicator = /^[×✕✖✗xX]$/;
+
+    // Return the computed style if the element is rendered, else null
+    function renderedStyle(el, style) {
+        style = style || window.getComputedStyle(el);
+        if (style.display === 'none' || style.visibility === 'hidden') return null;
+        // Check if element is actually rendered and not completely transparent
+        if (style.opacity === '0') return null;
+        // Skip elements stacked below the page (negative z-index)
+        if ((parseInt(style.zIndex) || 0) < 0) return null;
+        // Allow small elements (close buttons can be small)
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 && rect.height === 0) return null;
+        return style;
+    }
+
+    // Cheap checks first; the computed style is only read when they fail
+    function clickableStyle(el) {
+        if (el.onclick || el.hasAttribute('onclick') || interactiveRoles.has(el.getAttribute('role'))) {
+            return renderedStyle(el);
+        }
+        if (el.style && el.style.cursor === 'pointer') return renderedStyle(el);
+        if (el.childElementCount === 0 && closeIndicator.test((el.textContent || '').trim())) {
+            return renderedStyle(el);
+        }
+        const style = window.getComputedStyle(el);
+        return style.cursor === 'pointer' ? renderedStyle(el, style) : null;
+    }
+
+    const direct = [];
+    const extra = [];
+    const walker = document.createTreeWalker(document.documentElement, NodeFilter.SHOW_ELEMENT);
+    for (let el = walker.currentNode; el && direct.length < maxElements; el = walker.nextNode()) {
+        if (el.matches(interactiveSelector)) {
+            if (renderedStyle(el)) direct.push(el);
+        } else if (direct.length + extra.length < maxElements
+                   && containerTags.has(el.tagName.toLowerCase())
+                   && clickableStyle(el)) {
+            extra.push(el);
+        }
+    }
+    const elements = direct.concat(extra).slice(0, maxElements);
+
+    const results = [];
+    let nextBid = state ? state.next : 1;
+    for (const el of elements) {
+        // Assign BID (incremental mode keeps the BID an element already has)
+        let bidStr = incremental ? el.getAttribute('data-cocoa-bid') : null;
+        if (!bidStr) {
+            bidStr = `bid${nextBid++}`;
+            el.setAttribute('data-cocoa-bid', bidStr);
+        }
+
+        // Extract element info
+        const tag = el.tagName.toLowerCase();
+        const text = (el.innerText || el.textContent || '').trim().substring(0, 150);
+        const value = el.value || '';
+        const placeholder = el.placeholder || '';
+        const type = el.type || '';
+        const href = el.href || '';
+        const id = el.id || '';
+        const classList = Array.from(el.classList || []).join(' ');
+        const role = el.getAttribute('role') || '';
+        const ariaLabel = el.getAttribute('aria-label') || '';
+        const title = el.title || '';
+        const name = el.name || '';
+        const dataDismiss = el.getAttribute('data-dismiss') || '';
+        const dataClose = el.getAttribute('data-close') || '';
+
+        // Build readable description
+        let description = `<${tag}>`;
+        if (id) description += ` id="${id}"`;
+        if (classList) description += ` class="${classList.substring(0, 80)}"`;
+        if (type) description += ` type="${type}"`;
+        if (role) description += ` role="${role}"`;
+        if (ariaLabel) description += ` aria-label="${ariaLabel}"`;
+        if (title) description += ` title="${title}"`;
+        if (name) description += ` name="${name}"`;
+        if (dataDismiss) description += ` data-dismiss="${dataDismiss}"`;
+        if (dataClose) description += ` data-close="${dataClose}"`;
+        if (text) description += ` text="${text}"`;
+        if (value) description += ` value="${value}"`;
+        if (placeholder) description += ` placeholder="${placeholder}"`;
+        if (href) description += ` href="${href.substring(0, 80)}"`;
+
+        results.push({
+            bid: bidStr,
+            description: description
+        });
+    }
+
+    if (!incremental) {
+        return {elements: results};
+    }
+
+    const descriptions = {};
+    results.forEach(r => { descriptions[r.bid] = r.description; });
+    const previous = state ? state.descriptions : null;
+    if (!state) {
+        state = {next: 1, descriptions: {}, dirty: false};
+        state.observer = new MutationObserver(() => { state.dirty = true; });
+        state.observer.observe(document.documentElement, {
+            childList: true, subtree: true, attributes: true, characterData: true
+        });
+        // Typing changes values, and hovering, resizing and CSS animations change
+        // visibility, without mutating the DOM
+        if (!window.__cocoaBidListeners) {
+            window.__cocoaBidListeners = true;
+            const markDirty = () => {
+                if (window.__cocoaBidState) window.__cocoaBidState.dirty = true;
+            };
+            ['input', 'mouseover', 'focusin', 'transitionend', 'animationend'].forEach(type => {
+                document.addEventListener(type, markDirty, true);
+            });
+            window.addEventListener('resize', markDirty);
+        }
+        window.__cocoaBidState = state;
+    }
+    // Elements that are no longer listed (hidden, or past maxElements) lose their BID
+    document.querySelectorAll('[data-cocoa-bid]').forEach(el => {
+        if (!(el.getAttribute('data-cocoa-bid') in descriptions)) el.removeAttribute('data-cocoa-bid');
+    });
+    state.next = nextBid;
+    state.descriptions = descriptions;
+    state.maxElements = maxElements;
+    // Drop the records caused by our own BID attributes
+    state.observer.takeRecords();
+    state.dirty = false;
+
+    if (!previous) {
+        return {elements: results};
+    }
+    return {
+        diff: true,
+        total: results.length,
+        added: results.filter(r => !(r.bid in previous)),
+        changed: results.filter(r => r.bid in previous && previous[r.bid] !== r.description),
+        removed: Object.keys(previous).filter(b => !(b in descriptions))
+    };
+}
+"""
+
+# Summarizes the elements matched by a selector in one round trip.
+#
+# Called as page.eval_on_selector_all(selector, QUERY_SELECTOR_JS, limit).
+# Returns {total, items: [{tag, text, attrs}]} for the first `limit` matches;
+# attrs only holds the non-empty attributes used in the summary.
+QUERY_SELECTOR_JS = """
+(elements, limit) => {
+    const attrNames = ['id', 'class', 'name', 'type', 'href', 'role', 'aria-label'];
+    const items = elements.slice(0, limit).map(el => {
+        const attrs = {};
+        for (const name of attrNames) {
+            const value = el.getAttribute(name);
+            if (value) attrs[name] = value;
+        }
+        // innerText only exists on HTML elements (matches Playwright's inner_text)
+        const text = el instanceof HTMLElement ? el.innerText : '';
+        return {tag: el.tagName, text: text || '', attrs: attrs};
+    });
+    return {total: elements.length, items: items};
+}
+"""
+
+# Removes all BIDs (and the observer of incremental dom_mark_elements) before
+# another tool assigns fresh ones.
+CLEAR_MARKS_JS = """
+() => {
+    const state = window.__cocoaBidState;
+    if (state) state.observer.disconnect();
+    window.__cocoaBidState = null;
+    document.querySelectorAll('[data-cocoa-bid]').forEach(el => {
+        el.removeAttribute('data-cocoa-bid');
+    });
+}
+"""
+
+# Serializes page content for dom_get_text/dom_get_html unless a cached copy is current.
+#
+# Called as page.evaluate(PAGE_CONTENT_JS, {"kind": "text" | "html", "cached": [key, ...]}).
+# A MutationObserver (installed once per document) counts DOM versions; together
+# with a random per-document id this gives a key "<docId>:<version>" that changes
+# whenever the content may have changed. Returns {url, key, content}, where
+# content is null when key is one of the cached keys.
+PAGE_CONTENT_JS = """
+(args) => {
+    let tracker = window.__cocoaDomVersion;
+    if (!tracker) {
+        tracker = window.__cocoaDomVersion = {
+            docId: Math.random().toString(36).slice(2),
+            version: 0
+        };
+        new MutationObserver(() => { tracker.version++; }).observe(document, {
+            childList: true, subtree: true, attributes: true, characterData: true
+        });
+    }
+    const key = `${tracker.docId}:${tracker.version}`;
+    if (args.cached.includes(key)) {
+        return {url: location.href, key: key, content: null};
+    }
+    let content = '';
+    if (args.kind === 'html') {
+        // Same serialization as Playwright's page.content()
+        if (document.doctype) content = new XMLSerializer().serializeToString(document.doctype);
+        if (document.documentElement) content += document.documentElement.outerHTML;
+    } else {
+        content = document.body ? document.body.innerText : '';
+    }
+    return {url: location.href, key: key, content: content};
+}
+"""
@@ -0,0 +1,352 @@
+"""
+Record and replay of browser network traffic as HAR archives.
+
+In record mode every response the sandbox browser receives is captured over
+CDP (including bodies) and written to `<har dir>/<task name>.har` when the
+browser session closes. In replay mode requests are intercepted with the CDP
+Fetch domain and answered from that archive, so a rerun neither depends on
+nor waits for the live site. Requests missing from the archive go to the
+network (`not_found: fallback`, the default) or fail (`not_found: abort`).
+
+Requests are matched by method, URL and, when they have a body, a hash of the
+body, so POST requests to one endpoint (GraphQL, search forms) get their own
+responses. Bodies CDP leaves out of the request event (large uploads) are
+fetched with Network.getRequestPostData while recording. The archive is also flushed when the task's environment is cleaned
+up, so a task that fails still leaves its recording behind.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .logger import get_logger
+from .utils import write_json_atomic
+
+logger = get_logger("har")
+
+# Response headers that no longer match a body stored decoded
+_DROPPED_REPLAY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def _header_list(headers: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Convert a CDP header dict to HAR name/value pairs."""
+    return [{"name": name, "value": str(value)} for name, value in (headers or {}).items()]
+
+
+def _request_key(method: str, url: str, post_data: Optional[str]) -> tuple:
+    """Key of a request in the archive; the body is part of it only when there is one."""
+    body_hash = hashlib.sha256(post_data.encode("utf-8")).hexdigest() if post_data else None
+    return method, url, body_hash
+
+
+def har_path(har_config: Dict[str, Any], task_name: str) -> Path:
+    """Return the archive path of a task."""
+    return Path(har_config.get("dir", "har")) / f"{task_name}.har"
+
+
+class HarRecorder:
+    """Captures the traffic of the active page over CDP into HAR entries."""
+
+    def __init__(self, path: Path):
+        """Initialize the recorder.
+
+        Args:
+            path: Archive written on detach
+        """
+        self.path = Path(path)
+        self.entries: List[Dict[str, Any]] = []
+        self._requests: Dict[str, Dict[str, Any]] = {}
+        self._pending: set = set()
+        self._page = None
+        self._cdp = None
+
+    def _on_request(self, event: Dict[str, Any]) -> None:
+        request = event.get("request", {})
+        if request.get("url", "").startswith("data:"):
+            return
+        request_id = event["requestId"]
+        # A redirect reuses the request id; the previous hop is complete now
+        if event.get("redirectResponse") and request_id in self._requests:
+            previous = self._requests.pop(request_id)
+            previous["response"] = event["redirectResponse"]
+            self._track(self._store(request_id, previous, self._cdp, fetch_body=False))
+        record = {"request": request, "started": time.time(), "wall_time": event.get("wallTime")}
+        if request.get("hasPostData") and request.get("postData") is None:
+            # CDP leaves large bodies out of the event; fetch them while the request is alive
+            record["post_data"] = asyncio.ensure_future(self._fetch_post_data(request_id, self._cdp))
+        self._requests[request_id] = record
+
+    def _on_response(self, event: Dict[str, Any]) -> None:
+        record = self._requests.get(event["requestId"])
+        if record is not None:
+            record["response"] = event.get("response", {})
+
+    def _on_finished(self, event: Dict[str, Any]) -> None:
+        record = self._requests.pop(event["requestId"], None)
+        if record is None or "response" not in record:
+            return
+        self._track(self._store(event["requestId"], record, self._cdp))
+
+    def _on_failed(self, event: Dict[str, Any]) -> None:
+        self._requests.pop(event["requestId"], None)
+
+    def _track(self, coro) -> None:
+        """Run coro in the background; flush() waits for it."""
+        task = asyncio.ensure_future(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _fetch_post_data(self, request_id: str, cdp) -> Optional[str]:
+        """Return the request body CDP left out of requestWillBeSent, or None."""
+        try:
+            result = await cdp.send("Network.getRequestPostData", {"requestId": request_id})
+            return result.get("postData")
+        except Exception as e:
+            logger.debug(f"No request body recorded for {request_id}: {e}")
+            return None
+
+    async def _store(self, request_id: str, record: Dict[str, Any], cdp, fetch_body: bool = True) -> None:
+        """Fetch the bodies of a finished request and its response and add its entry.
+
+        Args:
+            request_id: CDP request id
+            record: Request record with its response
+            cdp: CDP session the request was seen on
+            fetch_body: False for redirect hops, which have no body of their own
+        """
+        if "post_data" in record:
+            post_data = await record.pop("post_data")
+            if post_data is not None:
+                record["request"] = {**record["request"], "postData": post_data}
+        body = b""
+        if not fetch_body:
+            self.entries.append(self._entry(record, body))
+            return
+        try:
+            result = await cdp.send("Network.getResponseBody", {"requestId": request_id})
+            raw = result.get("body", "")
+            body = base64.b64decode(raw) if result.get("base64Encoded") else raw.encode("utf-8")
+        except Exception as e:
+            # Bodies of some responses (e.g. redirects, evicted resources) are not available
+            logger.debug(f"No body recorded for {record['request'].get('url')}: {e}")
+        self.entries.append(self._entry(record, body))
+
+    def _entry(self, record: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+        """Build a HAR entry from a request record and its body."""
+        request, response = record["request"], record["response"]
+        started = datetime.fromtimestamp(record.get("wall_time") or record["started"], tz=timezone.utc)
+        elapsed_ms = round((time.time() - record["started"]) * 1000, 1)
+        har_request = {
+            "method": request.get("method", "GET"),
+            "url": request.get("url", ""),
+            "httpVersion": response.get("protocol", ""),
+            "headers": _header_list(request.get("headers")),
+            "queryString": [],
+            "headersSize": -1,
+            "bodySize": -1,
+        }
+        if request.get("postData") is not None:
+            har_request["postData"] = {"mimeType": request.get("headers", {}).get("Content-Type", ""), "text": request["postData"]}
+        headers = response.get("headers") or {}
+        return {
+            "startedDateTime": started.isoformat(),
+            "time": elapsed_ms,
+            "request": har_request,
+            "response": {
+                "status": response.get("status", 200),
+                "statusText": response.get("statusText", ""),
+                "httpVersion": response.get("protocol", ""),
+                "headers": _header_list(headers),
+                "content": {
+                    "size": len(body),
+                    "mimeType": response.get("mimeType", ""),
+                    "text": base64.b64encode(body).decode("ascii"),
+                    "encoding": "base64",
+                },
+                "redirectURL": headers.get("location") or headers.get("Location") or "",
+                "headersSize": -1,
+                "bodySize": len(body),
+            },
+            "cache": {},
+            "timings": {"send": 0, "wait": elapsed_ms, "receive": 0},
+        }
+
+    async def attach(self, page) -> None:
+        """Start capturing the traffic of page (no-op if already attached to it)."""
+        if page is self._page and self._cdp is not None:
+            return
+        await self.detach()
+        cdp = await page.context.new_cdp_session(page)
+        cdp.on("Network.requestWillBeSent", self._on_request)
+        cdp.on("Network.responseReceived", self._on_response)
+        cdp.on("Network.loadingFinished", self._on_finished)
+        cdp.on("Network.loadingFailed", self._on_failed)
+        await cdp.send("Network.enable")
+        self._page, self._cdp = page, cdp
+
+    async def flush(self) -> None:
+        """Wait for the pending body downloads and write the archive (capturing goes on)."""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+        self.save()
+
+    async def detach(self) -> None:
+        """Finish pending body downloads, stop capturing and write the archive."""
+        cdp, self._cdp, self._page = self._cdp, None, None
+        if cdp is None:
+            return
+        # Bodies are fetched over this session, so wait for them before closing it
+        await self.flush()
+        try:
+            await cdp.detach()
+        except Exception:
+            pass
+
+    def save(self) -> None:
+        """Write the recorded entries as a HAR 1.2 archive."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        entries = sorted(self.entries, key=lambda entry: entry["startedDateTime"])
+        write_json_atomic(self.path, {"log": {"version": "1.2", "creator": {"name": "cocoa-agent", "version": "0.1.0"}, "entries": entries}})
+        logger.info(f"Recorded {len(entries)} response(s) to {self.path}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the recording counters for the task result."""
+        return {"mode": "record", "path": str(self.path), "entries": len(self.entries)}
+
+
+class HarReplayer:
+    """Answers the active page's requests from a HAR archive via the CDP Fetch domain."""
+
+    def __init__(self, path: Path, not_found: str = "fallback"):
+        """Load the archive.
+
+        Args:
+            path: Archive written by HarRecorder
+            not_found: "fallback" sends unknown requests to the network, "abort" fails them
+        """
+        self.path = Path(path)
+        self.not_found = not_found
+        with open(self.path, "r", encoding="utf-8") as f:
+            entries = json.load(f)["log"]["entries"]
+        # Responses per (method, url, body hash) in recorded order; the last one is reused once exhausted
+        self._responses: Dict[tuple, deque] = defaultdict(deque)
+        for entry in entries:
+            request = entry["request"]
+            key = _request_key(request["method"], request["url"], (request.get("postData") or {}).get("text"))
+            self._responses[key].append(entry["response"])
+        self.hits = 0
+        self.misses = 0
+        self._pending: set = set()
+        self._page = None
+        self._cdp = None
+
+    def _lookup(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the next recorded response for a request, or None."""
+        method, url = request.get("method", "GET"), request.get("url", "")
+        if request.get("hasPostData") and request.get("postData") is None:
+            # CDP leaves out large bodies; take the only recorded body for this request,
+            # else the one recorded without its body
+            candidates = [key for key in self._responses if key[:2] == (method, url)]
+            if len(candidates) == 1:
+                key = candidates[0]
+            else:
+                key = (method, url, None) if (method, url, None) in self._responses else None
+        else:
+            key = _request_key(method, url, request.get("postData"))
+        responses = self._responses.get(key) if key else None
+        if not responses:
+            return None
+        return responses.popleft() if len(responses) > 1 else responses[0]
+
+    def _on_paused(self, event: Dict[str, Any]) -> None:
+        task = asyncio.ensure_future(self._answer(event, self._cdp))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _answer(self, event: Dict[str, Any], cdp) -> None:
+        """Fulfill a paused request from the archive, or continue/fail it."""
+        request = event.get("request", {})
+        response = self._lookup(request)
+        try:
+            if response is None:
+                self.misses += 1
+                if self.not_found == "abort":
+                    await cdp.send("Fetch.failRequest", {"requestId": event["requestId"], "errorReason": "InternetDisconnected"})
+                else:
+                    await cdp.send("Fetch.continueRequest", {"requestId": event["requestId"]})
+                return
+            self.hits += 1
+            headers = [header for header in response.get("headers", []) if header["name"].lower() not in _DROPPED_REPLAY_HEADERS]
+            content = response.get("content", {})
+            body = content.get("text", "")
+            if content.get("encoding") != "base64":
+                body = base64.b64encode(body.encode("utf-8")).decode("ascii")
+            await cdp.send("Fetch.fulfillRequest", {
+                "requestId": event["requestId"],
+                "responseCode": response.get("status", 200),
+                "responseHeaders": headers,
+                "body": body,
+            })
+        except Exception as e:
+            logger.debug(f"Could not answer {request.get('url')} from archive: {e}")
+
+    async def attach(self, page) -> None:
+        """Start answering page's requests from the archive (no-op if already attached)."""
+        if page is self._page and self._cdp is not None:
+            return
+        await self.detach()
+        cdp = await page.context.new_cdp_session(page)
+        cdp.on("Fetch.requestPaused", self._on_paused)
+        await cdp.send("Fetch.enable", {"patterns": [{"urlPattern": "*", "requestStage": "Request"}]})
+        self._page, self._cdp = page, cdp
+        logger.debug(f"Replaying browser traffic from {self.path}")
+
+    async def flush(self) -> None:
+        """Wait until the paused requests are answered."""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    async def detach(self) -> None:
+        """Answer the paused requests, then stop intercepting."""
+        cdp, self._cdp, self._page = self._cdp, None, None
+        if cdp is not None:
+            await self.flush()
+            try:
+                await cdp.detach()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the replay counters for the task result."""
+        return {"mode": "replay", "path": str(self.path), "hits": self.hits, "misses": self.misses}
+
+
+def create_har_hook(har_config: Optional[Dict[str, Any]], task_name: str):
+    """Create the recorder or replayer configured in sandbox.har for a task.
+
+    Args:
+        har_config: Dict with mode ("record" or "replay"), dir and not_found, or None
+        task_name: Name of the task (archive file name)
+
+    Returns:
+        HarRecorder, HarReplayer or None
+    """
+    mode = (har_config or {}).get("mode")
+    if not mode:
+        return None
+    path = har_path(har_config, task_name)
+    if mode == "record":
+        return HarRecorder(path)
+    if mode == "replay":
+        if not path.exists():
+            logger.warning(f"No HAR archive for task '{task_name}' at {path}, browsing live")
+            return None
+        return HarReplayer(path, not_found=har_config.get("not_found", "fallback"))
+    logger.warning(f"Unknown HAR mode '{mode}', expected 'record' or 'replay'")
+    return None
@@ -0,0 +1,121 @@
+"""
+Image processing between the sandbox and the LLM controllers.
+
+Screenshots come out of the sandbox as full-resolution PNGs. Before they are
+attached to a prompt they can be downscaled, converted to grayscale and
+re-encoded as JPEG/WebP according to per-provider settings, which reduces
+vision tokens and upload size. Re-encoding needs Pillow (the `images` extra);
+without it images are passed through unchanged.
+"""
+
+import base64
+import io
+from typing import Any, Dict, Iterable
+
+from .logger import get_logger
+
+# Try to import Pillow for resizing and re-encoding
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = get_logger("images")
+
+# Per-provider defaults; max_width/max_height/max_short_side bound the image (aspect
+# ratio kept), format None keeps the original encoding. Screenshots are re-encoded as
+# JPEG (smaller than PNG, most of all for pages with photos) and not sent larger than
+# the provider downsamples them anyway: Claude to a 1568px long edge, OpenAI (high
+# detail) to a 768px short side, Gemini in 768px tiles, Qwen-VL to about 1M pixels.
+# Override with controller.args.image (e.g. {"format": null} to keep PNG).
+PROVIDER_IMAGE_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "openai": {"max_width": 2048, "max_height": 2048, "max_short_side": 768, "format": "jpeg", "quality": 85, "grayscale": False},
+    "qwen": {"max_width": 1280, "max_height": 1280, "format": "jpeg", "quality": 85, "grayscale": False},
+    "claude": {"max_width": 1568, "max_height": 1568, "format": "jpeg", "quality": 85, "grayscale": False},
+    "gemini": {"max_width": 1536, "max_height": 1536, "format": "jpeg", "quality": 85, "grayscale": False},
+}
+
+# Whether the missing-Pillow warning was already logged (once per process)
+_pil_warning_logged = False
+
+_FORMAT_MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp", "gif": "image/gif"}
+
+
+def read_chunks(chunks: Iterable[bytes]) -> bytes:
+    """Collect a streamed download into one bytes object in linear time."""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+    return bytes(buffer)
+
+
+def detect_media_type(data: bytes) -> str:
+    """Guess an image media type from its magic bytes (defaults to image/png)."""
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data.startswith(b"GIF8"):
+        return "image/gif"
+    return "image/png"
+
+
+def image_settings(provider: str, overrides: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """Return the image settings of a provider with config overrides applied."""
+    return {**PROVIDER_IMAGE_SETTINGS.get(provider, PROVIDER_IMAGE_SETTINGS["openai"]), **(overrides or {})}
+
+
+def prepare_image(image_base64: str, settings: Dict[str, Any]) -> tuple[str, str]:
+    """Downscale and re-encode an image according to settings.
+
+    Args:
+        image_base64: Base64-encoded image
+        settings: max_width, max_height, max_short_side, format ("jpeg", "webp", "png" or None to keep),
+                  quality (JPEG/WebP) and grayscale
+
+    Returns:
+        Tuple of (base64 image, media type). The input is returned unchanged if nothing
+        needs to change, Pillow is missing or the image cannot be decoded.
+    """
+    data = base64.b64decode(image_base64)
+    media_type = detect_media_type(data)
+    if not PIL_AVAILABLE:
+        global _pil_warning_logged
+        if not _pil_warning_logged and any(settings.get(key) for key in ("max_width", "max_height", "max_short_side", "format", "grayscale")):
+            _pil_warning_logged = True
+            logger.warning("Pillow is not installed; images are sent without downscaling or re-encoding "
+                           "(install the 'images' extra)")
+        return image_base64, media_type
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            max_width = settings.get("max_width") or image.width
+            max_height = settings.get("max_height") or image.height
+            max_short_side = settings.get("max_short_side") or min(image.width, image.height)
+            scale = min(1.0, max_width / image.width, max_height / image.height, max_short_side / min(image.width, image.height))
+            target_format = (settings.get("format") or media_type.split("/")[1]).lower()
+            target_format = "jpeg" if target_format == "jpg" else target_format
+            grayscale = settings.get("grayscale", False)
+            if scale == 1.0 and not grayscale and _FORMAT_MEDIA_TYPES.get(target_format) == media_type:
+                return image_base64, media_type
+
+            if scale < 1.0:
+                size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                image = image.resize(size, Image.LANCZOS)
+            if grayscale:
+                image = image.convert("L")
+            elif target_format == "jpeg" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+
+            output = io.BytesIO()
+            save_args = {"quality": settings.get("quality", 85)} if target_format in ("jpeg", "webp") else {"optimize": True}
+            image.save(output, format=target_format.upper(), **save_args)
+    except Exception as e:
+        logger.warning(f"Could not process image, sending it unchanged: {e}")
+        return image_base64, media_type
+
+    processed = output.getvalue()
+    logger.debug(f"Processed image: {len(data)} -> {len(processed)} bytes ({target_format})")
+    return base64.b64encode(processed).decode("utf-8"), _FORMAT_MEDIA_TYPES.get(target_format, "image/png")
@@ -0,0 +1,65 @@
+"""
+Cache of serialized page content for paginated dom_get_text/dom_get_html reads.
+
+Serializing a long page over CDP is the expensive part of these tools, and
+reading past the first window used to mean serializing it again. Entries are
+keyed by content kind, URL and the DOM version reported by PAGE_CONTENT_JS (a
+per-document id plus a mutation counter), so a page is serialized once per
+DOM state and later windows are sliced from the cache.
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Entries kept (pages visited back and forth within a task)
+MAX_ENTRIES = 8
+
+
+class PageContentCache:
+    """Small LRU cache of page content by (kind, url, DOM version key)."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+
+    def keys_for(self, kind: str) -> List[str]:
+        """Return the DOM version keys cached for a content kind (sent to the page)."""
+        return [key for entry_kind, _, key in self._entries if entry_kind == kind]
+
+    def get(self, kind: str, url: str, key: str) -> Optional[str]:
+        """Return cached content, or None."""
+        content = self._entries.get((kind, url, key))
+        if content is not None:
+            self._entries.move_to_end((kind, url, key))
+        return content
+
+    def put(self, kind: str, url: str, key: str, content: str) -> None:
+        """Store content, evicting the least recently used entries."""
+        self._entries[(kind, url, key)] = content
+        self._entries.move_to_end((kind, url, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries (new task or sandbox)."""
+        self._entries.clear()
+
+
+def page_window(content: str, offset: int = 0, length: int = 8000, page: Optional[int] = None) -> Dict[str, int | str]:
+    """Cut a window out of page content.
+
+    Args:
+        content: Full page content
+        offset: First character of the window
+        length: Window size in characters
+        page: 1-based page number of windows of `length` characters; overrides offset
+
+    Returns:
+        Dict with text, start, end and total (characters)
+    """
+    length = max(1, int(length))
+    if page is not None:
+        offset = (max(1, int(page)) - 1) * length
+    start = min(max(0, int(offset)), len(content))
+    end = min(start + length, len(content))
+    return {"text": content[start:end], "start": start, "end": end, "total": len(content)}
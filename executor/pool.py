@@ -0,0 +1,273 @@
+"""
+Pool of pre-started sandbox containers.
+
+Containers are grouped by task image (see build_context_hash), so every task
+whose environment hashes the same can lease any idle container of that image.
+After a task, the container is either reset (workspace, browser, shell and
+Jupyter state) and returned to the pool, or torn down and replaced in the
+background. The pool is shared by all sandbox clients of a process.
+
+The number of idle containers over all images is capped (max_idle); when a
+sweep moves on to other images, the idle containers of the least recently
+leased images are removed first.
+
+A reset does not isolate tasks completely: browser profile storage
+(localStorage, IndexedDB), /tmp and background processes a task started
+survive it. Keep max_reuses at 0 when tasks must not see each other's state.
+"""
+
+import atexit
+import itertools
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .utils import allocate_port, get_logger, release_port
+
+logger = get_logger("pool")
+
+# Pristine copy of /home/gem taken inside each pooled container before its first task
+WORKSPACE_DIR = "/home/gem"
+WORKSPACE_SNAPSHOT = "/tmp/.cocoa-workspace.tar"
+
+
+class SandboxPool:
+    """Keeps up to `size` idle, started containers per task image and `max_idle` in total."""
+
+    def __init__(self, size: int = 2, max_reuses: int = 0, base_port: int = 8100, max_idle: Optional[int] = None):
+        """Initialize the pool.
+
+        Args:
+            size: Number of idle containers to keep per image
+            max_reuses: How many times a container is reset and reused before it is
+                replaced; 0 replaces it after every task (not isolated otherwise, see module docstring)
+            base_port: First host port tried for pooled containers
+            max_idle: Idle (and starting) containers kept over all images; defaults to 2 * size
+        """
+        self.size = size
+        self.max_reuses = max_reuses
+        self.base_port = base_port
+        self.max_idle = max_idle if max_idle is not None else 2 * size
+        self._idle: Dict[str, List[Dict[str, Any]]] = {}
+        self._starting: Dict[str, int] = {}
+        # Images by last lease, least recently leased first (eviction order)
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._leased: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, size), thread_name_prefix="sandbox-pool")
+        self._closed = False
+
+    def _new_container(self, task: Dict[str, Any], image_name: str, starter: Callable) -> Optional[Dict[str, Any]]:
+        """Start one container for the image via starter(task, port, names)."""
+        tag = image_name.rsplit(":", 1)[-1]
+        project_name = f"cocoa-pool-{tag}-{next(self._counter)}"
+        port = allocate_port(self.base_port)
+        environment = starter(task, port, (f"{project_name}-container", project_name))
+        if environment is None:
+            release_port(port)
+            return None
+        environment.update({"image": image_name, "uses": 0, "snapshot": False})
+        return environment
+
+    def _make_room(self, image_name: str, count: int) -> int:
+        """Evict idle containers of less recently leased images so `count` more fit under max_idle.
+
+        Must be called with the lock held; the evicted containers are torn down in the background.
+
+        Returns:
+            How many of the `count` containers fit
+        """
+        total = sum(len(envs) for envs in self._idle.values()) + sum(self._starting.values())
+        for other in list(self._recent):
+            if total + count <= self.max_idle:
+                break
+            if other == image_name:
+                continue
+            while self._idle.get(other) and total + count > self.max_idle:
+                environment = self._idle[other].pop(0)
+                total -= 1
+                logger.debug(f"Evicting idle container {environment['container_id']} of {other}")
+                self._executor.submit(self._destroy, environment)
+        return max(0, min(count, self.max_idle - total))
+
+    def _replenish(self, task: Dict[str, Any], image_name: str, starter: Callable) -> None:
+        """Start containers in the background until the image has `size` idle or starting ones (within max_idle)."""
+        with self._lock:
+            if self._closed:
+                return
+            missing = self.size - len(self._idle.get(image_name, [])) - self._starting.get(image_name, 0)
+            if missing <= 0:
+                return
+            missing = self._make_room(image_name, missing)
+            if missing <= 0:
+                return
+            self._starting[image_name] = self._starting.get(image_name, 0) + missing
+
+        def start_one() -> None:
+            try:
+                environment = self._new_container(task, image_name, starter)
+            except Exception as e:
+                logger.error(f"Failed to start pooled container for {image_name}: {e}")
+                environment = None
+            with self._lock:
+                self._starting[image_name] -= 1
+                if environment is not None and not self._closed:
+                    self._idle.setdefault(image_name, []).append(environment)
+                    return
+            if environment is not None:
+                self._destroy(environment)
+
+        for _ in range(missing):
+            self._executor.submit(start_one)
+
+    def warm(self, task: Dict[str, Any], image_name: str, starter: Callable) -> None:
+        """Make sure idle containers for the task's image are being prepared."""
+        self._replenish(task, image_name, starter)
+
+    def lease(self, task: Dict[str, Any], image_name: str, starter: Callable) -> Optional[Dict[str, Any]]:
+        """Take an idle container for the task's image, starting one if none is idle.
+
+        Args:
+            task: Task that will run in the container
+            image_name: Image the task needs
+            starter: Callable(task, port, (container_name, project_name)) that starts a
+                compose project and returns its environment dict, or None on failure
+
+        Returns:
+            Environment dict of the leased container, or None if none could be started
+        """
+        with self._lock:
+            self._recent[image_name] = None
+            self._recent.move_to_end(image_name)
+            idle = self._idle.get(image_name, [])
+            environment = idle.pop(0) if idle else None
+        if environment is None:
+            logger.info(f"No idle pooled container for {image_name}, starting one")
+            environment = self._new_container(task, image_name, starter)
+        else:
+            logger.info(f"Leased pooled container {environment['container_id']} (used {environment['uses']} times)")
+        self._replenish(task, image_name, starter)
+        if environment is None:
+            return None
+
+        environment["task_name"] = task.get("task_name", "task")
+        with self._lock:
+            self._leased[environment["container_id"]] = environment
+        return environment
+
+    def snapshot_workspace(self, environment: Dict[str, Any]) -> None:
+        """Save the pristine workspace of a container before its first task (needed for reset)."""
+        if environment["snapshot"] or self.max_reuses <= 0:
+            return
+        result = subprocess.run(
+            ["docker", "exec", "-u", "root", environment["container_id"],
+             "tar", "-C", WORKSPACE_DIR, "-cf", WORKSPACE_SNAPSHOT, "."],
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+        if result.returncode == 0:
+            environment["snapshot"] = True
+        else:
+            logger.warning(f"Failed to snapshot workspace of {environment['container_id']}: {result.stderr}")
+
+    def _restore_workspace(self, environment: Dict[str, Any]) -> bool:
+        """Replace the container's workspace with its snapshot."""
+        if not environment["snapshot"]:
+            return False
+        script = (
+            f"find {WORKSPACE_DIR} -mindepth 1 -delete && "
+            f"tar -C {WORKSPACE_DIR} -xpf {WORKSPACE_SNAPSHOT}"
+        )
+        result = subprocess.run(
+            ["docker", "exec", "-u", "root", environment["container_id"], "sh", "-c", script],
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+        if result.returncode != 0:
+            logger.warning(f"Failed to restore workspace of {environment['container_id']}: {result.stderr}")
+            return False
+        return True
+
+    def release(self, environment: Dict[str, Any], reusable: bool = True) -> None:
+        """Return a leased container after its task.
+
+        The container goes back to the pool if reuse is enabled, it has uses left,
+        the caller could reset its services (reusable) and its workspace was restored.
+        Otherwise it is torn down; lease() already started its replacement.
+
+        Args:
+            environment: Environment dict returned by lease
+            reusable: False if the caller failed to reset browser/shell/Jupyter state
+        """
+        with self._lock:
+            self._leased.pop(environment["container_id"], None)
+        environment["uses"] += 1
+        if (
+            reusable
+            and not self._closed
+            and environment["uses"] <= self.max_reuses
+            and self._restore_workspace(environment)
+        ):
+            with self._lock:
+                if len(self._idle.get(environment["image"], [])) < self.size and self._make_room(environment["image"], 1):
+                    self._idle.setdefault(environment["image"], []).append(environment)
+                    logger.debug(f"Returned container {environment['container_id']} to the pool")
+                    return
+        if self._closed:
+            self._destroy(environment)
+        else:
+            self._executor.submit(self._destroy, environment)
+
+    def _destroy(self, environment: Dict[str, Any]) -> None:
+        """Tear down a pooled container's compose project and free its port."""
+        logger.debug(f"Removing pooled container {environment['container_id']}")
+        try:
+            subprocess.run(
+                ["docker", "compose", "-p", environment["project_name"],
+                 "-f", f"{environment['task_dir']}/docker-compose.yaml", "down"],
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
+        except subprocess.TimeoutExpired:
+            logger.error(f"Timed out removing pooled container {environment['container_id']}")
+        finally:
+            release_port(environment["port"])
+
+    def close(self) -> None:
+        """Tear down all idle and leased containers (called at interpreter exit)."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            environments = [env for envs in self._idle.values() for env in envs]
+            environments += list(self._leased.values())
+            self._idle.clear()
+            self._leased.clear()
+        self._executor.shutdown(wait=True)
+        for environment in environments:
+            self._destroy(environment)
+
+
+_pool: Optional[SandboxPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(pool_config: Dict[str, Any]) -> SandboxPool:
+    """Return the process-wide pool, creating it from the `sandbox.pool` config on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(
+                size=pool_config.get("size", 2),
+                max_reuses=pool_config.get("max_reuses", 0),
+                base_port=pool_config.get("base_port", 8100),
+                max_idle=pool_config.get("max_idle"),
+            )
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,131 @@
+"""
+Readiness probing for sandbox containers.
+
+Instead of sleeping a fixed interval between health checks, services are probed
+right away and then with capped exponential backoff, so a container that comes
+up in under a second is used in under a second. Each service the task needs is
+probed separately and the time until it answered is recorded.
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterable
+
+import requests
+
+from .logger import get_logger
+
+logger = get_logger("readiness")
+
+# Endpoint answering once each sandbox service is up
+SERVICE_ENDPOINTS = {
+    "api": "/v1/sandbox",
+    "browser": "/v1/browser/info",
+    "shell": "/v1/shell/sessions",
+    "jupyter": "/v1/jupyter/info",
+}
+
+
+def _response_ok(response: requests.Response) -> bool:
+    """Return True for a 200 response whose JSON body (if any) does not report failure."""
+    if response.status_code != 200:
+        return False
+    try:
+        body = response.json()
+    except ValueError:
+        return True
+    return not (isinstance(body, dict) and body.get("success") is False)
+
+
+def _browser_ok(response: requests.Response) -> bool:
+    """The browser is ready once its info reports a CDP endpoint."""
+    if not _response_ok(response):
+        return False
+    data = response.json().get("data") or {}
+    return bool(data.get("cdp_url"))
+
+
+def make_http_probes(
+    session: requests.Session,
+    base_url: str,
+    services: Iterable[str],
+    probe_timeout: float = 2.0,
+) -> Dict[str, Callable[[], bool]]:
+    """Build one probe per service that GETs its endpoint over a shared session.
+
+    Args:
+        session: HTTP session reused by all probes (keeps the connection alive)
+        base_url: Sandbox base URL
+        services: Names from SERVICE_ENDPOINTS
+        probe_timeout: Timeout of a single probe request in seconds
+
+    Returns:
+        Mapping of service name to a callable returning True once the service answers
+    """
+    def make_probe(service: str) -> Callable[[], bool]:
+        url = f"{base_url}{SERVICE_ENDPOINTS[service]}"
+        check = _browser_ok if service == "browser" else _response_ok
+
+        def probe() -> bool:
+            try:
+                return check(session.get(url, timeout=probe_timeout))
+            except (requests.RequestException, ValueError):
+                return False
+        return probe
+
+    probes = {}
+    for service in services:
+        if service not in SERVICE_ENDPOINTS:
+            logger.warning(f"Unknown sandbox service '{service}', skipping readiness probe")
+            continue
+        probes[service] = make_probe(service)
+    return probes
+
+
+def wait_until_ready(
+    probes: Dict[str, Callable[[], bool]],
+    timeout: float,
+    initial_delay: float = 0.05,
+    max_delay: float = 1.0,
+    backoff: float = 2.0,
+) -> Dict[str, Any]:
+    """Run probes until all pass or the timeout expires.
+
+    A probe that passed is not run again. Between rounds the delay starts at
+    initial_delay and is multiplied by backoff up to max_delay.
+
+    Args:
+        probes: Mapping of service name to probe callable
+        timeout: Maximum total wait in seconds
+        initial_delay: Delay after the first failed round
+        max_delay: Upper bound of the delay between rounds
+        backoff: Multiplier applied to the delay after each failed round
+
+    Returns:
+        Dict with "ready" (bool), "time_to_ready" (seconds until the last service
+        answered, or None), "services" (seconds per service, None if it never
+        answered) and "probes" (number of probe rounds)
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    services: Dict[str, float | None] = {name: None for name in probes}
+    delay = initial_delay
+    rounds = 0
+
+    while True:
+        rounds += 1
+        for name, probe in probes.items():
+            if services[name] is None and probe():
+                services[name] = round(time.monotonic() - start, 3)
+                logger.debug(f"Sandbox service '{name}' ready after {services[name]}s")
+
+        pending = [name for name, elapsed in services.items() if elapsed is None]
+        now = time.monotonic()
+        if not pending:
+            time_to_ready = round(now - start, 3)
+            return {"ready": True, "time_to_ready": time_to_ready, "services": services, "probes": rounds}
+        if now >= deadline:
+            logger.error(f"Sandbox services not ready within {timeout} seconds: {', '.join(pending)}")
+            return {"ready": False, "time_to_ready": None, "services": services, "probes": rounds}
+
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * backoff, max_delay)
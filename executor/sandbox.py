@@ -2,15 +2,33 @@
 Helper functions for executor operations.
 """
 
+import asyncio
+import hashlib
+import re
+import threading
 import time
 import subprocess
 import json
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 from pathlib import Path
-import requests
-from .utils import retry_request, validate_response, get_logger, colorize
-
-from agent_sandbox import Sandbox
+from concurrent.futures import ThreadPoolExecutor
+from .utils import (
+    DEFAULT_HTTP_CONFIG, validate_response, get_logger, colorize, allocate_port, release_port, create_http_session
+)
+from .pool import SandboxPool, get_pool
+from .readiness import make_http_probes, wait_until_ready
+from .browser_session import BrowserSession, run_coroutine
+from .images import read_chunks
+from .dom_scripts import CLEAR_MARKS_JS, MARK_ELEMENTS_JS, PAGE_CONTENT_JS, QUERY_SELECTOR_JS
+from .page_cache import PageContentCache, page_window
+from .condense import condense_html
+from .snapshot import build_outline
+from .settle import SettleDetector, describe_settle, settle_config
+from .blocking import ResourceBlocker, resolve_blocking
+from .har import create_har_hook
+from .tools import BROWSER_ACTIONS
+
+from agent_sandbox import RestartRequest, Sandbox
 from agent_sandbox.browser import (
     Action_Click, Action_Typing, Action_Press, Action_Scroll,
     Action_MoveTo, Action_MoveRel, Action_Wait, Action_DoubleClick, Action_RightClick,
@@ -19,10 +37,65 @@ from agent_sandbox.browser import (
 
 logger = get_logger("sandbox")
 
+# Repository of the content-addressed task images (tag = hash of the build context)
+IMAGE_REPOSITORY = "cocoa-task"
+# Build context entries that determine the image; task.yaml and test.py are not copied into it
+BUILD_CONTEXT_FILES = ("Dockerfile", "docker-compose.yaml")
+BUILD_CONTEXT_DIRS = ("assets",)
+# Upper bound for reaching DOMContentLoaded in browser_navigate (Playwright's default)
+NAVIGATION_TIMEOUT_MS = 30000
+
+_image_build_locks: Dict[str, threading.Lock] = {}
+# Images already (re)built by this process; a forced rebuild happens once per image, not per task
+_images_built: set[str] = set()
+
+
+def build_context_hash(task_dir: str) -> str:
+    """
+    Hash the parts of a task directory that go into its Docker image.
+
+    Covers the Dockerfile, docker-compose.yaml and every file under assets/
+    (paths and contents), so identical environments share one image.
+
+    Args:
+        task_dir: Path to the task directory
+
+    Returns:
+        First 16 hex characters of the SHA-256 digest
+    """
+    root = Path(task_dir)
+    paths = [root / name for name in BUILD_CONTEXT_FILES]
+    for dir_name in BUILD_CONTEXT_DIRS:
+        if (root / dir_name).is_dir():
+            paths.extend(sorted(p for p in (root / dir_name).rglob("*") if p.is_file()))
+
+    digest = hashlib.sha256()
+    for path in paths:
+        if not path.is_file():
+            continue
+        digest.update(path.relative_to(root).as_posix().encode("utf-8") + b"\0")
+        digest.update(path.read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def _image_exists(image_name: str) -> bool:
+    """Return True if a local Docker image with this name exists."""
+    result = subprocess.run(
+        ["docker", "image", "inspect", image_name],
+        capture_output=True,
+        text=True,
+        timeout=30
+    )
+    return result.returncode == 0
+
 
 class SandboxClient:
     """Client for communicating with the agent server."""
 
+    # Sandbox services that must answer before a task starts
+    READINESS_SERVICES: tuple[str, ...] = ("api",)
+
     def __init__(self, sandbox_config: Dict[str, Any] | None = None, **kwargs):
         if sandbox_config is None:
             sandbox_config = {}
@@ -32,14 +105,55 @@ class SandboxClient:
         base_url = sandbox_config.get("base_url", kwargs.get("base_url", f"http://localhost:{self.port}"))
 
         self.base_url = base_url.rstrip('/')
+        self._custom_base_url = "base_url" in sandbox_config or "base_url" in kwargs
+        # Rebuild task images even when an image for the same build context exists
+        self.force_rebuild: bool = sandbox_config.get("force_rebuild", kwargs.get("force_rebuild", False))
+        self.build_timeout: int = sandbox_config.get("build_timeout", kwargs.get("build_timeout", 120))
+        # Backoff settings of the readiness probes and the last measurement (see _wait_for_ready)
+        self.readiness_config: Dict[str, Any] = sandbox_config.get("readiness", kwargs.get("readiness", {}))
+        self.readiness: Optional[Dict[str, Any]] = None
+        # Quiet windows and timeout of the settle detection after browser actions (see executor/settle.py)
+        self.settle_config: Dict[str, Any] = sandbox_config.get("settle", kwargs.get("settle", {}))
+        # Resource blocking profile of the browser; task.yaml's resource_blocking overrides it per task
+        self.resource_blocking_config = sandbox_config.get("resource_blocking", kwargs.get("resource_blocking"))
+        self.resource_blocking: Optional[Dict[str, Any]] = resolve_blocking(self.resource_blocking_config)
+        # Record the browser's traffic to / replay it from HAR archives (mode, dir, not_found; see executor/har.py)
+        self.har_config: Optional[Dict[str, Any]] = sandbox_config.get("har", kwargs.get("har"))
+        self.har_task_name: str = "task"
+        # Keep-alive sessions: one retrying for API calls, one failing fast for health/readiness probes
+        http_config = sandbox_config.get("http", kwargs.get("http", {}))
+        self.request_timeout: float = http_config.get("timeout", DEFAULT_HTTP_CONFIG["timeout"])
+        self.http = create_http_session(http_config)
+        self.probe_http = create_http_session(http_config, retries=False)
+        # Worker index when several sandboxes run side by side; keeps container and project names unique
+        self.worker_id: Optional[int] = sandbox_config.get("worker_id", kwargs.get("worker_id"))
         self.container_id: Optional[str] = None
+        self.project_name: Optional[str] = None
         self.task_name: Optional[str] = None
         self.task_dir: Optional[str] = None
 
+        # Background preparation of the next task's environment (see prefetch_environment)
+        self._prefetch: Optional[Dict[str, Any]] = None
+        self._prefetch_executor: Optional[ThreadPoolExecutor] = None
+        # Host ports this client reserved itself and must release
+        self._owned_ports: set[int] = set()
+
+        # Optional pool of pre-started containers (sandbox.pool); the leased one is kept in _lease
+        pool_config = sandbox_config.get("pool", kwargs.get("pool"))
+        self.pool: Optional[SandboxPool] = get_pool(pool_config) if pool_config and not self._custom_base_url else None
+        self._lease: Optional[Dict[str, Any]] = None
+
+    def _compose_names(self, task_name: str) -> tuple[str, str]:
+        """Return the (container name, compose project name) used for a task."""
+        suffix = f"-w{self.worker_id}" if self.worker_id is not None else ""
+        container_name = f"task-{task_name}{suffix}-container"
+        project_name = re.sub(r"[^a-z0-9_-]", "-", f"{task_name}{suffix}".lower())
+        return container_name, project_name
+
     def health_check(self) -> bool:
         """Check if the agent server is running."""
         try:
-            response = requests.get(f"{self.base_url}/v1/sandbox", timeout=5)
+            response = self.probe_http.get(f"{self.base_url}/v1/sandbox", timeout=5)
             return response.status_code == 200
         except Exception:
             return False
@@ -56,28 +170,31 @@ class SandboxClient:
         raise NotImplementedError("Not implemented")
 
     def send_request(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Send request to agent server."""
-        def _request():
-            response = requests.post(
-                f"{self.base_url}/{endpoint.lstrip('/')}",
-                json=data,
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
-            return validate_response(response)
-
-        return retry_request(_request)
-
-    def create_docker_environment(self, task: Dict[str, Any], wait_time: int = 60) -> bool:
+        """Send request to agent server (retried by the session's adapter)."""
+        response = self.http.post(
+            f"{self.base_url}/{endpoint.lstrip('/')}",
+            json=data,
+            headers={"Content-Type": "application/json"},
+            timeout=self.request_timeout
+        )
+        return validate_response(response)
+
+    def _start_container(
+        self,
+        task: Dict[str, Any],
+        port: int,
+        names: Optional[tuple[str, str]] = None,
+    ) -> Optional[Dict[str, Any]]:
         """
-        Create and start an agent server container using task's docker-compose.yaml.
+        Build the task image and start its container on the given host port, without waiting for readiness.
 
         Args:
             task: Task object containing task_dir (path to task directory with docker-compose.yaml)
-            wait_time: Time to wait for server to be ready (default: 60 seconds)
+            port: Host port to publish the sandbox API on
+            names: (container name, compose project name); derived from the task name by default
 
         Returns:
-            True if successful, False otherwise
+            Description of the started environment (task, compose project, container, port), or None on failure
         """
         try:
             task_dir = task.get("task_dir")
@@ -85,38 +202,47 @@ class SandboxClient:
 
             if not task_dir:
                 logger.error("Task object must contain 'task_dir' key")
-                return False
+                return None
 
-            self.task_name = task_name
-            self.task_dir = task_dir
             docker_compose_path = f"{task_dir}/docker-compose.yaml"
+            container_name, project_name = names or self._compose_names(task_name)
+
+            image_name = f"{IMAGE_REPOSITORY}:{build_context_hash(task_dir)}"
 
             # Set up environment variables for docker-compose
             env = {
-                "TASK_DOCKER_IMAGE_NAME": f"task-{task_name}:latest",
-                "TASK_DOCKER_CONTAINER_NAME": f"task-{task_name}-container",
-                "HOST_PORT": str(self.port)
+                "TASK_DOCKER_IMAGE_NAME": image_name,
+                "TASK_DOCKER_CONTAINER_NAME": container_name,
+                "HOST_PORT": str(port)
             }
 
-            # Build without cache and start using docker-compose
-            logger.info(f"Building and starting container for task '{task_name}' using docker-compose")
-
-            # Build the image without cache
-            build_result = subprocess.run(
-                ["docker", "compose", "-f", docker_compose_path, "build", "--no-cache"],
-                capture_output=True,
-                text=True,
-                timeout=120,
-                env={**subprocess.os.environ, **env}
-            )
+            logger.info(f"Starting container for task '{task_name}' using docker-compose (image {image_name})")
 
-            if build_result.returncode != 0:
-                logger.error(f"Failed to build container with docker-compose: {build_result.stderr}")
-                return False
+            # Tasks with the same build context share one image; only one build per image at a time
+            with _image_build_locks.setdefault(image_name, threading.Lock()):
+                if (image_name in _images_built or not self.force_rebuild) and _image_exists(image_name):
+                    logger.info(f"Reusing cached image {image_name}")
+                else:
+                    # A forced rebuild also bypasses the layer cache (e.g. to pick up a new base image)
+                    build_cmd = ["docker", "compose", "-p", project_name, "-f", docker_compose_path, "build"]
+                    if self.force_rebuild:
+                        build_cmd.append("--no-cache")
+                    build_result = subprocess.run(
+                        build_cmd,
+                        capture_output=True,
+                        text=True,
+                        timeout=self.build_timeout,
+                        env={**subprocess.os.environ, **env}
+                    )
+
+                    if build_result.returncode != 0:
+                        logger.error(f"Failed to build container with docker-compose: {build_result.stderr}")
+                        return None
+                    _images_built.add(image_name)
 
             # Start the container
             result = subprocess.run(
-                ["docker", "compose", "-f", docker_compose_path, "up", "-d"],
+                ["docker", "compose", "-p", project_name, "-f", docker_compose_path, "up", "-d"],
                 capture_output=True,
                 text=True,
                 timeout=120,
@@ -125,32 +251,202 @@ class SandboxClient:
 
             if result.returncode != 0:
                 logger.error(f"Failed to start container with docker-compose: {result.stderr}")
+                return None
+
+            logger.info(f"Container started successfully. Container name: {container_name}")
+            return {
+                "task_name": task_name,
+                "task_dir": task_dir,
+                "project_name": project_name,
+                "container_id": container_name,
+                "port": port,
+            }
+
+        except subprocess.TimeoutExpired:
+            logger.error("Docker command timed out")
+            return None
+        except Exception as e:
+            logger.error(f"Error creating agent server: {e}")
+            return None
+
+    def _attach_environment(self, environment: Dict[str, Any]) -> None:
+        """Point this client at a started environment (container and host port)."""
+        self.task_name = environment["task_name"]
+        self.task_dir = environment["task_dir"]
+        self.project_name = environment["project_name"]
+        self.container_id = environment["container_id"]
+        if environment["port"] != self.port:
+            if self.port in self._owned_ports:
+                self._owned_ports.discard(self.port)
+                release_port(self.port)
+            self.port = environment["port"]
+            self.base_url = f"http://localhost:{self.port}"
+
+    def _wait_for_ready(self, wait_time: int, task: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Probe the services the task needs until all answer or wait_time seconds pass.
+
+        The services default to READINESS_SERVICES of the client and can be narrowed per
+        task with a `sandbox_services` list in task.yaml. The measurement is kept in
+        self.readiness for the task result.
+
+        Args:
+            wait_time: Maximum time to wait in seconds
+            task: Task being set up
+
+        Returns:
+            True if all services are ready, False otherwise
+        """
+        services = (task or {}).get("sandbox_services") or self.READINESS_SERVICES
+        self.readiness = wait_until_ready(
+            make_http_probes(self.probe_http, self.base_url, services),
+            timeout=wait_time,
+            initial_delay=self.readiness_config.get("initial_delay", 0.05),
+            max_delay=self.readiness_config.get("max_delay", 1.0),
+        )
+
+        if self.readiness["ready"]:
+            logger.info(f"Docker environment ready after {self.readiness['time_to_ready']}s")
+            return True
+        logger.error(f"Docker environment failed to become ready within timeout of {wait_time} seconds")
+        return False
+
+    def prefetch_environment(self, task: Dict[str, Any]) -> None:
+        """
+        Start building and starting the container of an upcoming task in the background.
+
+        The container is published on a spare host port. A later create_docker_environment
+        call for the same task picks it up instead of building from scratch.
+
+        Args:
+            task: The task that will run next
+        """
+        if self.pool is not None:
+            self.pool.warm(task, self._image_name(task), self._start_container)
+            return
+        if self._prefetch is not None:
+            logger.debug(f"Already prefetching task '{self._prefetch['task_name']}', ignoring prefetch request")
+            return
+        if self._custom_base_url:
+            logger.warning("Prefetching is not supported with a custom sandbox base_url")
+            return
+
+        port = allocate_port(self.port + 1)
+        self._owned_ports.add(port)
+        if self._prefetch_executor is None:
+            self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sandbox-prefetch")
+        task_name = task.get("task_name", "task")
+        logger.info(f"Prefetching environment for task '{task_name}' on port {port}")
+        self._prefetch = {
+            "task_name": task_name,
+            "port": port,
+            "future": self._prefetch_executor.submit(self._start_container, task, port),
+        }
+
+    def _take_prefetched(self, task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the prefetched environment for this task (waiting for it to finish starting), if any."""
+        prefetch = self._prefetch
+        if prefetch is None:
+            return None
+        if prefetch["task_name"] != task.get("task_name", "task"):
+            logger.info(f"Prefetched task '{prefetch['task_name']}' does not match, discarding it")
+            self.cancel_prefetch()
+            return None
+        self._prefetch = None
+        environment = None
+        try:
+            environment = prefetch["future"].result()
+        except Exception as e:
+            logger.error(f"Prefetching task '{prefetch['task_name']}' failed: {e}")
+        finally:
+            # The port stays reserved only while a started environment uses it
+            if environment is None:
+                self._release_prefetch_port(prefetch)
+        return environment
+
+    def _release_prefetch_port(self, prefetch: Dict[str, Any]) -> None:
+        """Give back the spare port reserved for a prefetch."""
+        self._owned_ports.discard(prefetch["port"])
+        release_port(prefetch["port"])
+
+    def cancel_prefetch(self) -> None:
+        """Stop and remove a prefetched environment that will not be used."""
+        prefetch, self._prefetch = self._prefetch, None
+        if prefetch is None:
+            return
+        try:
+            environment = prefetch["future"].result()
+            if environment is not None:
+                self._compose_down(environment["task_dir"], environment["project_name"])
+        except Exception as e:
+            logger.error(f"Failed to discard prefetched task '{prefetch['task_name']}': {e}")
+        finally:
+            self._release_prefetch_port(prefetch)
+
+    def create_docker_environment(self, task: Dict[str, Any], wait_time: int = 60) -> bool:
+        """
+        Create and start an agent server container using task's docker-compose.yaml.
+
+        Uses the environment started by prefetch_environment when it belongs to this task.
+
+        Args:
+            task: Task object containing task_dir (path to task directory with docker-compose.yaml)
+            wait_time: Time to wait for server to be ready (default: 60 seconds)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        self.resource_blocking = resolve_blocking(task.get("resource_blocking", self.resource_blocking_config))
+        self.har_task_name = task.get("task_name", "task")
+
+        if self.pool is not None:
+            return self._lease_environment(task, wait_time)
+
+        environment = self._take_prefetched(task)
+        if environment is not None:
+            logger.info(f"Using prefetched environment for task '{environment['task_name']}' on port {environment['port']}")
+        else:
+            environment = self._start_container(task, self.port)
+            if environment is None:
+                # Remember the task so cleanup can still tear down a partially started project
+                self.task_name = task.get("task_name", "task")
+                self.task_dir = task.get("task_dir")
+                _, self.project_name = self._compose_names(self.task_name)
                 return False
 
-            # Extract container ID from docker-compose
-            self.container_id = env["TASK_DOCKER_CONTAINER_NAME"]
-            logger.info(f"Container started successfully. Container name: {self.container_id}")
+        self._attach_environment(environment)
 
-            # Wait for server to be ready
-            waited = 0
-            while waited < wait_time:
-                if self.health_check():
-                    logger.info("Docker environment ready")
-                    return True
-                else:
-                    waited += 5
-                    logger.info(f"Docker environment not ready yet. Waiting ... ({waited}/{wait_time} seconds)")
-                    time.sleep(5)
+        # Wait for server to be ready
+        return self._wait_for_ready(wait_time, task)
 
-            logger.error(f"Docker environment failed to become ready within timeout of {wait_time} seconds")
-            return False
+    def _image_name(self, task: Dict[str, Any]) -> str:
+        """Return the content-addressed image name of a task."""
+        return f"{IMAGE_REPOSITORY}:{build_context_hash(task.get('task_dir', '.'))}"
 
-        except subprocess.TimeoutExpired:
-            logger.error("Docker command timed out")
+    def _lease_environment(self, task: Dict[str, Any], wait_time: int) -> bool:
+        """Lease a pre-started container from the pool and wait until it is ready."""
+        if not task.get("task_dir"):
+            logger.error("Task object must contain 'task_dir' key")
             return False
-        except Exception as e:
-            logger.error(f"Error creating agent server: {e}")
+        environment = self.pool.lease(task, self._image_name(task), self._start_container)
+        if environment is None:
+            return False
+        self._lease = environment
+        self._attach_environment(environment)
+        if not self._wait_for_ready(wait_time, task):
             return False
+        self.pool.snapshot_workspace(environment)
+        environment["ready"] = True
+        return True
+
+    def _reset_services(self) -> bool:
+        """
+        Reset in-container service state (browser, sessions) so the container can serve another task.
+
+        Returns:
+            True if the state was reset; the base client cannot, so its containers are never reused
+        """
+        return False
 
     def copy_to_container(self, host_path: str, container_path: str) -> bool:
         """
@@ -213,6 +509,23 @@ class SandboxClient:
             return False
 
 
+    def _compose_down(self, task_dir: str, project_name: Optional[str]) -> bool:
+        """Run docker compose down for a task's compose project."""
+        docker_compose_path = f"{task_dir}/docker-compose.yaml"
+        compose_cmd = ["docker", "compose"]
+        if project_name:
+            compose_cmd += ["-p", project_name]
+        result = subprocess.run(
+            compose_cmd + ["-f", docker_compose_path, "down"],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+        if result.returncode != 0:
+            logger.error(f"Failed to stop container: {result.stderr}")
+            return False
+        return True
+
     def cleanup_docker_environment(self) -> bool:
         """
         Stop and remove the agent server container using docker-compose.
@@ -221,23 +534,20 @@ class SandboxClient:
             True if successful, False otherwise
         """
         try:
+            if self._lease is not None:
+                lease, self._lease = self._lease, None
+                # A container that never became ready has no SDK client of its own to reset
+                self.pool.release(lease, reusable=bool(lease.get("ready")) and self._reset_services())
+                self.container_id = None
+                return True
             if self.task_dir and self.task_name:
-                docker_compose_path = f"{self.task_dir}/docker-compose.yaml"
                 logger.info(f"Stopping container for task '{self.task_name}' using docker-compose")
 
-                result = subprocess.run(
-                    ["docker", "compose", "-f", docker_compose_path, "down"],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-
-                if result.returncode == 0:
+                if self._compose_down(self.task_dir, self.project_name):
                     logger.info("Agent server container stopped successfully")
                     self.container_id = None
                     return True
                 else:
-                    logger.error(f"Failed to stop container: {result.stderr}")
                     return False
             else:
                 logger.info("No container to clean up")
@@ -252,11 +562,32 @@ class SandboxClient:
 class BrowserSandboxClient(SandboxClient):
     """Client for communicating with the agent server for browser actions."""
 
-    def __init__(self, sandbox_config: Dict[str, Any] | None = None, **kwargs):
-        super().__init__(sandbox_config, **kwargs)
-        # Track all actions and their feedbacks
-        self.execution_history: list[Dict[str, Any]] = []
-        self.sdk_client: Optional[Sandbox] = None
+    READINESS_SERVICES = ("api", "browser")
+
+    def __init__(self, sandbox_config: Dict[str, Any] | None = None, owner: Optional[SandboxClient] = None, **kwargs):
+        """Initialize the client.
+
+        Args:
+            sandbox_config: Sandbox settings (see SandboxClient); ignored when owner is given
+            owner: Client whose sandbox this client drives as a component (e.g. the browser
+                part of UnifiedSandboxClient). The component shares the owner's settings, SDK
+                client and execution history, keeps its own browser session and caches, and
+                does not manage any container itself.
+        """
+        if owner is None:
+            super().__init__(sandbox_config, **kwargs)
+            # Track all actions and their feedbacks
+            self.execution_history: list[Dict[str, Any]] = []
+            self.sdk_client: Optional[Sandbox] = None
+        else:
+            # Every attribute the owner has (settings, SDK client, history) is shared
+            vars(self).update(vars(owner))
+        # Playwright CDP connection kept open for the whole task (see _with_page)
+        self.browser_session: Optional[BrowserSession] = None
+        self.resource_blocker: Optional[ResourceBlocker] = None
+        self.har_hook = None
+        # Serialized page text/HTML by URL and DOM version (see _read_page_content)
+        self.page_content_cache = PageContentCache()
 
     def _initialize_sdk_client(self) -> None:
         """Initialize the AIO Sandbox SDK client."""
@@ -342,9 +673,7 @@ class BrowserSandboxClient(SandboxClient):
         """
         try:
             import base64
-            screenshot_data = b""
-            for chunk in self.sdk_client.browser.screenshot():
-                screenshot_data += chunk
+            screenshot_data = read_chunks(self.sdk_client.browser.screenshot())
             
             # Encode to base64
             base64_image = base64.b64encode(screenshot_data).decode('utf-8')
@@ -377,98 +706,129 @@ class BrowserSandboxClient(SandboxClient):
             logger.error(f"Failed to get browser info: {e}")
             return f"Failed to get browser info: {str(e)}"
     
-    def _run_async(self, coro):
-        """Run an async coroutine, handling both sync and async contexts.
-        
-        Args:
-            coro: Coroutine to run
-            
-        Returns:
-            Result of the coroutine
-        """
-        import asyncio
-        try:
-            # Try to get the current event loop
-            loop = asyncio.get_running_loop()
-            # If we're in an async context, we need to use a different approach
-            # Create a new event loop in a thread
-            import concurrent.futures
-            import threading
-            
-            def run_in_thread():
-                new_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(new_loop)
-                try:
-                    return new_loop.run_until_complete(coro)
-                finally:
-                    new_loop.close()
-            
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(run_in_thread)
-                return future.result(timeout=60)  # Increased timeout for complex pages
-        except RuntimeError:
-            # No running event loop, use asyncio.run()
-            return asyncio.run(coro)
-
-    def _with_page(self, func, wait_timeout: int = 5000):
-        """Connect to the running browser via CDP and run an async function on the active page.
+    def _get_browser_session(self) -> BrowserSession:
+        """Return the persistent browser session, creating it on first use."""
+        if getattr(self, "browser_session", None) is None:
+            # A new session (new task or sandbox) starts new blocking counters and HAR archive
+            self.resource_blocker = ResourceBlocker(self.resource_blocking) if self.resource_blocking else None
+            self.har_hook = create_har_hook(self.har_config, self.har_task_name)
+            self.browser_session = BrowserSession(
+                lambda: self.sdk_client.browser.get_info().data.cdp_url,
+                page_hooks=[hook for hook in (self.resource_blocker, self.har_hook) if hook is not None],
+            )
+        return self.browser_session
+
+    def get_resource_blocking_stats(self) -> Optional[Dict[str, Any]]:
+        """Return the request counters of the active blocking profile, or None if nothing is blocked."""
+        blocker = getattr(self, "resource_blocker", None)
+        return blocker.stats() if blocker is not None else None
+
+    def get_har_stats(self) -> Optional[Dict[str, Any]]:
+        """Return the HAR record/replay counters of the current task, or None if HAR is off."""
+        har_hook = getattr(self, "har_hook", None)
+        return har_hook.stats() if har_hook is not None else None
+
+    def flush_har(self) -> None:
+        """Write the HAR archive recorded so far (no-op unless recording)."""
+        har_hook = getattr(self, "har_hook", None)
+        if har_hook is not None and self.browser_session is not None:
+            run_coroutine(har_hook.flush(), timeout=self.browser_session.operation_timeout)
+
+    def _close_browser_session(self) -> None:
+        """Close the persistent browser session, if any."""
+        session, self.browser_session = getattr(self, "browser_session", None), None
+        if session is not None:
+            session.close()
+
+    def _with_page(self, func, wait_timeout: int = 5000, timeout: Optional[float] = None):
+        """Run an async function on the active page over the persistent CDP connection.
         
         Args:
             func: Async function that takes a page and returns a result
             wait_timeout: Timeout in ms for waiting for page load (default 5000ms, use 0 to skip wait)
+            timeout: Seconds the whole operation may take (default: the session's operation_timeout)
         """
-        import asyncio
-        from playwright.async_api import async_playwright
+        return self._get_browser_session().with_page(func, wait_timeout=wait_timeout, timeout=timeout)
 
-        async def runner():
-            browser_info = self.sdk_client.browser.get_info().data
-            async with async_playwright() as p:
-                browser = await p.chromium.connect_over_cdp(browser_info.cdp_url)
-                try:
-                    context = browser.contexts[0] if browser.contexts else await browser.new_context()
-                    page = context.pages[0] if context.pages else await context.new_page()
-                    # Use shorter timeout for DOM operations on already-loaded pages
-                    if wait_timeout > 0:
-                        try:
-                            await page.wait_for_load_state("domcontentloaded", timeout=wait_timeout)
-                        except Exception:
-                            # If page is already loaded or timeout, continue anyway
-                            pass
-                    return await func(page)
-                finally:
-                    # Closing the Playwright client disconnects but does not shut down the remote browser
-                    await browser.close()
+    def _read_page_content(self, kind: str) -> tuple[str, str, str]:
+        """Return the page's text or HTML, serializing it only if the DOM changed since it was cached.
 
-        return self._run_async(runner())
+        Args:
+            kind: "text" (innerText of body) or "html" (page.content)
 
-    def _dom_get_text(self, max_chars: int = 8000) -> str:
-        """Return page text (innerText of body)."""
-        try:
-            async def op(page):
-                return await page.inner_text("body")
+        Returns:
+            Tuple of (content, url, DOM version key)
+        """
+        cache = self.page_content_cache
+
+        async def op(page):
+            return await page.evaluate(PAGE_CONTENT_JS, {"kind": kind, "cached": cache.keys_for(kind)})
+
+        result = self._with_page(lambda page: op(page), wait_timeout=5000)
+        if result["content"] is None:
+            content = cache.get(kind, result["url"], result["key"])
+            if content is not None:
+                return content, result["url"], result["key"]
+            # Same DOM version cached under another URL (history.pushState); serialize again
+            result = self._with_page(
+                lambda page: page.evaluate(PAGE_CONTENT_JS, {"kind": kind, "cached": []}), wait_timeout=0
+            )
+        cache.put(kind, result["url"], result["key"], result["content"])
+        return result["content"], result["url"], result["key"]
+
+    def _format_page_window(self, label: str, content: str, offset: int, length: int, page: Optional[int]) -> str:
+        """Format one window of page content with the offset of the next one."""
+        window = page_window(content, offset=offset, length=length, page=page)
+        if window["start"] == 0 and window["end"] == window["total"]:
+            return f"Page {label} content:\n{window['text']}"
+        if window["start"] >= window["total"]:
+            return f"Page {label} has only {window['total']} characters; the requested window is past the end."
+        header = f"Page {label} content (characters {window['start']}-{window['end']} of {window['total']}):"
+        footer = ""
+        if window["end"] < window["total"]:
+            footer = f"\n... (truncated; continue with offset={window['end']})"
+        return f"{header}\n{window['text']}{footer}"
+
+    def _dom_get_text(self, offset: int = 0, length: int = 8000, page: Optional[int] = None) -> str:
+        """Return a window of the page text (innerText of body).
 
-            text = self._with_page(lambda page: op(page), wait_timeout=5000)
-            if text is None:
+        Args:
+            offset: First character to return
+            length: Number of characters to return
+            page: 1-based page number of `length`-sized windows (overrides offset)
+        """
+        try:
+            text, _, _ = self._read_page_content("text")
+            if not text:
                 return "Page text is empty."
-            if len(text) > max_chars:
-                text = text[:max_chars] + "\n... (truncated)"
-            return f"Page text content:\n{text}"
+            return self._format_page_window("text", text, offset, length, page)
         except Exception as e:
             logger.error(f"Failed to get page text: {e}")
             return f"Failed to get page text: {str(e)}"
 
-    def _dom_get_html(self, max_chars: int = 12000) -> str:
-        """Return page HTML (page.content)."""
-        try:
-            async def op(page):
-                return await page.content()
+    def _dom_get_html(self, offset: int = 0, length: int = 12000, page: Optional[int] = None, format: str = "markdown") -> str:
+        """Return a window of the page HTML (page.content), condensed to markdown by default.
 
-            html = self._with_page(lambda page: op(page), wait_timeout=5000)
-            if html is None:
+        Args:
+            offset: First character to return
+            length: Number of characters to return
+            page: 1-based page number of `length`-sized windows (overrides offset)
+            format: "markdown" (content, links and form controls; see executor/condense.py) or "html" (raw)
+        """
+        try:
+            html, url, key = self._read_page_content("html")
+            if not html:
                 return "Page HTML is empty."
-            if len(html) > max_chars:
-                html = html[:max_chars] + "\n... (truncated)"
-            return f"Page HTML content:\n{html}"
+            if format == "html":
+                return self._format_page_window("HTML", html, offset, length, page)
+            # The condensed page is cached alongside the HTML it was made from
+            markdown = self.page_content_cache.get("markdown", url, key)
+            if markdown is None:
+                markdown = condense_html(html, base_url=url)
+                self.page_content_cache.put("markdown", url, key, markdown)
+            if not markdown:
+                return "Page has no readable content (use format=\"html\" for the raw HTML)."
+            return self._format_page_window("HTML (condensed to markdown)", markdown, offset, length, page)
         except Exception as e:
             logger.error(f"Failed to get page HTML: {e}")
             return f"Failed to get page HTML: {str(e)}"
@@ -477,26 +837,14 @@ class BrowserSandboxClient(SandboxClient):
         """Query elements via CSS selector and summarize tag/text/href/class/id/name for precise selection."""
         try:
             async def op(page):
-                elements = await page.query_selector_all(selector)
+                # Tag, text and key attributes of all matches in a single round trip
+                summary = await page.eval_on_selector_all(selector, QUERY_SELECTOR_JS, limit)
+                total = summary["total"]
                 results = []
-                for i, element in enumerate(elements[:limit]):
-                    try:
-                        text = await element.inner_text()
-                    except Exception:
-                        text = ""
-                    try:
-                        tag = await element.evaluate("el => el.tagName")
-                    except Exception:
-                        tag = "UNKNOWN"
-                    # Get key attributes for precise selection
-                    attrs = {}
-                    for attr_name in ["id", "class", "name", "type", "href", "role", "aria-label"]:
-                        try:
-                            val = await element.get_attribute(attr_name)
-                            if val:
-                                attrs[attr_name] = val
-                        except Exception:
-                            pass
+                for i, element in enumerate(summary["items"]):
+                    text = element["text"]
+                    tag = element["tag"]
+                    attrs = element["attrs"]
                     
                     # Build info string
                     info_parts = [f"{i+1}. <{tag}>"]
@@ -549,9 +897,9 @@ class BrowserSandboxClient(SandboxClient):
                     results.append(" ".join(info_parts))
                 
                 extra = ""
-                if len(elements) > limit:
-                    extra = f"\n... and {len(elements) - limit} more elements"
-                return f"Found {len(elements)} element(s) matching selector '{selector}':\n" + "\n".join(results) + extra
+                if total > limit:
+                    extra = f"\n... and {total - limit} more elements"
+                return f"Found {total} element(s) matching selector '{selector}':\n" + "\n".join(results) + extra
 
             return self._with_page(lambda page: op(page), wait_timeout=5000)
         except Exception as e:
@@ -764,150 +1112,42 @@ class BrowserSandboxClient(SandboxClient):
     #         logger.error(f"Failed to scroll: {e}")
     #         return f"Failed to scroll: {str(e)}"
 
-    def _dom_mark_elements_and_extract(self, max_elements: int = 100) -> str:
-        """Mark interactive elements with unique BIDs and return structured list with context."""
+    def _dom_mark_elements_and_extract(self, max_elements: int = 100, incremental: bool = False) -> str:
+        """Mark interactive elements with unique BIDs and return structured list with context.
+
+        Args:
+            max_elements: Maximum number of elements to mark and return
+            incremental: Keep BIDs stable across calls and, after the first call on a
+                page, return only the elements added, removed or changed since the
+                previous call. A MutationObserver and input/hover/resize/animation
+                listeners in the page tell whether anything changed at all, so an
+                unchanged page is not scanned again.
+
+        Returns:
+            Formatted element list, or the diff to the previous call in incremental mode
+        """
         try:
             async def op(page):
-                # JavaScript to inject BIDs and extract interactive elements
-                js_code = """
-                () => {
-                    // Clear previous marks
-                    document.querySelectorAll('[data-cocoa-bid]').forEach(el => {
-                        el.removeAttribute('data-cocoa-bid');
-                    });
-                    
-                    // Interactive element selectors
-                    const interactiveSelectors = [
-                        'a[href]',
-                        'button',
-                        'input',
-                        'textarea',
-                        'select',
-                        '[role="button"]',
-                        '[role="link"]',
-                        '[role="tab"]',
-                        '[role="menuitem"]',
-                        '[role="dialog"]',
-                        '[role="checkbox"]',
-                        '[role="radio"]',
-                        '[role="switch"]',
-                        '[onclick]',
-                        '[contenteditable="true"]',
-                        '[class*="close"]',
-                        '[class*="dismiss"]',
-                        '[class*="cancel"]',
-                        '[aria-label*="close" i]',
-                        '[aria-label*="dismiss" i]',
-                        '[aria-label*="cancel" i]',
-                        '[title*="close" i]',
-                        '[title*="dismiss" i]',
-                        'svg[onclick]',
-                        '[data-dismiss]',
-                        '[data-close]'
-                    ];
-                    
-                    // Helper function to check if element is interactive
-                    function isInteractive(el) {
-                        const tag = el.tagName.toLowerCase();
-                        const hasClick = el.onclick || el.hasAttribute('onclick');
-                        const hasRole = ['button', 'link', 'tab', 'menuitem', 'checkbox', 'radio', 'switch'].includes(el.getAttribute('role'));
-                        const isClickable = el.style.cursor === 'pointer' || window.getComputedStyle(el).cursor === 'pointer';
-                        const hasCloseIndicator = (el.textContent || '').trim().match(/^[×✕✖✗xX]$/);
-                        
-                        return hasClick || hasRole || isClickable || hasCloseIndicator;
-                    }
-                    
-                    // Get all potentially interactive elements
-                    const directElements = Array.from(document.querySelectorAll(interactiveSelectors.join(',')));
-                    
-                    // Also check divs and spans with cursor:pointer or close indicators
-                    const allDivSpan = Array.from(document.querySelectorAll('div, span, i, svg'));
-                    const extraElements = allDivSpan.filter(el => {
-                        if (directElements.includes(el)) return false;
-                        return isInteractive(el);
-                    });
-                    
-                    const elements = [...directElements, ...extraElements];
-                    const results = [];
-                    let bid = 1;
-                    
-                    for (const el of elements) {
-                        // Check visibility
-                        const rect = el.getBoundingClientRect();
-                        const style = window.getComputedStyle(el);
-                        
-                        // More lenient visibility check
-                        if (style.display === 'none' || style.visibility === 'hidden') {
-                            continue;
-                        }
-                        
-                        // Allow small elements (close buttons can be small)
-                        if (rect.width === 0 && rect.height === 0) {
-                            continue;
-                        }
-                        
-                        // Check if element is actually rendered and not completely transparent
-                        if (style.opacity === '0') {
-                            continue;
-                        }
-                        
-                        // Skip if covered by another element (except for high z-index elements like modals)
-                        const zIndex = parseInt(style.zIndex) || 0;
-                        if (zIndex < 0) {
-                            continue;
-                        }
-                        
-                        // Assign BID
-                        const bidStr = `bid${bid}`;
-                        el.setAttribute('data-cocoa-bid', bidStr);
-                        
-                        // Extract element info
-                        const tag = el.tagName.toLowerCase();
-                        const text = (el.innerText || el.textContent || '').trim().substring(0, 150);
-                        const value = el.value || '';
-                        const placeholder = el.placeholder || '';
-                        const type = el.type || '';
-                        const href = el.href || '';
-                        const id = el.id || '';
-                        const classList = Array.from(el.classList || []).join(' ');
-                        const role = el.getAttribute('role') || '';
-                        const ariaLabel = el.getAttribute('aria-label') || '';
-                        const title = el.title || '';
-                        const name = el.name || '';
-                        const dataDismiss = el.getAttribute('data-dismiss') || '';
-                        const dataClose = el.getAttribute('data-close') || '';
-                        
-                        // Build readable description
-                        let description = `<${tag}>`;
-                        if (id) description += ` id="${id}"`;
-                        if (classList) description += ` class="${classList.substring(0, 80)}"`;
-                        if (type) description += ` type="${type}"`;
-                        if (role) description += ` role="${role}"`;
-                        if (ariaLabel) description += ` aria-label="${ariaLabel}"`;
-                        if (title) description += ` title="${title}"`;
-                        if (name) description += ` name="${name}"`;
-                        if (dataDismiss) description += ` data-dismiss="${dataDismiss}"`;
-                        if (dataClose) description += ` data-close="${dataClose}"`;
-                        if (text) description += ` text="${text}"`;
-                        if (value) description += ` value="${value}"`;
-                        if (placeholder) description += ` placeholder="${placeholder}"`;
-                        if (href) description += ` href="${href.substring(0, 80)}"`;
-                        
-                        results.push({
-                            bid: bidStr,
-                            description: description
-                        });
-                        
-                        bid++;
-                        if (bid > """ + str(max_elements) + """) break;
-                    }
-                    
-                    return results;
-                }
-                """
+                info = await page.evaluate(MARK_ELEMENTS_JS, {"maxElements": max_elements, "incremental": incremental})
+                
+                if info.get("unchanged"):
+                    return f"No changes to interactive elements since the last dom_mark_elements call ({info['total']} element(s) marked, BIDs unchanged)"
                 
-                elements_info = await page.evaluate(js_code)
+                if info.get("diff"):
+                    if not (info["added"] or info["changed"] or info["removed"]):
+                        return f"No changes to interactive elements since the last dom_mark_elements call ({info['total']} element(s) marked, BIDs unchanged)"
+                    lines = [f"Interactive elements changed since the last dom_mark_elements call ({info['total']} element(s) marked, other BIDs unchanged):"]
+                    if info["added"]:
+                        lines.append(f"Added ({len(info['added'])}):")
+                        lines.extend(f"[{elem['bid']}] {elem['description']}" for elem in info["added"])
+                    if info["changed"]:
+                        lines.append(f"Changed ({len(info['changed'])}):")
+                        lines.extend(f"[{elem['bid']}] {elem['description']}" for elem in info["changed"])
+                    if info["removed"]:
+                        lines.append(f"Removed ({len(info['removed'])}): " + ", ".join(f"[{bid}]" for bid in info["removed"]))
+                    return "\n".join(lines)
                 
+                elements_info = info["elements"]
                 if not elements_info:
                     return "No interactive elements found on page"
                 
@@ -923,390 +1163,524 @@ class BrowserSandboxClient(SandboxClient):
             logger.error(f"Failed to mark elements and extract: {e}")
             return f"Failed to mark elements and extract: {str(e)}"
 
-    def _dom_click(self, bid: str, button: str = "left", click_count: int = 1, timeout_ms: int = 2000) -> str:
-        """Click a DOM element using a BID."""
+    def _dom_snapshot(self, max_tokens: int = 2000) -> str:
+        """Return a compact accessibility-tree outline of the page with BIDs.
+
+        Interactive nodes get fresh BIDs (replacing those of dom_mark_elements),
+        so the outline can be used directly with the dom_* actions.
+
+        Args:
+            max_tokens: Approximate token budget of the outline
+
+        Returns:
+            Indented role/name/value outline
+        """
         try:
             async def op(page):
-                selector = f'[data-cocoa-bid="{bid}"]'
-                element = await page.query_selector(selector)
-                if not element:
-                    return f"ERROR: No element found with BID '{bid}'. This BID is stale/invalid. DO NOT retry this BID. You MUST run dom_mark_elements() again to get fresh BIDs, then find your target element in the new list and use its new BID."
-                
-                # Get element info before clicking
-                tag_name = await element.evaluate('el => el.tagName.toLowerCase()')
-                element_visible = await element.is_visible()
-                element_enabled = await element.is_enabled()
-                
+                cdp = await page.context.new_cdp_session(page)
                 try:
-                    text_before = await element.inner_text()
-                    text_before = text_before.strip().replace("\n", " ")
-                except Exception:
-                    text_before = ""
-                
-                # Try multiple click strategies
-                click_success = False
-                error_msg = ""
-                
-                # Strategy 1: Standard click with scroll
+                    await page.evaluate(CLEAR_MARKS_JS)
+                    tree = await cdp.send("Accessibility.getFullAXTree")
+                    outline, bids = build_outline(tree.get("nodes", []), max_tokens=max_tokens)
+                    if bids:
+                        # Map AX nodes to DOM nodes and mark them; the commands are pipelined
+                        await cdp.send("DOM.getDocument", {"depth": 0})
+                        pushed = await cdp.send("DOM.pushNodesByBackendIdsToFrontend", {"backendNodeIds": list(bids)})
+                        await asyncio.gather(*(
+                            cdp.send("DOM.setAttributeValue", {"nodeId": node_id, "name": "data-cocoa-bid", "value": bid})
+                            for node_id, bid in zip(pushed.get("nodeIds", []), bids.values())
+                            if node_id
+                        ))
+                finally:
+                    await cdp.detach()
+
+                if not outline:
+                    return "Accessibility tree of the page is empty"
+                return f"Page snapshot (accessibility tree, {len(bids)} interactive element(s) with BIDs):\n{outline}"
+
+            return self._with_page(lambda page: op(page), wait_timeout=5000)
+        except Exception as e:
+            logger.error(f"Failed to take DOM snapshot: {e}")
+            return f"Failed to take DOM snapshot: {str(e)}"
+
+    async def _dom_click_on_page(self, page, bid: str, button: str = "left", click_count: int = 1, timeout_ms: int = 2000) -> Tuple[bool, str]:
+        """Click a DOM element using a BID on the given page."""
+        selector = f'[data-cocoa-bid="{bid}"]'
+        element = await page.query_selector(selector)
+        if not element:
+            return False, f"ERROR: No element found with BID '{bid}'. This BID is stale/invalid. DO NOT retry this BID. You MUST run dom_mark_elements() again to get fresh BIDs, then find your target element in the new list and use its new BID."
+        
+        # Get element info before clicking
+        tag_name = await element.evaluate('el => el.tagName.toLowerCase()')
+        element_visible = await element.is_visible()
+        element_enabled = await element.is_enabled()
+        
+        try:
+            text_before = await element.inner_text()
+            text_before = text_before.strip().replace("\n", " ")
+        except Exception:
+            text_before = ""
+        
+        # Try multiple click strategies; the settle detector sees the requests they trigger
+        async with SettleDetector(page, self.settle_config) as settle:
+            click_success = False
+            error_msg = ""
+        
+            # Strategy 1: Standard click with scroll
+            try:
+                await element.scroll_into_view_if_needed(timeout=timeout_ms)
+                await element.click(button=button, click_count=click_count, timeout=timeout_ms)
+                click_success = True
+            except Exception as e1:
+                error_msg = str(e1)
+            
+                # Strategy 2: Force click
                 try:
-                    await element.scroll_into_view_if_needed(timeout=timeout_ms)
-                    await element.click(button=button, click_count=click_count, timeout=timeout_ms)
+                    await element.click(button=button, click_count=click_count, timeout=timeout_ms, force=True)
                     click_success = True
-                except Exception as e1:
-                    error_msg = str(e1)
-                    
-                    # Strategy 2: Force click
+                    error_msg = ""
+                except Exception as e2:
+                    error_msg = str(e2)
+                
+                    # Strategy 3: JS click for stubborn elements
                     try:
-                        await element.click(button=button, click_count=click_count, timeout=timeout_ms, force=True)
+                        await element.evaluate('el => el.click()')
                         click_success = True
                         error_msg = ""
-                    except Exception as e2:
-                        error_msg = str(e2)
-                        
-                        # Strategy 3: JS click for stubborn elements
-                        try:
-                            await element.evaluate('el => el.click()')
-                            click_success = True
-                            error_msg = ""
-                        except Exception as e3:
-                            error_msg = f"All click strategies failed. Last error: {str(e3)}"
-                
-                if not click_success:
-                    return f"Failed to click BID '{bid}' ({tag_name}). Element visible: {element_visible}, enabled: {element_enabled}. Error: {error_msg}"
-                
-                # Get element state after clicking (if still exists)
-                try:
-                    await page.wait_for_timeout(300)  # Short wait for UI update
-                    text_after = await element.inner_text()
-                    text_after = text_after.strip().replace("\n", " ")
-                    if text_after != text_before:
-                        return f"Clicked element with BID '{bid}' (button={button}, clicks={click_count}). Text changed: '{text_before[:60]}' -> '{text_after[:60]}'"
-                except Exception:
-                    # Element might be removed after click (e.g., close button)
-                    return f"Clicked element with BID '{bid}' (button={button}, clicks={click_count}). Element removed from DOM (likely a close/dismiss button or navigation)."
-                
-                return f"Clicked element with BID '{bid}' (button={button}, clicks={click_count}). Text: {text_before[:120]}"
+                    except Exception as e3:
+                        error_msg = f"All click strategies failed. Last error: {str(e3)}"
             
-            return self._with_page(lambda page: op(page), wait_timeout=5000)
+            # Wait for the UI update (requests and DOM changes) instead of a fixed delay
+            settled = await settle.wait() if click_success else None
+        
+        if not click_success:
+            return False, f"Failed to click BID '{bid}' ({tag_name}). Element visible: {element_visible}, enabled: {element_enabled}. Error: {error_msg}"
+        
+        settle_info = describe_settle(settled)
+        
+        # Get element state after clicking (if still exists)
+        try:
+            text_after = await element.inner_text()
+            text_after = text_after.strip().replace("\n", " ")
+            if text_after != text_before:
+                return True, f"Clicked element with BID '{bid}' (button={button}, clicks={click_count}). Text changed: '{text_before[:60]}' -> '{text_after[:60]}'. {settle_info}"
+        except Exception:
+            # Element might be removed after click (e.g., close button)
+            return True, f"Clicked element with BID '{bid}' (button={button}, clicks={click_count}). Element removed from DOM (likely a close/dismiss button or navigation). {settle_info}"
+        
+        return True, f"Clicked element with BID '{bid}' (button={button}, clicks={click_count}). Text: {text_before[:120]}. {settle_info}"
+
+    def _dom_click(self, bid: str, button: str = "left", click_count: int = 1, timeout_ms: int = 2000) -> str:
+        """Click a DOM element using a BID."""
+        try:
+            return self._with_page(lambda page: self._dom_click_on_page(page, bid, button, click_count, timeout_ms), wait_timeout=5000)[1]
         except Exception as e:
             logger.error(f"Failed to click BID: {e}")
             return f"Failed to click BID: {str(e)}"
 
+    async def _dom_hover_on_page(self, page, bid: str, timeout_ms: int = 2000) -> Tuple[bool, str]:
+        """Hover over a DOM element using a BID on the given page."""
+        selector = f'[data-cocoa-bid="{bid}"]'
+        element = await page.query_selector(selector)
+        if not element:
+            return False, f"ERROR: No element found with BID '{bid}'. This BID is stale/invalid. DO NOT retry this BID. You MUST run dom_mark_elements() again to get fresh BIDs."
+        
+        await element.scroll_into_view_if_needed(timeout=timeout_ms)
+        await element.hover(timeout=timeout_ms)
+        
+        try:
+            text = await element.inner_text()
+            text = text.strip().replace("\n", " ")
+        except Exception:
+            text = ""
+        
+        return True, f"Hovered over element with BID '{bid}'. Text: {text[:120]}"
+
     def _dom_hover(self, bid: str, timeout_ms: int = 2000) -> str:
         """Hover over a DOM element using a BID."""
         try:
-            async def op(page):
-                selector = f'[data-cocoa-bid="{bid}"]'
-                element = await page.query_selector(selector)
-                if not element:
-                    return f"ERROR: No element found with BID '{bid}'. This BID is stale/invalid. DO NOT retry this BID. You MUST run dom_mark_elements() again to get fresh BIDs."
-                
-                await element.scroll_into_view_if_needed(timeout=timeout_ms)
-                await element.hover(timeout=timeout_ms)
-                
-                try:
-                    text = await element.inner_text()
-                    text = text.strip().replace("\n", " ")
-                except Exception:
-                    text = ""
-                
-                return f"Hovered over element with BID '{bid}'. Text: {text[:120]}"
-            
-            return self._with_page(lambda page: op(page), wait_timeout=5000)
+            return self._with_page(lambda page: self._dom_hover_on_page(page, bid, timeout_ms), wait_timeout=5000)[1]
         except Exception as e:
             logger.error(f"Failed to hover BID: {e}")
             return f"Failed to hover BID: {str(e)}"
 
+    async def _dom_type_on_page(self, page, bid: str, text: str, clear_first: bool = True, timeout_ms: int = 2000) -> Tuple[bool, str]:
+        """Type text into a DOM element using a BID on the given page."""
+        selector = f'[data-cocoa-bid="{bid}"]'
+        element = await page.query_selector(selector)
+        if not element:
+            return False, f"ERROR: No element found with BID '{bid}'. This BID is stale/invalid. DO NOT retry this BID. You MUST run dom_mark_elements() again to get fresh BIDs."
+        
+        await element.scroll_into_view_if_needed(timeout=timeout_ms)
+        
+        if clear_first:
+            await element.fill("", timeout=timeout_ms)
+        
+        await element.type(text, timeout=timeout_ms)
+        
+        try:
+            final_value = await element.input_value()
+        except Exception:
+            final_value = text
+        
+        return True, f"Typed into element with BID '{bid}'. Final value: {final_value[:120]}"
+
     def _dom_type(self, bid: str, text: str, clear_first: bool = True, timeout_ms: int = 2000) -> str:
         """Type text into a DOM element using a BID."""
         try:
-            async def op(page):
-                selector = f'[data-cocoa-bid="{bid}"]'
-                element = await page.query_selector(selector)
-                if not element:
-                    return f"ERROR: No element found with BID '{bid}'. This BID is stale/invalid. DO NOT retry this BID. You MUST run dom_mark_elements() again to get fresh BIDs."
-                
-                await element.scroll_into_view_if_needed(timeout=timeout_ms)
-                
-                if clear_first:
-                    await element.fill("", timeout=timeout_ms)
-                
-                await element.type(text, timeout=timeout_ms)
-                
-                try:
-                    final_value = await element.input_value()
-                except Exception:
-                    final_value = text
-                
-                return f"Typed into element with BID '{bid}'. Final value: {final_value[:120]}"
-            
-            return self._with_page(lambda page: op(page), wait_timeout=5000)
+            return self._with_page(lambda page: self._dom_type_on_page(page, bid, text, clear_first, timeout_ms), wait_timeout=5000)[1]
         except Exception as e:
             logger.error(f"Failed to type into BID: {e}")
             return f"Failed to type into BID: {str(e)}"
 
+    async def _dom_press_on_page(self, page, key: str, bid: str | None = None, timeout_ms: int = 2000) -> Tuple[bool, str]:
+        """Press a key on a DOM element using a BID or on the given page."""
+        if bid:
+            selector = f'[data-cocoa-bid="{bid}"]'
+            element = await page.query_selector(selector)
+            if not element:
+                return False, f"ERROR: No element found with BID '{bid}'. This BID is stale/invalid. DO NOT retry this BID. You MUST run dom_mark_elements() again to get fresh BIDs."
+            
+            await element.scroll_into_view_if_needed(timeout=timeout_ms)
+            await element.press(key, timeout=timeout_ms)
+            
+            return True, f"Pressed key '{key}' on element with BID '{bid}'"
+        else:
+            await page.keyboard.press(key)
+            return True, f"Pressed key '{key}' on page"
+
     def _dom_press(self, key: str, bid: str | None = None, timeout_ms: int = 2000) -> str:
         """Press a key on a DOM element using a BID or on the page."""
         try:
-            async def op(page):
-                if bid:
-                    selector = f'[data-cocoa-bid="{bid}"]'
-                    element = await page.query_selector(selector)
-                    if not element:
-                        return f"ERROR: No element found with BID '{bid}'. This BID is stale/invalid. DO NOT retry this BID. You MUST run dom_mark_elements() again to get fresh BIDs."
-                    
-                    await element.scroll_into_view_if_needed(timeout=timeout_ms)
-                    await element.press(key, timeout=timeout_ms)
-                    
-                    return f"Pressed key '{key}' on element with BID '{bid}'"
-                else:
-                    await page.keyboard.press(key)
-                    return f"Pressed key '{key}' on page"
-            
-            return self._with_page(lambda page: op(page), wait_timeout=5000)
+            return self._with_page(lambda page: self._dom_press_on_page(page, key, bid, timeout_ms), wait_timeout=5000)[1]
         except Exception as e:
             logger.error(f"Failed to press key: {e}")
             return f"Failed to press key: {str(e)}"
 
-    def _dom_scroll(self, bid: str | None = None, direction: str = "down", amount: int = 500, timeout_ms: int = 2000) -> str:
-        """Scroll a DOM element or the page using a BID."""
-        try:
-            async def op(page):
-                if bid:
-                    selector = f'[data-cocoa-bid="{bid}"]'
-                    element = await page.query_selector(selector)
-                    if not element:
-                        return f"ERROR: No element found with BID '{bid}'. This BID is stale/invalid. DO NOT retry this BID. You MUST run dom_mark_elements() again to get fresh BIDs."
-                    
-                    # Get scroll info before scrolling
-                    scroll_info_before = await element.evaluate("""
-                        el => ({
-                            scrollTop: el.scrollTop,
-                            scrollLeft: el.scrollLeft,
-                            scrollHeight: el.scrollHeight,
-                            scrollWidth: el.scrollWidth,
-                            clientHeight: el.clientHeight,
-                            clientWidth: el.clientWidth
-                        })
-                    """)
-                    
-                    if direction == "down":
-                        await element.evaluate(f"el => el.scrollTop += {amount}")
-                    elif direction == "up":
-                        await element.evaluate(f"el => el.scrollTop -= {amount}")
-                    elif direction == "left":
-                        await element.evaluate(f"el => el.scrollLeft -= {amount}")
-                    elif direction == "right":
-                        await element.evaluate(f"el => el.scrollLeft += {amount}")
-                    
-                    # Get scroll info after scrolling
-                    scroll_info_after = await element.evaluate("""
-                        el => ({
-                            scrollTop: el.scrollTop,
-                            scrollLeft: el.scrollLeft,
-                            scrollHeight: el.scrollHeight,
-                            scrollWidth: el.scrollWidth,
-                            clientHeight: el.clientHeight,
-                            clientWidth: el.clientWidth
-                        })
-                    """)
-                    
-                    # Calculate scroll position and limits
-                    if direction in ["up", "down"]:
-                        max_scroll = scroll_info_after["scrollHeight"] - scroll_info_after["clientHeight"]
-                        current = scroll_info_after["scrollTop"]
-                        at_top = current <= 0
-                        at_bottom = current >= max_scroll - 1
-                        position_info = f"Position: {current}/{max_scroll}"
-                        if at_top:
-                            position_info += " (at top)"
-                        elif at_bottom:
-                            position_info += " (at bottom)"
-                        else:
-                            percent = int((current / max_scroll) * 100) if max_scroll > 0 else 0
-                            position_info += f" ({percent}%)"
-                    else:
-                        max_scroll = scroll_info_after["scrollWidth"] - scroll_info_after["clientWidth"]
-                        current = scroll_info_after["scrollLeft"]
-                        at_left = current <= 0
-                        at_right = current >= max_scroll - 1
-                        position_info = f"Position: {current}/{max_scroll}"
-                        if at_left:
-                            position_info += " (at left)"
-                        elif at_right:
-                            position_info += " (at right)"
-                        else:
-                            percent = int((current / max_scroll) * 100) if max_scroll > 0 else 0
-                            position_info += f" ({percent}%)"
-                    
-                    return f"Scrolled {direction} by {amount}px on element with BID '{bid}'. {position_info}"
+    async def _dom_scroll_on_page(self, page, bid: str | None = None, direction: str = "down", amount: int = 500, timeout_ms: int = 2000) -> Tuple[bool, str]:
+        """Scroll a DOM element using a BID or the given page."""
+        if bid:
+            selector = f'[data-cocoa-bid="{bid}"]'
+            element = await page.query_selector(selector)
+            if not element:
+                return False, f"ERROR: No element found with BID '{bid}'. This BID is stale/invalid. DO NOT retry this BID. You MUST run dom_mark_elements() again to get fresh BIDs."
+            
+            # Get scroll info before scrolling
+            scroll_info_before = await element.evaluate("""
+                el => ({
+                    scrollTop: el.scrollTop,
+                    scrollLeft: el.scrollLeft,
+                    scrollHeight: el.scrollHeight,
+                    scrollWidth: el.scrollWidth,
+                    clientHeight: el.clientHeight,
+                    clientWidth: el.clientWidth
+                })
+            """)
+            
+            # Settle like page scrolls, so content loaded by the scroll is in place
+            async with SettleDetector(page, self.settle_config) as settle:
+                if direction == "down":
+                    await element.evaluate(f"el => el.scrollTop += {amount}")
+                elif direction == "up":
+                    await element.evaluate(f"el => el.scrollTop -= {amount}")
+                elif direction == "left":
+                    await element.evaluate(f"el => el.scrollLeft -= {amount}")
+                elif direction == "right":
+                    await element.evaluate(f"el => el.scrollLeft += {amount}")
+                settled = await settle.wait()
+            
+            # Get scroll info after scrolling
+            scroll_info_after = await element.evaluate("""
+                el => ({
+                    scrollTop: el.scrollTop,
+                    scrollLeft: el.scrollLeft,
+                    scrollHeight: el.scrollHeight,
+                    scrollWidth: el.scrollWidth,
+                    clientHeight: el.clientHeight,
+                    clientWidth: el.clientWidth
+                })
+            """)
+            
+            # Calculate scroll position and limits
+            if direction in ["up", "down"]:
+                max_scroll = scroll_info_after["scrollHeight"] - scroll_info_after["clientHeight"]
+                current = scroll_info_after["scrollTop"]
+                at_top = current <= 0
+                at_bottom = current >= max_scroll - 1
+                position_info = f"Position: {current}/{max_scroll}"
+                if at_top:
+                    position_info += " (at top)"
+                elif at_bottom:
+                    position_info += " (at bottom)"
                 else:
-                    # Scroll the page - try multiple strategies for modern SPA pages
-                    scroll_info_before = await page.evaluate("""
-                        () => ({
-                            scrollY: window.scrollY,
-                            scrollX: window.scrollX,
-                            scrollHeight: document.documentElement.scrollHeight,
-                            scrollWidth: document.documentElement.scrollWidth,
-                            clientHeight: window.innerHeight,
-                            clientWidth: window.innerWidth
-                        })
-                    """)
-                    
-                    # Strategy 1: Try scrolling the main scrollable container if page itself isn't scrollable
-                    page_scrollable_x = scroll_info_before["scrollWidth"] > scroll_info_before["clientWidth"]
-                    page_scrollable_y = scroll_info_before["scrollHeight"] > scroll_info_before["clientHeight"]
-                    
-                    scroll_success = False
-                    scroll_target = "page"
-                    
-                    # If page isn't scrollable in target direction, try to find and scroll a container
-                    if (direction in ["left", "right"] and not page_scrollable_x) or \
-                       (direction in ["up", "down"] and not page_scrollable_y):
-                        # Find and scroll the largest scrollable container
-                        container_scrolled = await page.evaluate(f"""
-                            (direction, amount) => {{
-                                const allElements = document.querySelectorAll('*');
-                                let bestContainer = null;
-                                let bestSize = 0;
-                                
-                                for (const el of allElements) {{
-                                    if (el === document.body || el === document.documentElement) continue;
-                                    
-                                    const style = window.getComputedStyle(el);
-                                    const overflowX = style.overflowX;
-                                    const overflowY = style.overflowY;
-                                    
-                                    let isScrollable = false;
-                                    let scrollableSize = 0;
-                                    
-                                    if (direction === 'left' || direction === 'right') {{
-                                        isScrollable = (overflowX === 'auto' || overflowX === 'scroll') && 
-                                                      el.scrollWidth > el.clientWidth;
-                                        scrollableSize = el.scrollWidth - el.clientWidth;
-                                    }} else {{
-                                        isScrollable = (overflowY === 'auto' || overflowY === 'scroll') && 
-                                                      el.scrollHeight > el.clientHeight;
-                                        scrollableSize = el.scrollHeight - el.clientHeight;
-                                    }}
-                                    
-                                    if (isScrollable && scrollableSize > bestSize) {{
-                                        bestContainer = el;
-                                        bestSize = scrollableSize;
-                                    }}
+                    percent = int((current / max_scroll) * 100) if max_scroll > 0 else 0
+                    position_info += f" ({percent}%)"
+            else:
+                max_scroll = scroll_info_after["scrollWidth"] - scroll_info_after["clientWidth"]
+                current = scroll_info_after["scrollLeft"]
+                at_left = current <= 0
+                at_right = current >= max_scroll - 1
+                position_info = f"Position: {current}/{max_scroll}"
+                if at_left:
+                    position_info += " (at left)"
+                elif at_right:
+                    position_info += " (at right)"
+                else:
+                    percent = int((current / max_scroll) * 100) if max_scroll > 0 else 0
+                    position_info += f" ({percent}%)"
+            
+            return True, f"Scrolled {direction} by {amount}px on element with BID '{bid}'. {position_info}. {describe_settle(settled)}"
+        else:
+            # Scroll the page - try multiple strategies for modern SPA pages
+            scroll_info_before = await page.evaluate("""
+                () => ({
+                    scrollY: window.scrollY,
+                    scrollX: window.scrollX,
+                    scrollHeight: document.documentElement.scrollHeight,
+                    scrollWidth: document.documentElement.scrollWidth,
+                    clientHeight: window.innerHeight,
+                    clientWidth: window.innerWidth
+                })
+            """)
+            
+            # Scroll strategies; the settle detector sees content loaded by the scroll
+            async with SettleDetector(page, self.settle_config) as settle:
+                # Strategy 1: Try scrolling the main scrollable container if page itself isn't scrollable
+                page_scrollable_x = scroll_info_before["scrollWidth"] > scroll_info_before["clientWidth"]
+                page_scrollable_y = scroll_info_before["scrollHeight"] > scroll_info_before["clientHeight"]
+            
+                scroll_success = False
+                scroll_target = "page"
+            
+                # If page isn't scrollable in target direction, try to find and scroll a container
+                if (direction in ["left", "right"] and not page_scrollable_x) or \
+                   (direction in ["up", "down"] and not page_scrollable_y):
+                    # Find and scroll the largest scrollable container
+                    container_scrolled = await page.evaluate(f"""
+                        (direction, amount) => {{
+                            const allElements = document.querySelectorAll('*');
+                            let bestContainer = null;
+                            let bestSize = 0;
+                        
+                            for (const el of allElements) {{
+                                if (el === document.body || el === document.documentElement) continue;
+                            
+                                const style = window.getComputedStyle(el);
+                                const overflowX = style.overflowX;
+                                const overflowY = style.overflowY;
+                            
+                                let isScrollable = false;
+                                let scrollableSize = 0;
+                            
+                                if (direction === 'left' || direction === 'right') {{
+                                    isScrollable = (overflowX === 'auto' || overflowX === 'scroll') && 
+                                                  el.scrollWidth > el.clientWidth;
+                                    scrollableSize = el.scrollWidth - el.clientWidth;
+                                }} else {{
+                                    isScrollable = (overflowY === 'auto' || overflowY === 'scroll') && 
+                                                  el.scrollHeight > el.clientHeight;
+                                    scrollableSize = el.scrollHeight - el.clientHeight;
                                 }}
-                                
-                                if (bestContainer) {{
-                                    if (direction === 'down') {{
-                                        bestContainer.scrollTop += amount;
-                                    }} else if (direction === 'up') {{
-                                        bestContainer.scrollTop -= amount;
-                                    }} else if (direction === 'left') {{
-                                        bestContainer.scrollLeft -= amount;
-                                    }} else if (direction === 'right') {{
-                                        bestContainer.scrollLeft += amount;
-                                    }}
-                                    return true;
+                            
+                                if (isScrollable && scrollableSize > bestSize) {{
+                                    bestContainer = el;
+                                    bestSize = scrollableSize;
                                 }}
-                                return false;
                             }}
-                        """, direction, amount)
                         
-                        if container_scrolled:
-                            scroll_success = True
-                            scroll_target = "container"
-                    
-                    # Strategy 2: Scroll the page/window (if not already scrolled via container)
-                    if not scroll_success:
-                        if direction == "down":
-                            await page.evaluate(f"window.scrollBy(0, {amount})")
-                        elif direction == "up":
-                            await page.evaluate(f"window.scrollBy(0, -{amount})")
-                        elif direction == "left":
-                            await page.evaluate(f"window.scrollBy(-{amount}, 0)")
-                        elif direction == "right":
-                            await page.evaluate(f"window.scrollBy({amount}, 0)")
-                    
-                    # Wait a bit for scroll to complete
-                    await page.wait_for_timeout(100)
-                    
-                    # Get scroll info after scrolling
-                    scroll_info_after = await page.evaluate("""
-                        () => ({
-                            scrollY: window.scrollY,
-                            scrollX: window.scrollX,
-                            scrollHeight: document.documentElement.scrollHeight,
-                            scrollWidth: document.documentElement.scrollWidth,
-                            clientHeight: window.innerHeight,
-                            clientWidth: window.innerWidth
-                        })
-                    """)
-                    
-                    # Calculate scroll position and limits
-                    if direction in ["up", "down"]:
-                        max_scroll = scroll_info_after["scrollHeight"] - scroll_info_after["clientHeight"]
-                        current = scroll_info_after["scrollY"]
-                        at_top = current <= 0
-                        at_bottom = current >= max_scroll - 1
-                        position_info = f"Position: {current}/{max_scroll}"
-                        if at_top:
-                            position_info += " (at top)"
-                        elif at_bottom:
-                            position_info += " (at bottom)"
-                        else:
-                            percent = int((current / max_scroll) * 100) if max_scroll > 0 else 0
-                            position_info += f" ({percent}%)"
-                    else:
-                        max_scroll = scroll_info_after["scrollWidth"] - scroll_info_after["clientWidth"]
-                        current = scroll_info_after["scrollX"]
-                        at_left = current <= 0
-                        at_right = current >= max_scroll - 1
-                        position_info = f"Position: {current}/{max_scroll}"
-                        if at_left:
-                            position_info += " (at left)"
-                        elif at_right:
-                            position_info += " (at right)"
-                        else:
-                            percent = int((current / max_scroll) * 100) if max_scroll > 0 else 0
-                            position_info += f" ({percent}%)"
-                    
-                    # Check if scroll actually happened
-                    scroll_changed = False
-                    if direction in ["up", "down"]:
-                        scroll_changed = abs(scroll_info_after["scrollY"] - scroll_info_before["scrollY"]) > 1
-                    else:
-                        scroll_changed = abs(scroll_info_after["scrollX"] - scroll_info_before["scrollX"]) > 1
-                    
-                    if not scroll_changed and max_scroll <= 0:
-                        return f"WARNING: Page is not scrollable in {direction} direction. Content fits within viewport (scrollWidth={scroll_info_after['scrollWidth']}, clientWidth={scroll_info_after['clientWidth']}). Try scrolling a specific element by providing its BID from dom_mark_elements()."
-                    
-                    return f"Scrolled page {direction} by {amount}px ({scroll_target}). {position_info}"
+                            if (bestContainer) {{
+                                if (direction === 'down') {{
+                                    bestContainer.scrollTop += amount;
+                                }} else if (direction === 'up') {{
+                                    bestContainer.scrollTop -= amount;
+                                }} else if (direction === 'left') {{
+                                    bestContainer.scrollLeft -= amount;
+                                }} else if (direction === 'right') {{
+                                    bestContainer.scrollLeft += amount;
+                                }}
+                                return true;
+                            }}
+                            return false;
+                        }}
+                    """, direction, amount)
+                
+                    if container_scrolled:
+                        scroll_success = True
+                        scroll_target = "container"
             
-            return self._with_page(lambda page: op(page), wait_timeout=5000)
+                # Strategy 2: Scroll the page/window (if not already scrolled via container)
+                if not scroll_success:
+                    if direction == "down":
+                        await page.evaluate(f"window.scrollBy(0, {amount})")
+                    elif direction == "up":
+                        await page.evaluate(f"window.scrollBy(0, -{amount})")
+                    elif direction == "left":
+                        await page.evaluate(f"window.scrollBy(-{amount}, 0)")
+                    elif direction == "right":
+                        await page.evaluate(f"window.scrollBy({amount}, 0)")
+            
+                # Wait for the scroll and anything it loads instead of a fixed delay
+                settled = await settle.wait()
+            
+            # Get scroll info after scrolling
+            scroll_info_after = await page.evaluate("""
+                () => ({
+                    scrollY: window.scrollY,
+                    scrollX: window.scrollX,
+                    scrollHeight: document.documentElement.scrollHeight,
+                    scrollWidth: document.documentElement.scrollWidth,
+                    clientHeight: window.innerHeight,
+                    clientWidth: window.innerWidth
+                })
+            """)
+            
+            # Calculate scroll position and limits
+            if direction in ["up", "down"]:
+                max_scroll = scroll_info_after["scrollHeight"] - scroll_info_after["clientHeight"]
+                current = scroll_info_after["scrollY"]
+                at_top = current <= 0
+                at_bottom = current >= max_scroll - 1
+                position_info = f"Position: {current}/{max_scroll}"
+                if at_top:
+                    position_info += " (at top)"
+                elif at_bottom:
+                    position_info += " (at bottom)"
+                else:
+                    percent = int((current / max_scroll) * 100) if max_scroll > 0 else 0
+                    position_info += f" ({percent}%)"
+            else:
+                max_scroll = scroll_info_after["scrollWidth"] - scroll_info_after["clientWidth"]
+                current = scroll_info_after["scrollX"]
+                at_left = current <= 0
+                at_right = current >= max_scroll - 1
+                position_info = f"Position: {current}/{max_scroll}"
+                if at_left:
+                    position_info += " (at left)"
+                elif at_right:
+                    position_info += " (at right)"
+                else:
+                    percent = int((current / max_scroll) * 100) if max_scroll > 0 else 0
+                    position_info += f" ({percent}%)"
+            
+            # Check if scroll actually happened
+            scroll_changed = False
+            if direction in ["up", "down"]:
+                scroll_changed = abs(scroll_info_after["scrollY"] - scroll_info_before["scrollY"]) > 1
+            else:
+                scroll_changed = abs(scroll_info_after["scrollX"] - scroll_info_before["scrollX"]) > 1
+            
+            if not scroll_changed and max_scroll <= 0:
+                return True, f"WARNING: Page is not scrollable in {direction} direction. Content fits within viewport (scrollWidth={scroll_info_after['scrollWidth']}, clientWidth={scroll_info_after['clientWidth']}). Try scrolling a specific element by providing its BID from dom_mark_elements()."
+            
+            return True, f"Scrolled page {direction} by {amount}px ({scroll_target}). {position_info}. {describe_settle(settled)}"
+
+    def _dom_scroll(self, bid: str | None = None, direction: str = "down", amount: int = 500, timeout_ms: int = 2000) -> str:
+        """Scroll a DOM element or the page using a BID."""
+        try:
+            return self._with_page(lambda page: self._dom_scroll_on_page(page, bid, direction, amount, timeout_ms), wait_timeout=5000)[1]
         except Exception as e:
             logger.error(f"Failed to scroll: {e}")
             return f"Failed to scroll: {str(e)}"
 
+    async def _dom_step_on_page(self, page, step: Dict[str, Any]) -> Tuple[bool, str]:
+        """Run one dom_batch step on the given page.
+
+        Args:
+            page: Playwright page
+            step: Dict with "action" (dom_click, dom_hover, dom_type, dom_press or
+                  dom_scroll) and the parameters of that action
+
+        Returns:
+            Tuple of (whether the step succeeded, result message)
+        """
+        action_type = step.get("action")
+        bid = step.get("bid")
+        timeout_ms = step.get("timeout_ms", 2000)
+
+        if action_type in ("dom_click", "dom_hover", "dom_type") and not bid:
+            return False, f"ERROR: bid is required for {action_type}"
+        if action_type == "dom_click":
+            return await self._dom_click_on_page(page, bid, step.get("button", "left"), step.get("click_count", 1), timeout_ms)
+        if action_type == "dom_hover":
+            return await self._dom_hover_on_page(page, bid, timeout_ms)
+        if action_type == "dom_type":
+            if step.get("text") is None:
+                return False, "ERROR: text is required for dom_type"
+            return await self._dom_type_on_page(page, bid, step["text"], step.get("clear_first", True), timeout_ms)
+        if action_type == "dom_press":
+            if not step.get("key"):
+                return False, "ERROR: key is required for dom_press"
+            return await self._dom_press_on_page(page, step["key"], bid, timeout_ms)
+        if action_type == "dom_scroll":
+            return await self._dom_scroll_on_page(page, bid, step.get("direction", "down"), step.get("amount", 500), timeout_ms)
+        return False, f"ERROR: Unsupported dom_batch action '{action_type}'"
+
+    def _dom_batch_timeout(self, steps: list) -> float:
+        """Return the seconds a batch may take: the usual operation budget plus each step's worst case.
+
+        A click may try three strategies with the step's timeout_ms each and then settle
+        for up to the settle timeout; other steps take less.
+        """
+        settle_s = settle_config(self.settle_config)["timeout_ms"] / 1000
+        budget = self._get_browser_session().operation_timeout
+        for step in steps:
+            budget += 3 * step.get("timeout_ms", 2000) / 1000 + settle_s
+        return budget
+
+    def _dom_batch(self, steps: list, stop_on_error: bool = True) -> str:
+        """Run a sequence of BID-based DOM steps on one page handle.
+
+        Args:
+            steps: Ordered list of step dicts (see _dom_step_on_page; the count is capped by MAX_BATCH_STEPS in executor/tools.py)
+            stop_on_error: Skip the remaining steps after the first failed one
+
+        Returns:
+            Combined observation with one numbered result line per step
+        """
+        # Filled while the batch runs, so finished steps are reported even if it is cut off
+        lines: list[str] = []
+        progress = {"ran": 0, "failed": 0}
+
+        def summary() -> str:
+            return f"Ran {progress['ran']} of {len(steps)} step(s), {progress['failed']} failed:"
+
+        async def op(page):
+            for index, step in enumerate(steps, 1):
+                action_type = step.get("action")
+                try:
+                    ok, message = await self._dom_step_on_page(page, step)
+                except Exception as e:
+                    ok, message = False, f"Failed to run {action_type}: {str(e)}"
+                progress["ran"] = index
+                lines.append(f"{index}. {action_type}: {message}")
+                if not ok:
+                    progress["failed"] += 1
+                    if stop_on_error and index < len(steps):
+                        lines.append(f"Stopped after step {index} failed; {len(steps) - index} remaining step(s) not run.")
+                        break
+            return "\n".join([summary()] + lines)
+
+        try:
+            return self._with_page(lambda page: op(page), wait_timeout=5000, timeout=self._dom_batch_timeout(steps))
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            logger.error(f"Failed to run DOM batch: {error}")
+            return "\n".join([summary()] + lines + [f"Failed to run DOM batch after step {progress['ran']}: {error}"])
+
     def _navigate_to_url(self, url: str) -> str:
         """Navigate browser to a URL via CDP + Playwright."""
         if not url:
             raise ValueError("browser_navigate requires 'url' parameter")
         try:
-            from playwright.async_api import async_playwright
-
-            async def op():
-                browser_info = self.sdk_client.browser.get_info().data
-                async with async_playwright() as p:
-                    browser = await p.chromium.connect_over_cdp(browser_info.cdp_url)
-                    try:
-                        context = browser.contexts[0] if browser.contexts else await browser.new_context()
-                        page = context.pages[0] if context.pages else await context.new_page()
-                        await page.goto(url, wait_until="domcontentloaded")
-                        return f"Successfully navigated to {url}"
-                    finally:
-                        await browser.close()
-
-            return self._run_async(op())
+            async def op(page):
+                # Wait for DOMContentLoaded as before (up to the 30s navigation timeout), then
+                # for requests and DOM changes to quieten; the settle timeout starts after that
+                async with SettleDetector(page, self.settle_config) as settle:
+                    await page.goto(url, wait_until="domcontentloaded", timeout=NAVIGATION_TIMEOUT_MS)
+                    settled = await settle.wait()
+                return f"Successfully navigated to {url}. {describe_settle(settled)}"
+
+            return self._with_page(op, wait_timeout=0)
         except Exception as e:
             logger.error(f"Failed to navigate: {e}")
             logger.exception("Full traceback:")
@@ -1349,13 +1723,18 @@ class BrowserSandboxClient(SandboxClient):
 
         # DOM-based actions (selector/text-based, no coordinates)
         if action.get("action_type") == "dom_get_text":
-            message = self._dom_get_text()
+            message = self._dom_get_text(
+                offset=action.get("offset", 0), length=action.get("length", 8000), page=action.get("page")
+            )
             feedback = {"done": False, "message": message}
             self.execution_history.append({"action": action, "feedback": feedback})
             return feedback
 
         if action.get("action_type") == "dom_get_html":
-            message = self._dom_get_html()
+            message = self._dom_get_html(
+                offset=action.get("offset", 0), length=action.get("length", 12000), page=action.get("page"),
+                format=action.get("format", "markdown"),
+            )
             feedback = {"done": False, "message": message}
             self.execution_history.append({"action": action, "feedback": feedback})
             return feedback
@@ -1458,7 +1837,14 @@ class BrowserSandboxClient(SandboxClient):
 
         if action.get("action_type") == "dom_mark_elements":
             max_elements = action.get("max_elements", 100)
-            message = self._dom_mark_elements_and_extract(max_elements=max_elements)
+            incremental = action.get("incremental", False)
+            message = self._dom_mark_elements_and_extract(max_elements=max_elements, incremental=incremental)
+            feedback = {"done": False, "message": message}
+            self.execution_history.append({"action": action, "feedback": feedback})
+            return feedback
+
+        if action.get("action_type") == "dom_snapshot":
+            message = self._dom_snapshot(max_tokens=action.get("max_tokens", 2000))
             feedback = {"done": False, "message": message}
             self.execution_history.append({"action": action, "feedback": feedback})
             return feedback
@@ -1535,6 +1921,16 @@ class BrowserSandboxClient(SandboxClient):
             self.execution_history.append({"action": action, "feedback": feedback})
             return feedback
 
+        if action.get("action_type") == "dom_batch":
+            steps = action.get("steps")
+            if not steps:
+                feedback = {"done": False, "message": "steps is required for dom_batch"}
+            else:
+                message = self._dom_batch(steps, stop_on_error=action.get("stop_on_error", True))
+                feedback = {"done": False, "message": message}
+            self.execution_history.append({"action": action, "feedback": feedback})
+            return feedback
+
         if action.get("action_type") == "browser_navigate":
             url = action.get("url")
             message = self._navigate_to_url(url)
@@ -1615,6 +2011,10 @@ class BrowserSandboxClient(SandboxClient):
         logger.debug(f"Clearing execution history ({len(self.execution_history)} entries)")
         self.execution_history = []
 
+    def restore_history(self, entries: list[Dict[str, Any]]) -> None:
+        """Append previously recorded action-feedback entries (e.g. when resuming from a checkpoint)."""
+        self.execution_history.extend(entries)
+
     def create_docker_environment(self, task: Dict[str, Any], wait_time: int = 60) -> bool:
         """
         Create and start an agent server container using task's dockerfile.
@@ -1630,12 +2030,24 @@ class BrowserSandboxClient(SandboxClient):
             return False
         # Clear execution history for new task
         self.clear_history()
-        # Initialize SDK client after docker is ready
+        # Initialize SDK client after docker is ready (the port may differ from the previous task's)
+        self.sdk_client = None
+        self._close_browser_session()
+        self.resource_blocker = None
+        self.har_hook = None
+        self.page_content_cache.clear()
         self._initialize_sdk_client()
         return True
 
+    def cleanup_docker_environment(self) -> bool:
+        """Close the browser connection, then stop the container."""
+        self._close_browser_session()
+        return super().cleanup_docker_environment()
+
 class UnifiedSandboxClient(SandboxClient):
     """Unified client that can handle browser, file, code, and shell operations."""
+
+    READINESS_SERVICES = ("api", "browser", "shell", "jupyter")
     
     def __init__(self, sandbox_config: Dict[str, Any] | None = None, **kwargs):
         super().__init__(sandbox_config, **kwargs)
@@ -1645,6 +2057,8 @@ class UnifiedSandboxClient(SandboxClient):
         # Session IDs for stateful operations
         self.shell_session_id: Optional[str] = None
         self.jupyter_session_id: Optional[str] = None
+        # Browser component (persistent CDP connection and browser state) for the current sandbox
+        self.browser: Optional[BrowserSandboxClient] = None
     
     def _initialize_sdk_client(self) -> None:
         """Initialize the AIO Sandbox SDK client and create sessions."""
@@ -1700,14 +2114,7 @@ class UnifiedSandboxClient(SandboxClient):
         # Route to appropriate handler based on action type
         try:
             # Browser actions
-            if action_type in ["browser_click", "browser_type", "browser_press", "browser_key_down", "browser_key_up", "browser_hotkey",
-                              "browser_scroll", "browser_move_to", "browser_move_rel", "browser_drag_to", "browser_drag_rel",
-                              "browser_wait",
-                              "dom_get_text", "dom_get_html", "dom_query_selector",
-                              "dom_extract_links", "dom_mark_elements", "dom_click", "dom_hover", "dom_type", "dom_press", "dom_scroll",
-                              "browser_navigate",
-                              "browser_screenshot", "browser_get_viewport_info",
-                              ]:
+            if action_type in BROWSER_ACTIONS:
                 return self._handle_browser_action(action)
             
             # File actions
@@ -1743,31 +2150,30 @@ class UnifiedSandboxClient(SandboxClient):
             Tuple of (base64_encoded_image, status_message)
         """
         self._initialize_sdk_client()
-        try:
-            import base64
-            screenshot_data = b""
-            for chunk in self.sdk_client.browser.screenshot():
-                screenshot_data += chunk
-            
-            # Encode to base64
-            base64_image = base64.b64encode(screenshot_data).decode('utf-8')
-            status_message = f"Screenshot taken successfully ({len(screenshot_data)} bytes)"
-            return base64_image, status_message
-        except Exception as e:
-            logger.error(f"Failed to take screenshot: {e}")
-            return "", f"Failed to take screenshot: {str(e)}"
+        return self._get_browser().take_screenshot()
+
+    def _get_browser(self) -> BrowserSandboxClient:
+        """Return the browser component of the current sandbox, creating it on first use."""
+        if self.browser is None:
+            self.browser = BrowserSandboxClient(owner=self)
+        return self.browser
     
     def _handle_browser_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle browser-specific actions."""
-        # Reuse BrowserSandboxClient logic
-        browser_client = BrowserSandboxClient.__new__(BrowserSandboxClient)
-        browser_client.sdk_client = self.sdk_client
-        browser_client.execution_history = []
-        feedback = browser_client.get_feedback(action)
-        
-        # Merge history
-        self.execution_history.extend(browser_client.execution_history)
-        return feedback
+        """Handle browser-specific actions (history is shared with the browser component)."""
+        return self._get_browser().get_feedback(action)
+
+    def get_resource_blocking_stats(self) -> Optional[Dict[str, Any]]:
+        """Return the request counters of the browser component's blocking profile, if any."""
+        return self.browser.get_resource_blocking_stats() if self.browser is not None else None
+
+    def get_har_stats(self) -> Optional[Dict[str, Any]]:
+        """Return the HAR record/replay counters of the browser component, if any."""
+        return self.browser.get_har_stats() if self.browser is not None else None
+
+    def flush_har(self) -> None:
+        """Write the browser component's HAR archive recorded so far, if any."""
+        if self.browser is not None:
+            self.browser.flush_har()
     
     def _handle_file_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
         """Handle file-specific actions."""
@@ -1891,9 +2297,7 @@ class UnifiedSandboxClient(SandboxClient):
                     raise ValueError("image_read requires 'path' or 'file' parameter")
                 
                 # Download the image file as binary data
-                image_data = b""
-                for chunk in self.sdk_client.file.download_file(path=file_path):
-                    image_data += chunk
+                image_data = read_chunks(self.sdk_client.file.download_file(path=file_path))
                 
                 if not image_data:
                     raise ValueError(f"Failed to read image file: {file_path} or file is empty")
@@ -2045,11 +2449,56 @@ class UnifiedSandboxClient(SandboxClient):
         """Clear the execution history."""
         logger.debug(f"Clearing execution history ({len(self.execution_history)} entries)")
         self.execution_history = []
+        if self.browser is not None:
+            # Keep the browser component appending to the same list
+            self.browser.execution_history = self.execution_history
+
+    def restore_history(self, entries: list[Dict[str, Any]]) -> None:
+        """Append previously recorded action-feedback entries (e.g. when resuming from a checkpoint)."""
+        self.execution_history.extend(entries)
+
+    def _reset_services(self) -> bool:
+        """Close shell and Jupyter sessions and restart the browser with cleared cookies.
+
+        localStorage/IndexedDB of the browser profile, /tmp and detached background
+        processes are not reset (see executor/pool.py).
+        """
+        if self.sdk_client is None:
+            return False
+        try:
+            self.sdk_client.shell.cleanup_all_sessions()
+            self.sdk_client.jupyter.delete_sessions()
+            self.sdk_client.browser_cookies.clear_cookies()
+            # A hard restart relaunches the browser process, dropping all tabs and page state
+            self.sdk_client.browser.restart(request=RestartRequest(mode="hard"))
+        except Exception as e:
+            logger.warning(f"Failed to reset sandbox services, container will be replaced: {e}")
+            return False
+        finally:
+            self.shell_session_id = None
+            self.jupyter_session_id = None
+        return True
     
     def create_docker_environment(self, task: Dict[str, Any], wait_time: int = 60) -> bool:
         """Create and start an agent server container."""
         if not super().create_docker_environment(task, wait_time):
             return False
         self.clear_history()
+        # Start from a fresh SDK client and sessions bound to the new container
+        self._close_browser_session()
+        self.sdk_client = None
+        self.shell_session_id = None
+        self.jupyter_session_id = None
         self._initialize_sdk_client()
-        return True
\ No newline at end of file
+        return True
+
+    def _close_browser_session(self) -> None:
+        """Drop the browser component and close its persistent session."""
+        browser, self.browser = self.browser, None
+        if browser is not None:
+            browser._close_browser_session()
+
+    def cleanup_docker_environment(self) -> bool:
+        """Close the browser connection, then stop the container."""
+        self._close_browser_session()
+        return super().cleanup_docker_environment()
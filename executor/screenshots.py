@@ -0,0 +1,133 @@
+"""
+Screenshot deduplication.
+
+A difference hash (dHash) of each screenshot is compared with the hash of the
+last screenshot sent to the model. If the screen did not change, the image is
+replaced by a short note, which saves image tokens on long browser tasks.
+Decoding needs Pillow (the `images` extra); without it, only byte-identical
+screenshots are recognized as unchanged.
+"""
+
+import base64
+import hashlib
+import io
+from typing import Any, Dict
+
+import numpy as np
+
+from .logger import get_logger
+
+# Try to import Pillow for decoding PNG/JPEG screenshots
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = get_logger("screenshots")
+
+UNCHANGED_SCREEN_NOTE = "[Screen unchanged since the last screenshot; image omitted]"
+
+# Whether the missing-Pillow warning was already logged (once per process)
+_pil_warning_logged = False
+
+
+def _block_means(pixels: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    """Downscale a 2-D array to rows x cols by averaging (roughly) equal blocks."""
+    row_edges = np.linspace(0, pixels.shape[0], rows + 1).astype(int)[:-1]
+    col_edges = np.linspace(0, pixels.shape[1], cols + 1).astype(int)[:-1]
+    sums = np.add.reduceat(np.add.reduceat(pixels, row_edges, axis=0), col_edges, axis=1)
+    counts = np.outer(np.diff(np.append(row_edges, pixels.shape[0])), np.diff(np.append(col_edges, pixels.shape[1])))
+    return sums / counts
+
+
+def difference_hash(image_base64: str, hash_size: int = 16) -> int | str:
+    """Compute a perceptual difference hash of a base64 image.
+
+    The grayscale image is averaged down to hash_size x (hash_size + 1) and each
+    bit records whether a cell is brighter than its right neighbour.
+
+    Args:
+        image_base64: Base64-encoded PNG/JPEG
+        hash_size: Hash side length (hash has hash_size**2 bits)
+
+    Returns:
+        The hash as an int, or a SHA-1 hex digest of the raw bytes if the image
+        cannot be decoded (Pillow missing or unknown format)
+    """
+    data = base64.b64decode(image_base64)
+    if PIL_AVAILABLE:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                pixels = np.asarray(image.convert("L"), dtype=np.float64)
+            if pixels.shape[0] >= hash_size and pixels.shape[1] > hash_size:
+                cells = _block_means(pixels, hash_size, hash_size + 1)
+                bits = (cells[:, 1:] > cells[:, :-1]).flatten()
+                return int("".join("1" if bit else "0" for bit in bits), 2)
+        except Exception as e:
+            logger.debug(f"Could not decode screenshot for hashing: {e}")
+    return hashlib.sha1(data).hexdigest()
+
+
+def hash_distance(a: int | str, b: int | str) -> int:
+    """Number of differing bits between two dHashes (0 or a large value for byte digests)."""
+    if isinstance(a, int) and isinstance(b, int):
+        return (a ^ b).bit_count()
+    return 0 if a == b else 1 << 30
+
+
+class ScreenshotDeduplicator:
+    """Decides whether a screenshot differs enough from the last one sent to be sent again."""
+
+    def __init__(self, config: Dict[str, Any] | None = None):
+        """Initialize from the `screenshot_dedup` config section.
+
+        Args:
+            config: enabled (default False), hash_size (default 16), threshold (max
+                differing bits still treated as unchanged, default 0) and
+                max_consecutive_skips (send anyway after this many omissions, default 3)
+        """
+        config = config or {}
+        self.enabled = config.get("enabled", False)
+        self.hash_size = config.get("hash_size", 16)
+        self.threshold = config.get("threshold", 0)
+        self.max_consecutive_skips = config.get("max_consecutive_skips", 3)
+        self.skipped = 0
+        self._last_hash: int | str | None = None
+        self._consecutive_skips = 0
+
+        global _pil_warning_logged
+        if self.enabled and not PIL_AVAILABLE and not _pil_warning_logged:
+            _pil_warning_logged = True
+            logger.warning("screenshot_dedup is enabled but Pillow is not installed; only byte-identical "
+                           "screenshots will be omitted (install the 'images' extra for perceptual hashing)")
+
+    def reset(self) -> None:
+        """Forget the last sent screenshot (e.g. at the start of a task)."""
+        self._last_hash = None
+        self._consecutive_skips = 0
+        self.skipped = 0
+
+    def remember(self, image_base64: str) -> None:
+        """Record a screenshot that is sent regardless (e.g. one the model asked for)."""
+        if not self.enabled:
+            return
+        self._last_hash = difference_hash(image_base64, self.hash_size)
+        self._consecutive_skips = 0
+
+    def should_send(self, image_base64: str) -> bool:
+        """Return True if the screenshot should be sent, and remember it as sent if so."""
+        if not self.enabled:
+            return True
+        current = difference_hash(image_base64, self.hash_size)
+        if (
+            self._last_hash is not None
+            and self._consecutive_skips < self.max_consecutive_skips
+            and hash_distance(current, self._last_hash) <= self.threshold
+        ):
+            self._consecutive_skips += 1
+            self.skipped += 1
+            return False
+        self._last_hash = current
+        self._consecutive_skips = 0
+        return True
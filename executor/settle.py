@@ -0,0 +1,169 @@
+"""
+Settle detection for browser actions.
+
+Instead of sleeping a fixed time after a click, scroll or navigation, a
+SettleDetector watches the page over CDP and returns as soon as it is stable:
+no requests in flight for a quiet window, no DOM mutations for a (shorter)
+quiet period, and the document no longer loading. Requests are counted from
+the moment the detector is started, so it has to be entered before the action
+that triggers them. The timeout runs from the call to wait(), so an action
+that blocks on its own (e.g. goto until DOMContentLoaded) does not use it up.
+
+Only changes to the structure, text and a few state attributes (hidden,
+disabled, open, aria-*) count as DOM mutations; style and class changes of
+carousels, tickers and CSS-driven animations are ignored. A page that keeps
+changing anyway (e.g. a live clock or feed) or keeps polling the network
+waits the full timeout_ms, which the observation then reports.
+
+Usage:
+    async with SettleDetector(page, settle_config) as settle:
+        await page.click(...)
+        result = await settle.wait()
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from .logger import get_logger
+
+logger = get_logger("settle")
+
+DEFAULT_SETTLE_CONFIG = {
+    "enabled": True,
+    # No request in flight for this long
+    "network_quiet_ms": 300,
+    # No DOM mutation for this long
+    "mutation_quiet_ms": 200,
+    # Give up and report the page as busy this long after the action returned
+    "timeout_ms": 5000,
+    # Interval between in-page checks
+    "poll_ms": 50,
+}
+
+# Resource types that never finish and must not keep the page "busy"
+_LONG_LIVED_TYPES = {"EventSource", "WebSocket"}
+
+# Installs a MutationObserver (once per document) and reports load and mutation state.
+# Attribute changes only count for attributes that change what can be seen or used,
+# so animated style/class attributes do not keep the page busy.
+_SETTLE_PROBE_JS = """
+() => {
+    if (!window.__cocoaSettle) {
+        window.__cocoaSettle = {lastMutation: performance.now()};
+        new MutationObserver(() => { window.__cocoaSettle.lastMutation = performance.now(); })
+            .observe(document, {
+                childList: true, subtree: true, characterData: true,
+                attributeFilter: ['hidden', 'disabled', 'open', 'aria-hidden', 'aria-expanded', 'aria-busy']
+            });
+    }
+    return {
+        readyState: document.readyState,
+        sinceMutation: performance.now() - window.__cocoaSettle.lastMutation
+    };
+}
+"""
+
+
+def settle_config(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return the settle settings with config overrides (sandbox.settle) applied."""
+    return {**DEFAULT_SETTLE_CONFIG, **(overrides or {})}
+
+
+class SettleDetector:
+    """Counts in-flight requests of a page over CDP and waits for network and DOM quiet."""
+
+    def __init__(self, page, config: Optional[Dict[str, Any]] = None):
+        """Initialize the detector (starts listening on __aenter__).
+
+        Args:
+            page: Playwright page
+            config: Overrides of DEFAULT_SETTLE_CONFIG
+        """
+        self.page = page
+        self.config = settle_config(config)
+        self._cdp = None
+        self._inflight: set[str] = set()
+        self._last_network = time.monotonic()
+        self._started = time.monotonic()
+
+    async def __aenter__(self) -> "SettleDetector":
+        self._started = self._last_network = time.monotonic()
+        if not self.config["enabled"]:
+            return self
+        try:
+            # Install the mutation observer before the action runs
+            await self.page.evaluate(_SETTLE_PROBE_JS)
+        except Exception:
+            pass
+        try:
+            self._cdp = await self.page.context.new_cdp_session(self.page)
+            self._cdp.on("Network.requestWillBeSent", self._on_request)
+            for event in ("Network.loadingFinished", "Network.loadingFailed"):
+                self._cdp.on(event, self._on_request_done)
+            await self._cdp.send("Network.enable")
+        except Exception as e:
+            # Without CDP only the DOM quiet period is checked
+            logger.debug(f"Network tracking unavailable, settling on DOM only: {e}")
+            self._cdp = None
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        cdp, self._cdp = self._cdp, None
+        if cdp is not None:
+            try:
+                await cdp.detach()
+            except Exception:
+                pass
+
+    def _on_request(self, event: Dict[str, Any]) -> None:
+        self._last_network = time.monotonic()
+        if event.get("type") not in _LONG_LIVED_TYPES:
+            self._inflight.add(event.get("requestId"))
+
+    def _on_request_done(self, event: Dict[str, Any]) -> None:
+        self._last_network = time.monotonic()
+        self._inflight.discard(event.get("requestId"))
+
+    async def wait(self) -> Dict[str, Any]:
+        """Wait until the page is stable or the timeout expires.
+
+        Returns:
+            Dict with "settled" (bool), "settle_time" (seconds since the detector
+            was started), "inflight" (requests still open) and "dom_changing"
+            (the DOM was still mutating at the timeout)
+        """
+        if not self.config["enabled"]:
+            return {"settled": True, "settle_time": 0.0, "inflight": 0, "dom_changing": False}
+
+        network_quiet = self.config["network_quiet_ms"] / 1000
+        mutation_quiet_ms = self.config["mutation_quiet_ms"]
+        deadline = time.monotonic() + self.config["timeout_ms"] / 1000
+        poll = self.config["poll_ms"] / 1000
+        tracking_network = self._cdp is not None
+
+        while True:
+            now = time.monotonic()
+            try:
+                state = await self.page.evaluate(_SETTLE_PROBE_JS)
+            except Exception:
+                # The document is being replaced (navigation); treat as busy
+                state = {"readyState": "loading", "sinceMutation": 0}
+            network_idle = not tracking_network or (not self._inflight and now - self._last_network >= network_quiet)
+            dom_idle = state["readyState"] != "loading" and state["sinceMutation"] >= mutation_quiet_ms
+            if network_idle and dom_idle:
+                return {"settled": True, "settle_time": round(now - self._started, 2), "inflight": 0, "dom_changing": False}
+            if now >= deadline:
+                return {"settled": False, "settle_time": round(now - self._started, 2),
+                        "inflight": len(self._inflight), "dom_changing": not dom_idle}
+            await asyncio.sleep(poll)
+
+
+def describe_settle(result: Dict[str, Any]) -> str:
+    """Format a settle result for an observation."""
+    if result["settled"]:
+        return f"Page settled in {result['settle_time']}s."
+    reasons = [f"{result['inflight']} request(s) in flight"]
+    if result.get("dom_changing"):
+        reasons.append("page content still changing")
+    return f"Page still busy after {result['settle_time']}s, waited the full settle timeout ({'; '.join(reasons)})."
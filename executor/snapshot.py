@@ -0,0 +1,139 @@
+"""
+Compact page outline built from the browser's accessibility tree.
+
+The full AX tree (CDP Accessibility.getFullAXTree) is reduced to an indented
+role/name/value outline: ignored and unnamed generic nodes are dropped and
+their children lifted, text that only repeats its parent's name is skipped,
+and interactive nodes get a BID so the dom_* actions can target them. The
+outline is cut to a token budget, dropping plain text before structure.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+# Roles that get a BID (targets of dom_click/dom_type/...)
+INTERACTIVE_ROLES = frozenset({
+    "button", "link", "textbox", "searchbox", "combobox", "listbox", "option",
+    "checkbox", "radio", "switch", "slider", "spinbutton", "tab",
+    "menuitem", "menuitemcheckbox", "menuitemradio", "treeitem",
+})
+
+# Roles without meaning of their own; the node is dropped unless it has a name
+CONTAINER_ROLES = frozenset({"generic", "none", "presentation", "group", "paragraph", "Section", "LayoutTable", "LayoutTableRow", "LayoutTableCell"})
+
+# Roles never shown
+SKIPPED_ROLES = frozenset({"InlineTextBox", "LineBreak", "ListMarker"})
+
+TEXT_ROLE = "StaticText"
+
+# States appended to a line when set
+STATE_PROPERTIES = ("checked", "selected", "expanded", "pressed", "disabled", "required", "level")
+
+# Rough characters per token for the budget
+CHARS_PER_TOKEN = 4
+
+MAX_NAME_LENGTH = 100
+
+
+def _ax_value(node: Dict[str, Any], key: str) -> Any:
+    """Return the value of an AX node field such as role, name or value."""
+    field = node.get(key) or {}
+    return field.get("value")
+
+
+def _states(node: Dict[str, Any]) -> List[str]:
+    """Return 'name=value' strings for the interesting states of a node."""
+    states = []
+    for prop in node.get("properties") or []:
+        name = prop.get("name")
+        value = (prop.get("value") or {}).get("value")
+        if name not in STATE_PROPERTIES or value in (None, False, "false", ""):
+            continue
+        states.append(name if value is True or value == "true" else f"{name}={value}")
+    return states
+
+
+def _truncate(text: str, limit: int = MAX_NAME_LENGTH) -> str:
+    """Collapse whitespace and cut text to limit characters."""
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def build_outline(nodes: List[Dict[str, Any]], max_tokens: int = 2000) -> Tuple[str, Dict[int, str]]:
+    """Turn a CDP AX tree into an indented outline within a token budget.
+
+    Args:
+        nodes: Nodes from Accessibility.getFullAXTree
+        max_tokens: Approximate token budget of the outline (4 characters per token)
+
+    Returns:
+        Tuple of (outline text, mapping of backendDOMNodeId to BID for the
+        interactive nodes that appear in the outline)
+    """
+    by_id = {node["nodeId"]: node for node in nodes}
+    roots = [node for node in nodes if not node.get("parentId") or node["parentId"] not in by_id]
+
+    # (depth, line, (backend node id, BID) or None, is plain text)
+    entries: List[Tuple[int, str, Tuple[int, str] | None, bool]] = []
+    bid_counter = 0
+
+    def visit(node: Dict[str, Any], depth: int, parent_name: str) -> None:
+        nonlocal bid_counter
+        role = _ax_value(node, "role") or ""
+        name = _truncate(_ax_value(node, "name") or "")
+        child_depth = depth
+
+        if not node.get("ignored") and role not in SKIPPED_ROLES:
+            if role == TEXT_ROLE:
+                if name and name != parent_name:
+                    entries.append((depth, f'text "{name}"', None, True))
+                return
+            if role not in CONTAINER_ROLES or name:
+                line = role + (f' "{name}"' if name else "")
+                target = None
+                if role in INTERACTIVE_ROLES and node.get("backendDOMNodeId") is not None:
+                    bid_counter += 1
+                    target = (node["backendDOMNodeId"], f"bid{bid_counter}")
+                    line += f" [{target[1]}]"
+                value = _ax_value(node, "value")
+                if value not in (None, ""):
+                    line += f' value="{_truncate(value)}"'
+                states = _states(node)
+                if states:
+                    line += f" ({', '.join(states)})"
+                entries.append((depth, line, target, False))
+                child_depth = depth + 1
+                parent_name = name or parent_name
+
+        for child_id in node.get("childIds") or []:
+            child = by_id.get(child_id)
+            if child is not None:
+                visit(child, child_depth, parent_name)
+
+    for root in roots:
+        visit(root, 0, "")
+
+    budget = max_tokens * CHARS_PER_TOKEN
+    total = len(entries)
+
+    def size(items) -> int:
+        return sum(2 * depth + len(line) + 3 for depth, line, _, _ in items)
+
+    # Drop plain text first, then cut the structure
+    if size(entries) > budget:
+        entries = [entry for entry in entries if not entry[3]]
+    kept = []
+    used = 0
+    for entry in entries:
+        used += size([entry])
+        if used > budget:
+            break
+        kept.append(entry)
+
+    lines = [f"{'  ' * depth}- {line}" for depth, line, _, _ in kept]
+    if len(kept) < total:
+        lines.append(
+            f"... {total - len(kept)} of {total} node(s) omitted to fit max_tokens={max_tokens}"
+            f"{' (plain text dropped first)' if len(entries) < total else ''}"
+        )
+    bids = dict(target for _, _, target, _ in kept if target is not None)
+    return "\n".join(lines), bids
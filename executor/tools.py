@@ -4,6 +4,28 @@ Tool definitions for browser actions.
 
 from typing import Dict, List, Any
 
+# Browser actions that only inspect the page; nothing on screen changes, so no screenshot is needed after them
+READ_ONLY_BROWSER_ACTIONS = frozenset({
+    "dom_get_text", "dom_get_html", "dom_query_selector", "dom_extract_links", "dom_mark_elements", "dom_snapshot",
+    "browser_get_viewport_info",
+})
+
+# Browser actions that can change what is on screen; the model gets a screenshot after them
+MUTATING_BROWSER_ACTIONS = frozenset({
+    "browser_click", "browser_type", "browser_press", "browser_key_down", "browser_key_up", "browser_hotkey",
+    "browser_scroll", "browser_move_to", "browser_move_rel", "browser_drag_to", "browser_drag_rel",
+    "browser_wait", "browser_navigate",
+    "dom_click", "dom_hover", "dom_type", "dom_press", "dom_scroll", "dom_batch",
+})
+
+# Actions that can be steps of a dom_batch call
+DOM_BATCH_STEP_ACTIONS = ("dom_click", "dom_hover", "dom_type", "dom_press", "dom_scroll")
+# Longest dom_batch; every step may wait for the page to settle
+MAX_BATCH_STEPS = 20
+
+# All browser actions; browser_screenshot returns its own image
+BROWSER_ACTIONS = READ_ONLY_BROWSER_ACTIONS | MUTATING_BROWSER_ACTIONS | {"browser_screenshot"}
+
 
 def get_browser_tools() -> List[Dict[str, Any]]:
     """Get OpenAI tool definitions for browser actions.
@@ -301,10 +323,23 @@ def get_browser_tools() -> List[Dict[str, Any]]:
             "type": "function",
             "function": {
                 "name": "dom_get_text",
-                "description": "Get page text (innerText of body) via DOM, no vision required. Truncates long output.",
+                "description": "Get page text (innerText of body) via DOM, no vision required. Long text is returned in windows; read further windows with offset or page (served from a cache while the page is unchanged).",
                 "parameters": {
                     "type": "object",
-                    "properties": {}
+                    "properties": {
+                        "offset": {
+                            "type": "integer",
+                            "description": "First character to return (default 0); use the offset given at the end of a truncated result to read on"
+                        },
+                        "length": {
+                            "type": "integer",
+                            "description": "Number of characters to return (default 8000)"
+                        },
+                        "page": {
+                            "type": "integer",
+                            "description": "1-based page number of length-sized windows; overrides offset"
+                        }
+                    }
                 }
             }
         },
@@ -312,10 +347,28 @@ def get_browser_tools() -> List[Dict[str, Any]]:
             "type": "function",
             "function": {
                 "name": "dom_get_html",
-                "description": "Get full page HTML via DOM (truncated if long).",
+                "description": "Get the page HTML via DOM, condensed to markdown by default: headings, text, lists, tables, links and form controls (with id/name) without scripts, styles, SVG or hidden elements. Use format=\"html\" for the raw HTML. Long output is returned in windows; read further windows with offset or page (served from a cache while the page is unchanged).",
                 "parameters": {
                     "type": "object",
-                    "properties": {}
+                    "properties": {
+                        "offset": {
+                            "type": "integer",
+                            "description": "First character to return (default 0); use the offset given at the end of a truncated result to read on"
+                        },
+                        "length": {
+                            "type": "integer",
+                            "description": "Number of characters to return (default 12000)"
+                        },
+                        "page": {
+                            "type": "integer",
+                            "description": "1-based page number of length-sized windows; overrides offset"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": ["markdown", "html"],
+                            "description": "markdown (condensed, default) or html (raw page.content())"
+                        }
+                    }
                 }
             }
         },
@@ -371,6 +424,26 @@ def get_browser_tools() -> List[Dict[str, Any]]:
                         "max_elements": {
                             "type": "integer",
                             "description": "Maximum number of elements to mark and return (default 100)"
+                        },
+                        "incremental": {
+                            "type": "boolean",
+                            "description": "Keep existing BIDs and return only the elements added, removed or changed since the previous incremental call on this page (default false). The first call on a page returns the full list. The page is only rescanned after DOM changes, typing, hovering, focus, resizing or CSS animations; if elements appeared or disappeared in some other way, call without incremental to rescan and reassign all BIDs."
+                        }
+                    }
+                }
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "dom_snapshot",
+                "description": "Return a compact outline of the page built from the browser's accessibility tree: one indented line per meaningful node with its role, name, value and state. Interactive nodes get BIDs usable with the DOM interaction actions (this replaces BIDs from dom_mark_elements). Shows the whole page structure in far fewer tokens than dom_get_html.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "max_tokens": {
+                            "type": "integer",
+                            "description": "Approximate token budget of the outline; plain text is dropped first, then the outline is cut (default 2000)"
                         }
                     }
                 }
@@ -511,6 +584,48 @@ def get_browser_tools() -> List[Dict[str, Any]]:
                 }
             }
         },
+        {
+            "type": "function",
+            "function": {
+                "name": "dom_batch",
+                "description": "Run several BID-based DOM actions (dom_click, dom_hover, dom_type, dom_press, dom_scroll) in order in a single call, e.g. to fill and submit a form. Returns one result line per step. The BIDs must be obtained first using dom_mark_elements.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "steps": {
+                            "type": "array",
+                            "description": "Ordered steps (at most 20). Each step has an 'action' and the parameters of that action, e.g. {\"action\": \"dom_type\", \"bid\": \"bid3\", \"text\": \"hello\"}",
+                            "maxItems": MAX_BATCH_STEPS,
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "action": {
+                                        "type": "string",
+                                        "enum": list(DOM_BATCH_STEP_ACTIONS),
+                                        "description": "DOM action to run"
+                                    },
+                                    "bid": {"type": "string", "description": "BID of the target element"},
+                                    "text": {"type": "string", "description": "Text to type (dom_type)"},
+                                    "clear_first": {"type": "boolean", "description": "Clear before typing (dom_type, default true)"},
+                                    "key": {"type": "string", "description": "Key to press (dom_press)"},
+                                    "button": {"type": "string", "enum": ["left", "right", "middle"], "description": "Mouse button (dom_click)"},
+                                    "click_count": {"type": "integer", "description": "Number of clicks (dom_click)"},
+                                    "direction": {"type": "string", "enum": ["up", "down", "left", "right"], "description": "Scroll direction (dom_scroll)"},
+                                    "amount": {"type": "integer", "description": "Scroll amount in pixels (dom_scroll)"},
+                                    "timeout_ms": {"type": "integer", "description": "Timeout in milliseconds (default 2000)"}
+                                },
+                                "required": ["action"]
+                            }
+                        },
+                        "stop_on_error": {
+                            "type": "boolean",
+                            "description": "Stop at the first failed step (default true)"
+                        }
+                    },
+                    "required": ["steps"]
+                }
+            }
+        },
         {
             "type": "function",
             "function": {
@@ -900,16 +1015,18 @@ def map_tool_call_to_action(tool_name: str, arguments: Dict[str, Any]) -> Dict[s
         "browser_screenshot": set(),
         "browser_get_viewport_info": set(),
         "browser_navigate": {"url"},
-        "dom_get_text": set(),
-        "dom_get_html": set(),
+        "dom_get_text": {"offset", "length", "page"},
+        "dom_get_html": {"offset", "length", "page", "format"},
         "dom_query_selector": {"selector", "limit"},
         "dom_extract_links": {"filter_pattern", "limit"},
-        "dom_mark_elements": {"max_elements"},
+        "dom_mark_elements": {"max_elements", "incremental"},
+        "dom_snapshot": {"max_tokens"},
         "dom_click": {"bid", "button", "click_count", "timeout_ms"},
         "dom_hover": {"bid", "timeout_ms"},
         "dom_type": {"bid", "text", "clear_first", "timeout_ms"},
         "dom_press": {"key", "bid", "timeout_ms"},
         "dom_scroll": {"bid", "direction", "amount", "timeout_ms"},
+        "dom_batch": {"steps", "stop_on_error"},
         "file_read": {"path"},
         "file_write": {"path", "content"},
         "file_list": {"path"},
@@ -941,6 +1058,27 @@ def map_tool_call_to_action(tool_name: str, arguments: Dict[str, Any]) -> Dict[s
     if tool_name not in valid_tools:
         raise ValueError(f"Unknown tool: {tool_name}")
     
+    # Validate each dom_batch step against the parameters of its action
+    if tool_name == "dom_batch":
+        steps = arguments.get("steps")
+        if not isinstance(steps, list):
+            raise ValueError(f"Tool 'dom_batch' expects 'steps' to be a list, got {type(steps).__name__}")
+        if len(steps) > MAX_BATCH_STEPS:
+            raise ValueError(f"Tool 'dom_batch' accepts at most {MAX_BATCH_STEPS} steps, got {len(steps)}. Split the steps over several calls.")
+        for index, step in enumerate(steps, 1):
+            step_action = step.get("action") if isinstance(step, dict) else None
+            if step_action not in DOM_BATCH_STEP_ACTIONS:
+                raise ValueError(
+                    f"dom_batch step {index} has invalid action {step_action!r}. "
+                    f"Valid actions are: {list(DOM_BATCH_STEP_ACTIONS)}"
+                )
+            invalid_params = set(step.keys()) - tool_valid_params[step_action] - {"action"}
+            if invalid_params:
+                raise ValueError(
+                    f"dom_batch step {index} ({step_action}) does not support parameters: {invalid_params}. "
+                    f"Valid parameters are: {tool_valid_params[step_action]}"
+                )
+    
     # Build action with tool name as action_type (no mapping needed)
     action = {"action_type": tool_name}
     action.update(arguments)
@@ -4,9 +4,14 @@ Utility functions for the executor environment.
 
 import json
 import os
+import socket
+import tempfile
+import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Any, Dict
+from urllib3.util.retry import Retry
 from colorama import Fore, Style
 from .logger import setup_logging, get_logger
 
@@ -27,15 +32,113 @@ def load_config(config_path: str) -> Dict[str, Any]:
         return {}
 
 
-def retry_request(func, max_retries: int = 3, delay: float = 1.0):
-    """Retry a function with exponential backoff."""
-    for attempt in range(max_retries):
+def write_json_atomic(path: str | os.PathLike, data: Any, indent: int = 2) -> None:
+    """Write JSON to a file atomically (temp file in the same directory plus rename).
+
+    A reader never sees a partially written file: it either finds the previous
+    content or the complete new one, even if the process is killed mid-write.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Defaults of the `sandbox.http` config section
+DEFAULT_HTTP_CONFIG = {
+    "pool_connections": 4,
+    "pool_maxsize": 16,
+    "retries": 3,
+    "backoff_factor": 1.0,
+    "status_forcelist": [502, 503, 504],
+    "timeout": 30,
+}
+
+
+def create_http_session(http_config: Dict[str, Any] | None = None, retries: bool = True) -> requests.Session:
+    """Create a keep-alive HTTP session with connection pooling and, optionally, retries.
+
+    Retries are handled by the adapter (connection errors and the status codes in
+    status_forcelist, with exponential backoff), so callers need no retry loop.
+
+    Args:
+        http_config: Overrides of DEFAULT_HTTP_CONFIG (pool_connections, pool_maxsize,
+                     retries, backoff_factor, status_forcelist)
+        retries: If False, requests fail on the first error (e.g. for readiness probes)
+
+    Returns:
+        Configured requests.Session
+    """
+    settings = {**DEFAULT_HTTP_CONFIG, **(http_config or {})}
+    retry = Retry(
+        total=settings["retries"] if retries else 0,
+        backoff_factor=settings["backoff_factor"],
+        status_forcelist=settings["status_forcelist"],
+        allowed_methods=None,  # sandbox calls are retried regardless of method, as before
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings["pool_connections"],
+        pool_maxsize=settings["pool_maxsize"],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_reserved_ports: set[int] = set()
+_reserved_ports_lock = threading.Lock()
+
+
+def _port_is_free(port: int) -> bool:
+    """Check whether a TCP port can be bound on all host interfaces."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
         try:
-            return func()
-        except Exception as e:
-            if attempt == max_retries - 1:
-                raise e
-            time.sleep(delay * (2 ** attempt))
+            sock.bind(("", port))
+            return True
+        except OSError:
+            return False
+
+
+def allocate_port(preferred: int, max_tries: int = 200) -> int:
+    """Reserve a free host port, starting the search at the preferred port.
+
+    Reserved ports are tracked process-wide so that concurrent workers never
+    receive the same port, even before their containers have bound it.
+
+    Args:
+        preferred: First port to try
+        max_tries: Number of consecutive ports to probe before giving up
+
+    Returns:
+        The reserved port number
+
+    Raises:
+        RuntimeError: If no free port is found in the probed range
+    """
+    with _reserved_ports_lock:
+        for port in range(preferred, preferred + max_tries):
+            if port in _reserved_ports or not _port_is_free(port):
+                continue
+            _reserved_ports.add(port)
+            return port
+    raise RuntimeError(f"No free port found in range {preferred}-{preferred + max_tries - 1}")
+
+
+def release_port(port: int) -> None:
+    """Release a port previously reserved with allocate_port."""
+    with _reserved_ports_lock:
+        _reserved_ports.discard(port)
 
 
 def validate_response(response: requests.Response) -> Dict[str, Any]:
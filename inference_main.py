@@ -3,16 +3,22 @@ Main inference script for running model inference in the agent environment.
 """
 
 import argparse
-import json
+import copy
+import hashlib
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any, Dict, List
 
 import yaml
 
 from agents import BaseAgent, CocoaAgent, OpenAIDeepResearchAgent, GeminiDeepResearchAgent
-from executor.utils import setup_logging, load_config, get_logger
+from executor.checkpoint import TaskCheckpoint
+from executor.utils import setup_logging, load_config, get_logger, allocate_port, release_port, write_json_atomic
 from decrypt import decrypt_file_to_memory, read_canary
+from calculate_stats import collect_results, compute_statistics, format_statistics, load_result
 
 
 def parse_arguments() -> dict:
@@ -26,6 +32,28 @@ def parse_arguments() -> dict:
                        help="Output directory for results (one JSON file per task)")
     parser.add_argument("--model", type=str,
                        help="Override model name from config")
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Number of tasks to run concurrently, each in its own sandbox (default: 1)")
+    parser.add_argument("--resume", action="store_true",
+                       help="Skip tasks that already have a result JSON in --output-dir")
+    parser.add_argument("--rerun-errors", action="store_true",
+                       help="Resume like --resume, but also re-run tasks whose result has status 'error' or no 'eval'")
+    parser.add_argument("--shard-index", type=int, default=0,
+                       help="Index of the shard to run on this machine (0-based, use with --num-shards)")
+    parser.add_argument("--num-shards", type=int, default=1,
+                       help="Split the task list into this many deterministic shards (default: 1)")
+    parser.add_argument("--shard-weights-from", type=str, nargs="+",
+                       help="Output dir(s) of earlier runs; balance shards by their recorded execution_time")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                       help="Disable per-iteration checkpoints in <output-dir>/checkpoints/")
+    parser.add_argument("--rebuild-images", action="store_true",
+                       help="Rebuild task images without layer cache even if an image for the same build context exists")
+    parser.add_argument("--prefetch", action="store_true",
+                       help="Build and start the next task's sandbox while the current task runs")
+    parser.add_argument("--har", type=str, choices=["record", "replay"],
+                       help="Record each task's browser traffic to a HAR archive, or replay it from one")
+    parser.add_argument("--har-dir", type=str,
+                       help="Directory of the HAR archives (default: <output-dir>/har)")
 
     return parser.parse_args()
 
@@ -110,6 +138,269 @@ def load_tasks(tasks_dir: str, use_encrypted: bool = False) -> List[Dict[str, An
     return tasks
 
 
+def create_agent(config: Dict[str, Any]) -> BaseAgent:
+    """Instantiate the agent selected by the configuration."""
+    agent_type = config.get("agent_type", "cocoa")
+
+    if agent_type == "openai_deep_research":
+        return OpenAIDeepResearchAgent(config)
+    elif agent_type == "gemini_deep_research":
+        return GeminiDeepResearchAgent(config)
+    elif agent_type == "cocoa":
+        return CocoaAgent(config)
+    else:
+        raise ValueError(f"Unknown agent type: {agent_type}")
+
+
+def run_single_task(
+    agent: BaseAgent,
+    task: Dict[str, Any],
+    output_dir: str,
+    next_task: Dict[str, Any] | None = None,
+) -> None:
+    """Set up, run, evaluate and clean up a single task, saving its result JSON.
+
+    Args:
+        agent: Agent used to run the task
+        task: Task dictionary from load_tasks
+        output_dir: Directory where <task_name>.json is written
+        next_task: Task that will run next on this agent; its environment is prepared
+            in the background while this task runs
+    """
+    logger = get_logger("inference")
+    task_name = task.get("task_name", "task")
+    output_file = Path(output_dir) / f"{task_name}.json"
+
+    try:
+        agent.setup_environment(task)
+        if next_task is not None:
+            agent.prefetch_environment(next_task)
+        result = agent.run_task(task)
+
+        # Run test if available
+        test_result = agent.run_eval(task, result)
+        if test_result is not None:
+            result["eval"] = test_result
+
+        # Save result to task-specific JSON file
+        write_json_atomic(output_file, result)
+        logger.debug(f"Task {task_name} result saved to {output_file}")
+
+        # The final result supersedes the per-iteration checkpoint
+        checkpoint_dir = agent.config.get("checkpoint_dir")
+        if checkpoint_dir:
+            TaskCheckpoint(checkpoint_dir, task_name).discard()
+    except Exception as e:
+        logger.error(f"Task {task_name} failed with error: {e}")
+        # Save error result
+        save_error_result(output_dir, task_name, e)
+    finally:
+        try:
+            agent.cleanup_environment()
+        except Exception as e:
+            # The result is already written; the next setup_environment starts a fresh sandbox
+            logger.error(f"Cleanup after task {task_name} failed: {e}")
+
+
+def save_error_result(output_dir: str, task_name: str, error: Exception) -> None:
+    """Write an error result for a task that could not be run or finished."""
+    error_result = {
+        "status": "error",
+        "error": str(error),
+        "task_name": task_name
+    }
+    write_json_atomic(Path(output_dir) / f"{task_name}.json", error_result)
+
+
+def filter_pending_tasks(tasks: List[Dict[str, Any]], output_dir: str, rerun_errors: bool = False) -> List[Dict[str, Any]]:
+    """Drop tasks that already have a final result in the output directory.
+
+    Args:
+        tasks: Tasks from load_tasks
+        output_dir: Directory holding <task_name>.json results
+        rerun_errors: Keep tasks whose result has status 'error' or lacks an 'eval'
+
+    Returns:
+        Tasks that still need to run
+    """
+    logger = get_logger("inference")
+    pending = []
+    for task in tasks:
+        result = load_result(Path(output_dir) / f"{task['task_name']}.json")
+        if result is None:
+            pending.append(task)
+        elif rerun_errors and (result.get("status") == "error" or "eval" not in result):
+            logger.info(f"Re-running task {task['task_name']} (previous status: {result.get('status')}, eval: {'eval' in result})")
+            pending.append(task)
+        else:
+            logger.debug(f"Skipping completed task {task['task_name']}")
+    logger.info(f"Resuming: {len(tasks) - len(pending)} of {len(tasks)} tasks already completed")
+    return pending
+
+
+def _stable_hash(text: str) -> int:
+    """Hash that is identical across processes and machines (unlike the built-in hash())."""
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16)
+
+
+def load_task_weights(output_dirs: List[str]) -> Dict[str, float]:
+    """Read execution_time of earlier runs, keyed by task name."""
+    weights = {}
+    for task_name, (_, data) in collect_results(output_dirs).items():
+        if data and isinstance(data.get("execution_time"), (int, float)):
+            weights[task_name] = float(data["execution_time"])
+    return weights
+
+
+def shard_tasks(
+    tasks: List[Dict[str, Any]],
+    shard_index: int,
+    num_shards: int,
+    weights: Dict[str, float] | None = None,
+) -> List[Dict[str, Any]]:
+    """Select the tasks that belong to one shard.
+
+    Without weights, a task goes to shard hash(task_name) % num_shards, so every
+    machine computes the same assignment from the task names alone. With weights
+    (past execution times), tasks are spread greedily, longest first, onto the
+    least-loaded shard; tasks without a recorded time count as the median.
+
+    Args:
+        tasks: All tasks, as returned by load_tasks
+        shard_index: Shard to return (0-based)
+        num_shards: Total number of shards
+        weights: Optional mapping of task name to expected execution time
+
+    Returns:
+        The tasks of the requested shard, in their original order
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"--shard-index must be in [0, {num_shards}), got {shard_index}")
+
+    if not weights:
+        return [task for task in tasks if _stable_hash(task["task_name"]) % num_shards == shard_index]
+
+    known = sorted(weights.values())
+    default_weight = known[len(known) // 2]
+    loads = [0.0] * num_shards
+    assignment = {}
+    for task in sorted(tasks, key=lambda t: (-weights.get(t["task_name"], default_weight), t["task_name"])):
+        shard = min(range(num_shards), key=lambda i: (loads[i], i))
+        loads[shard] += weights.get(task["task_name"], default_weight)
+        assignment[task["task_name"]] = shard
+    return [task for task in tasks if assignment[task["task_name"]] == shard_index]
+
+
+def make_worker_config(config: Dict[str, Any], worker_id: int) -> Dict[str, Any]:
+    """Copy the config for one worker, giving it its own sandbox port and container names."""
+    worker_config = copy.deepcopy(config)
+    sandbox_config = worker_config.setdefault("sandbox", {})
+    base_port = sandbox_config.get("docker_port", 8080)
+    sandbox_config["docker_port"] = allocate_port(base_port + worker_id)
+    sandbox_config["worker_id"] = worker_id
+    return worker_config
+
+
+def run_tasks_parallel(
+    config: Dict[str, Any],
+    tasks: List[Dict[str, Any]],
+    output_dir: str,
+    num_workers: int,
+    prefetch: bool = False,
+) -> None:
+    """Run tasks on a pool of workers, each with its own agent and sandbox.
+
+    Workers pull tasks from a shared queue, so a slow task never blocks the others.
+
+    Args:
+        config: Base configuration (copied per worker)
+        tasks: Tasks to run
+        output_dir: Directory where result JSON files are written
+        num_workers: Number of concurrent workers
+        prefetch: Let each worker claim its next task early and prepare its sandbox
+            while the current task runs
+    """
+    logger = get_logger("inference")
+    task_queue: queue.Queue = queue.Queue()
+    for task in tasks:
+        task_queue.put(task)
+
+    progress_lock = threading.Lock()
+    started = 0
+
+    def next_task() -> Dict[str, Any] | None:
+        try:
+            return task_queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def worker(worker_id: int) -> None:
+        nonlocal started
+        port = None
+        agent = None
+        try:
+            worker_config = make_worker_config(config, worker_id)
+            port = worker_config["sandbox"]["docker_port"]
+            logger.info(f"Worker {worker_id} using sandbox port {port}")
+            agent = create_agent(worker_config)
+            task = next_task()
+            while task is not None:
+                upcoming = next_task() if prefetch else None
+                with progress_lock:
+                    started += 1
+                    index = started
+                logger.info(f"[worker {worker_id}] Processing task {index}/{len(tasks)}: {task['task_name']}")
+                try:
+                    run_single_task(agent, task, output_dir, next_task=upcoming)
+                except Exception as e:
+                    logger.error(f"[worker {worker_id}] Task {task['task_name']} failed outside the agent: {e}")
+                    save_error_result(output_dir, task["task_name"], e)
+                except BaseException:
+                    # The claimed next task was not run; hand it back before the worker stops
+                    if upcoming is not None:
+                        task_queue.put(upcoming)
+                    raise
+                task = upcoming if prefetch else next_task()
+        finally:
+            if agent is not None:
+                try:
+                    agent.cancel_prefetch()
+                except Exception as e:
+                    logger.error(f"[worker {worker_id}] Failed to cancel prefetch: {e}")
+            if port is not None:
+                release_port(port)
+
+    with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="task-worker") as executor:
+        futures = {executor.submit(worker, worker_id): worker_id for worker_id in range(num_workers)}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                # Only this worker stops (e.g. create_agent failed); the others keep draining the queue
+                logger.error(f"Worker {futures[future]} stopped: {e}")
+
+    # Tasks left when every worker stopped early are recorded as errors
+    task = next_task()
+    while task is not None:
+        save_error_result(output_dir, task["task_name"], RuntimeError("No worker was available to run the task"))
+        task = next_task()
+
+
+def save_statistics(output_dir: str) -> None:
+    """Compute pass/fail/error counts over all result JSON files and write statistics.txt."""
+    logger = get_logger("inference")
+
+    stats = compute_statistics([output_dir])
+    for json_file in stats["unreadable_list"]:
+        logger.error(f"Error reading {json_file}")
+
+    stats_file = Path(output_dir) / "statistics.txt"
+    with open(stats_file, 'w') as f:
+        f.write(format_statistics(stats))
+        
+    logger.info(f"Statistics saved to {stats_file}")
+
+
 def main():
     """Main function."""
     args = parse_arguments()
@@ -128,110 +419,62 @@ def main():
         config["controller"]["args"]["model"] = args.model
         logger.info(f"Model overridden to: {args.model}")
 
+    if args.rebuild_images:
+        config.setdefault("sandbox", {})["force_rebuild"] = True
+
+    if args.har:
+        har_config = config.setdefault("sandbox", {}).setdefault("har", {})
+        har_config["mode"] = args.har
+        har_config["dir"] = args.har_dir or har_config.get("dir") or str(Path(args.output_dir) / "har")
+        logger.info(f"HAR {args.har} mode, archives in {har_config['dir']}")
+
     os.makedirs(args.output_dir, exist_ok=True)
 
+    # Per-iteration checkpoints let --resume continue unfinished tasks instead of restarting them
+    if not args.no_checkpoint:
+        config.setdefault("checkpoint_dir", str(Path(args.output_dir) / "checkpoints"))
+        config["resume_from_checkpoint"] = args.resume or args.rerun_errors
+
     # Check if we should use encrypted tasks
     use_encrypted = config.get("use_encrypted_tasks", False)
     logger.info(f"Use encrypted tasks: {use_encrypted}")
 
-    # Select agent based on configuration
-    agent_type = config.get("agent_type", "cocoa")
-    logger.info(f"Using agent type: {agent_type}")
-    
-    if agent_type == "openai_deep_research":
-        agent = OpenAIDeepResearchAgent(config)
-    elif agent_type == "gemini_deep_research":
-        agent = GeminiDeepResearchAgent(config)
-    elif agent_type == "cocoa":
-        agent = CocoaAgent(config)
-    else:
-        raise ValueError(f"Unknown agent type: {agent_type}")
+    logger.info(f"Using agent type: {config.get('agent_type', 'cocoa')}")
 
     tasks = load_tasks(args.tasks_dir, use_encrypted=use_encrypted)
-
-    for i, task in enumerate(tasks, 1):
-        task_name = task.get("task_name", f"task_{i}")
-        logger.info(f"Processing task {i}/{len(tasks)}: {task_name}")
-
-        agent.setup_environment(task)
-        try:
-            result = agent.run_task(task)
-
-            # Run test if available
-            test_result = agent.run_eval(task, result)
-            if test_result is not None:
-                result["eval"] = test_result
-
-            # Save result to task-specific JSON file
-            output_file = Path(args.output_dir) / f"{task_name}.json"
-            with open(output_file, 'w') as f:
-                json.dump(result, f, indent=2)
-            logger.debug(f"Task {task_name} result saved to {output_file}")
-        except Exception as e:
-            logger.error(f"Task {task_name} failed with error: {e}")
-            # Save error result
-            error_result = {
-                "status": "error",
-                "error": str(e),
-                "task_name": task_name
-            }
-            output_file = Path(args.output_dir) / f"{task_name}.json"
-            with open(output_file, 'w') as f:
-                json.dump(error_result, f, indent=2)
-        finally:
-            agent.cleanup_environment()
-
-    logger.info(f"Processed {len(tasks)} tasks. Results saved to {args.output_dir}")
-
-    # Calculate statistics
-    total_tasks = 0
-    passed_tasks = 0
-    error_tasks = 0
-    passed_list = []
-    error_list = []
-    
-    output_path = Path(args.output_dir)
-    if output_path.exists():
-        for json_file in output_path.glob("*.json"):
+    if args.num_shards > 1:
+        weights = load_task_weights(args.shard_weights_from) if args.shard_weights_from else None
+        tasks = shard_tasks(tasks, args.shard_index, args.num_shards, weights)
+        logger.info(f"Shard {args.shard_index}/{args.num_shards}: {len(tasks)} tasks")
+    if args.resume or args.rerun_errors:
+        tasks = filter_pending_tasks(tasks, args.output_dir, rerun_errors=args.rerun_errors)
+
+    num_workers = max(1, min(args.workers, len(tasks))) if tasks else 1
+    try:
+        if num_workers > 1:
+            logger.info(f"Running {len(tasks)} tasks with {num_workers} workers")
+            run_tasks_parallel(config, tasks, args.output_dir, num_workers, prefetch=args.prefetch)
+        else:
+            agent = create_agent(config)
             try:
-                with open(json_file, 'r') as f:
-                    data = json.load(f)
-                    total_tasks += 1
-                    if data.get("status") == "error":
-                        error_tasks += 1
-                        error_list.append(json_file.stem)
-                    elif data.get("eval", {}).get("passed", False) is True:
-                        passed_tasks += 1
-                        passed_list.append(json_file.stem)
-            except Exception as e:
-                logger.error(f"Error reading {json_file}: {e}")
-
-    success_rate = (passed_tasks / total_tasks * 100) if total_tasks > 0 else 0.0
-    
-    stats_content = (
-        f"Total Tasks: {total_tasks}\n"
-        f"Passed: {passed_tasks}\n"
-        f"Failed: {total_tasks - passed_tasks - error_tasks}\n"
-        f"Errors: {error_tasks}\n"
-        f"Success Rate: {success_rate:.2f}%\n"
-    )
-    
-    if passed_list:
-        stats_content += "\nPassed Tasks:\n"
-        for task_name in sorted(passed_list):
-            stats_content += f"  - {task_name}\n"
-
-    if error_list:
-        stats_content += "\nError Tasks:\n"
-        for task_name in sorted(error_list):
-            stats_content += f"  - {task_name}\n"
-    
-    stats_file = output_path / "statistics.txt"
-    with open(stats_file, 'w') as f:
-        f.write(stats_content)
-        
-    logger.info(f"Statistics saved to {stats_file}")
+                for i, task in enumerate(tasks, 1):
+                    task_name = task.get("task_name", f"task_{i}")
+                    logger.info(f"Processing task {i}/{len(tasks)}: {task_name}")
+                    upcoming = tasks[i] if args.prefetch and i < len(tasks) else None
+                    try:
+                        run_single_task(agent, task, args.output_dir, next_task=upcoming)
+                    except Exception as e:
+                        # Record the task and go on with the next one (whose prefetch is still usable)
+                        logger.error(f"Task {task_name} failed outside the agent: {e}")
+                        save_error_result(args.output_dir, task_name, e)
+            finally:
+                agent.cancel_prefetch()
+
+        logger.info(f"Processed {len(tasks)} tasks. Results saved to {args.output_dir}")
+    finally:
+        # Statistics cover whatever finished, even if the run was aborted
+        save_statistics(args.output_dir)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
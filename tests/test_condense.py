@@ -0,0 +1,90 @@
+"""Tests for the HTML-to-markdown condenser used by dom_get_html."""
+
+from executor.condense import condense_html
+
+BASE_URL = "https://shop.example/page"
+
+
+def test_links_are_resolved_against_the_page_url():
+    html = (
+        '<html><head><title>Shop</title></head><body>'
+        '<p>See <a href="/docs?x=1">the docs</a> and <a href="https://other.org/">other</a></p>'
+        '<a href="javascript:void(0)">js</a> <a href="#top">top</a>'
+        '</body></html>'
+    )
+    assert condense_html(html, BASE_URL) == (
+        "Title: Shop\n"
+        "\n"
+        "See [the docs](https://shop.example/docs?x=1) and [other](https://other.org/)\n"
+        "\n"
+        "js top"
+    )
+
+
+def test_nested_table_is_flattened_into_its_cell():
+    html = (
+        "<table>"
+        "<tr><th>Name</th><th>Details</th></tr>"
+        "<tr><td>Widget</td><td><table>"
+        "<tr><td>Color</td><td>red</td></tr>"
+        "<tr><td>Size</td><td>L</td></tr>"
+        "</table></td></tr>"
+        "</table>"
+    )
+    assert condense_html(html) == (
+        "| Name | Details |\n"
+        "| --- | --- |\n"
+        "| Widget | Color red ; Size L |"
+    )
+
+
+def test_unclosed_links_end_before_the_next_link_and_table():
+    html = (
+        '<p><a href="/a">First<a href="/b">Second</p>'
+        '<table><tr><td><a href="/c">cell link</td><td>x</td></tr><tr><td>y</td><td>z</td></tr></table>'
+    )
+    assert condense_html(html, BASE_URL) == (
+        "[First](https://shop.example/a) [Second](https://shop.example/b)\n"
+        "\n"
+        "| [cell link](https://shop.example/c) | x |\n"
+        "| --- | --- |\n"
+        "| y | z |"
+    )
+
+
+def test_unclosed_options_keep_their_text():
+    html = '<select id="size" name="size"><option>Small<option selected>Medium<option>Large</select>'
+    assert condense_html(html) == '[select#size name="size": Small | Medium* | Large]'
+
+
+def test_hidden_elements_are_dropped():
+    html = (
+        "<div>Visible</div>"
+        "<div hidden>Secret <b>bold</b></div>"
+        '<span aria-hidden="true">icon</span>'
+        '<p style="display: none">gone</p>'
+        '<input type="hidden" name="csrf" value="token">'
+        "<p>End</p>"
+    )
+    assert condense_html(html) == "Visible\n\nEnd"
+
+
+def test_pre_keeps_whitespace_in_a_fenced_block():
+    html = "<p>Code:</p><pre>def f():\n    return  1\n</pre><p>after</p>"
+    assert condense_html(html) == "Code:\n\n```\ndef f():\n    return  1\n```\n\nafter"
+
+
+def test_nested_lists_are_indented():
+    html = "<ul><li>One<ul><li>Inner</li></ul></li><li>Two</li></ul><ol><li>A</li><li>B</li></ol>"
+    assert condense_html(html) == "- One\n  - Inner\n- Two\n1. A\n2. B"
+
+
+def test_form_controls_are_described():
+    html = (
+        '<form><input id="q" name="q" placeholder="Search">'
+        '<button type="submit">Go</button>'
+        '<textarea name="note">Hi  there</textarea></form>'
+    )
+    assert condense_html(html) == (
+        '[input#q name="q" placeholder="Search"] [button: Go] [textarea name="note" value="Hi there"]'
+    )
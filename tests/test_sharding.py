@@ -0,0 +1,93 @@
+"""Tests for task sharding (inference_main) and merging shard outputs (calculate_stats)."""
+
+import json
+import os
+
+import pytest
+
+from calculate_stats import collect_results, merge_results
+from inference_main import load_task_weights, shard_tasks
+
+TASKS = [{"task_name": f"task-{i:02d}"} for i in range(23)]
+
+
+def _shards(num_shards, weights=None):
+    return [shard_tasks(TASKS, index, num_shards, weights) for index in range(num_shards)]
+
+
+def _assert_partition(shards):
+    names = [task["task_name"] for shard in shards for task in shard]
+    assert len(names) == len(set(names)), "a task is in more than one shard"
+    assert set(names) == {task["task_name"] for task in TASKS}, "a task is in no shard"
+    for shard in shards:
+        # Each shard keeps the original task order
+        assert shard == [task for task in TASKS if task in shard]
+
+
+@pytest.mark.parametrize("num_shards", [1, 2, 3, 7])
+def test_hash_shards_are_disjoint_and_complete(num_shards):
+    _assert_partition(_shards(num_shards))
+
+
+def test_hash_shards_are_deterministic():
+    assert _shards(4) == _shards(4)
+
+
+@pytest.mark.parametrize("num_shards", [1, 2, 3, 7])
+def test_weighted_shards_are_disjoint_and_complete(num_shards):
+    # Some tasks have no recorded time and count as the median
+    weights = {task["task_name"]: float(i % 5 + 1) * 10 for i, task in enumerate(TASKS) if i % 4}
+    _assert_partition(_shards(num_shards, weights))
+
+
+def test_weighted_shards_balance_execution_time():
+    weights = {task["task_name"]: float(i + 1) for i, task in enumerate(TASKS)}
+    loads = [sum(weights[task["task_name"]] for task in shard) for shard in _shards(3, weights)]
+    assert max(loads) - min(loads) <= max(weights.values())
+
+
+def test_shard_index_out_of_range():
+    with pytest.raises(ValueError):
+        shard_tasks(TASKS, 3, 3)
+
+
+def _write_result(directory, task_name, data, mtime):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{task_name}.json"
+    path.write_text(json.dumps(data))
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_load_task_weights_reads_execution_times(tmp_path):
+    _write_result(tmp_path / "a", "task-00", {"status": "success", "execution_time": 12.5}, 1000)
+    _write_result(tmp_path / "a", "task-01", {"status": "error"}, 1000)
+    assert load_task_weights([str(tmp_path / "a")]) == {"task-00": 12.5}
+
+
+def test_merge_prefers_success_over_newer_error(tmp_path):
+    success = {"status": "success", "eval": {"passed": True}}
+    _write_result(tmp_path / "shard0", "task-00", success, 1000)
+    _write_result(tmp_path / "shard1", "task-00", {"status": "error", "error": "boom"}, 2000)
+    _write_result(tmp_path / "shard1", "task-01", {"status": "success", "eval": {"passed": False}}, 2000)
+
+    merged = tmp_path / "merged"
+    merge_results([str(tmp_path / "shard0"), str(tmp_path / "shard1")], str(merged))
+
+    assert json.loads((merged / "task-00.json").read_text()) == success
+    assert (merged / "task-01.json").exists()
+    statistics = (merged / "statistics.txt").read_text()
+    assert "Total Tasks: 2" in statistics
+    assert "Passed: 1" in statistics
+    assert "Errors: 0" in statistics
+
+
+def test_collect_prefers_evaluated_then_newest_result(tmp_path):
+    _write_result(tmp_path / "a", "task-00", {"status": "success"}, 3000)
+    evaluated = _write_result(tmp_path / "b", "task-00", {"status": "success", "eval": {"passed": False}}, 1000)
+    _write_result(tmp_path / "a", "task-01", {"status": "success", "eval": {}}, 1000)
+    newest = _write_result(tmp_path / "b", "task-01", {"status": "success", "eval": {}}, 2000)
+
+    results = collect_results([str(tmp_path / "a"), str(tmp_path / "b")])
+    assert results["task-00"][0] == evaluated
+    assert results["task-01"][0] == newest